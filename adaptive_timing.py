@@ -0,0 +1,154 @@
+"""
+Density-adaptive green times.
+
+Turns per-approach density samples (e.g. sensors.get_density()) into green
+splits, clamped to [minGreen, maxGreen]. Everything works on arrays shaped
+(..., directions), so a whole corridor of junctions is computed in one call.
+
+Two allocation methods:
+- proportional: blend of the fixed baseGreen and a density-proportional share
+  of the same total green, weighted by densitySensitivity (0 = fixed timing,
+  1 = fully proportional).
+- webster: Webster's optimum cycle C0 = (1.5 L + 5) / (1 - Y) with greens
+  split by flow ratio y_i / Y (densities are read as flows in veh/h).
+
+Samples are smoothed with an incremental EWMA so a single noisy reading
+does not swing the timing.
+
+Usage:
+    from adaptive_timing import AdaptiveTiming, load_timing_config
+    adaptive = AdaptiveTiming(load_timing_config('settings.json'))
+    adaptive.update(sensors.get_density())
+    secs = adaptive.green_for('north')
+"""
+
+import json
+
+from lazy_imports import lazy_module
+
+np = lazy_module("numpy")
+
+DEFAULT_CONFIG = {
+    "baseGreen": 15,
+    "minGreen": 5,
+    "maxGreen": 45,
+    "yellowTime": 3,
+    "densitySensitivity": 0.6,
+    "smoothing": 0.3,          # EWMA alpha (1 = no smoothing)
+    "method": "proportional",  # or "webster"
+    "saturationFlow": 1800,    # veh/h of green, webster only
+    "maxCycle": 120,           # seconds, webster only
+}
+
+
+def load_timing_config(path):
+    """DEFAULT_CONFIG overlaid with whatever keys the settings file has."""
+    cfg = dict(DEFAULT_CONFIG)
+    try:
+        with open(path, 'r') as f:
+            cfg.update(json.load(f))
+    except Exception as e:
+        print("[adaptive] using default timing config:", e)
+    return cfg
+
+
+def _masked(density, valid):
+    d = np.maximum(np.asarray(density, dtype=np.float64), 0.0)
+    if valid is None:
+        return d, np.ones(d.shape, dtype=bool)
+    valid = np.broadcast_to(np.asarray(valid, dtype=bool), d.shape)
+    return np.where(valid, d, 0.0), valid
+
+
+def proportional_splits(density, base_green, min_green, max_green, sensitivity, valid=None):
+    """
+    density : (..., D) samples; `valid` masks approaches a junction doesn't have.
+    Returns (..., D) green seconds (0 for invalid approaches).
+    """
+    d, valid = _masked(density, valid)
+    n = valid.sum(axis=-1, keepdims=True)
+    total = d.sum(axis=-1, keepdims=True)
+    # equal shares when a junction has no demand at all
+    share = np.divide(d, total, out=np.where(valid, 1.0, 0.0) / np.maximum(n, 1), where=total > 0)
+    proportional = share * n * base_green
+    green = (1.0 - sensitivity) * base_green + sensitivity * proportional
+    return np.where(valid, np.clip(green, min_green, max_green), 0.0)
+
+
+def webster_splits(flow, min_green, max_green, lost_time=3.0, saturation=1800.0,
+                   max_cycle=120.0, valid=None):
+    """Webster split of flows (veh/h) shaped (..., D). Returns (..., D) seconds."""
+    q, valid = _masked(flow, valid)
+    n = valid.sum(axis=-1, keepdims=True)
+    y = q / saturation
+    Y = np.minimum(y.sum(axis=-1, keepdims=True), 0.95)
+    L = lost_time * n
+    cycle = np.clip((1.5 * L + 5.0) / (1.0 - Y), L + min_green * n, max_cycle)
+    share = np.divide(y, y.sum(axis=-1, keepdims=True),
+                      out=np.where(valid, 1.0, 0.0) / np.maximum(n, 1),
+                      where=y.sum(axis=-1, keepdims=True) > 0)
+    green = (cycle - L) * share
+    return np.where(valid, np.clip(green, min_green, max_green), 0.0)
+
+
+class EwmaSmoother:
+    """Incremental exponentially weighted mean over arrays of samples."""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = float(alpha)
+        self.value = None
+
+    def update(self, sample):
+        sample = np.asarray(sample, dtype=np.float64)
+        if self.value is None or self.value.shape != sample.shape:
+            self.value = sample.copy()
+        else:
+            self.value += self.alpha * (sample - self.value)
+        return self.value
+
+
+class AdaptiveTiming:
+    """Smoothed density → green split for batches of junctions."""
+
+    def __init__(self, config=None, directions=("north", "east", "south", "west")):
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self.directions = [d.lower() for d in directions]
+        self.smoother = EwmaSmoother(self.config["smoothing"])
+        # a list until the first update, so building one does not import NumPy
+        self.greens = [float(self.config["baseGreen"])] * len(self.directions)
+
+    def set_directions(self, directions):
+        """Follow a new set of approaches (e.g. after a phase-plan change); restarts smoothing."""
+        directions = [d.lower() for d in directions]
+        if directions != self.directions:
+            self.greens = [float(self.config["baseGreen"])] * len(directions)
+            self.smoother.value = None
+            self.directions = directions
+
+    def compute(self, density, valid=None):
+        """Greens for raw (..., D) density samples, without touching the smoother."""
+        c = self.config
+        if c["method"] == "webster":
+            return webster_splits(density, c["minGreen"], c["maxGreen"],
+                                  lost_time=c["yellowTime"], saturation=c["saturationFlow"],
+                                  max_cycle=c["maxCycle"], valid=valid)
+        return proportional_splits(density, c["baseGreen"], c["minGreen"], c["maxGreen"],
+                                   c["densitySensitivity"], valid=valid)
+
+    def update(self, density, valid=None):
+        """
+        Feed one sample and return the smoothed greens. `density` is either a
+        {direction: count} dict (single junction) or a (..., D) array.
+        """
+        if isinstance(density, dict):
+            lowered = {k.lower(): v for k, v in density.items()}
+            density = [lowered.get(d, 0) for d in self.directions]
+        self.greens = self.compute(self.smoother.update(density), valid=valid)
+        return self.greens
+
+    def green_for(self, direction):
+        """Current smoothed green time (seconds) for one approach."""
+        try:
+            return float(self.greens[self.directions.index(direction.lower())])
+        except ValueError:
+            return float(self.config["baseGreen"])
@@ -1,63 +1,396 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, send_file, abort, g
 from threading import Thread
-import time, os, base64, json, cv2
-from datetime import datetime, timedelta
-from PIL import Image, ImageDraw, ImageFont
-from werkzeug.utils import secure_filename
-import numpy as np
+from concurrent.futures import TimeoutError as FuturesTimeout
+from functools import lru_cache
+import time, os, base64, json, queue
+
+# OpenCV, NumPy and Pillow load on first use (or from the background warm-up
+# below), not while the server is starting
+from lazy_imports import lazy_module, warm_up
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+Image = lazy_module('PIL.Image')
 
 # project modules
 from traffic_controller import controller
 from sound_sensor import start_siren_listener   # NEW: mic siren listener
+from status_hub import StatusHub
+from scheduler import ControllerScheduler
+from intersections import IntersectionRegistry, MAX_DIRS
+from adaptive_timing import AdaptiveTiming
+from sensors import get_density
+from camera_service import CameraService, load_camera_config
+from camera_detection import CAPTURE_FOLDER
+from capture_store import CaptureStore
+from image_jobs import ImageJobs
+from license_card import LicenseRenderer
+from user_store import UserStore
+from settings_store import SettingsStore, SCHEMA as SETTINGS_SCHEMA, TIMING_KEYS
+from event_log import EventLog, EMERGENCY, TRANSITION, MODE, CAPTURE
+from controller_ipc import (SnapshotBuffer, ControllerServer, ControllerClient, RemoteController,
+                            RemoteSettings, RemoteRegistry, RemoteScheduler, RemoteImageJobs)
+from green_wave import Corridor, optimize as optimize_green_wave, load_corridor
+from phase_plan import compile_plan, load_plan
+from preemption import PreemptionManager
+from metrics import (REGISTRY as METRICS, CONTENT_TYPE as METRICS_CONTENT_TYPE, Histogram,
+                     CallbackMetric, merge as merge_metrics)
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 USERS_FILE = os.path.join(BASE_DIR, 'users.json')
+INTERSECTIONS_FILE = os.path.join(BASE_DIR, 'intersections.json')
+CORRIDOR_FILE = os.path.join(BASE_DIR, 'corridor.json')
+PHASE_PLAN_FILE = os.path.join(BASE_DIR, 'phase_plan.json')
+CAMERAS_FILE = os.path.join(BASE_DIR, 'cameras.json')
+EVENTS_DB = os.path.join(BASE_DIR, 'events.db')
+LEGACY_LOG_FILE = os.path.join(BASE_DIR, 'logs.txt')
+MIC_DIRECTIONS = None  # e.g. ["north", "east", "south", "west"]: one mic channel per approach
+SETTINGS_FILE = os.path.join(BASE_DIR, 'settings.json')
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'captured_images')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-capture_counter = 1
-
-# Haar cascade for face detection (OpenCV)
-FACE_CASCADE = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-
-# -------------------- Server-side settings store --------------------
-# This dictionary stores current timings and other settings.
-traffic_settings = {
-    "green": 15,
-    "yellow": 3,
-    "red": 18,
-    "mode": "auto",
-    "density_sensor": True,
-    "siren_sensor": True
-}
+CAMERA_CAPTURE_FOLDER = os.path.join(BASE_DIR, CAPTURE_FOLDER)
+os.makedirs(CAMERA_CAPTURE_FOLDER, exist_ok=True)
+CAPTURE_BUDGET_BYTES = 512 << 20         # per folder, originals + thumbnails
+CAPTURE_COMPACT_AFTER = 3600             # re-encode lossless captures after an hour
+
+PREEMPT_WINDOW = 2.0    # seconds detections are batched before arbitration
+PREEMPT_COOLDOWN = 15   # repeat hits for a just-served approach are the same vehicle
+REGISTRY_ADAPT_INTERVAL = 5.0  # seconds between density re-splits of the registry junctions
+WARM_UP_DELAY = 2.0  # seconds after start before deferred modules load in the background
+
+# Haar cascade for face detection (OpenCV), loaded on first use / warm-up
+@lru_cache(maxsize=1)
+def face_cascade():
+    return cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+# -------------------- Process role --------------------
+# standalone : everything in this process, Werkzeug dev server (python app.py)
+# authority  : controller, registry, settings, sensors + IPC server, no HTTP
+# worker     : HTTP only (e.g. gunicorn); controller calls go to the authority
+#              over a Unix socket, status is read from a shared-memory snapshot
+# See serve.py for the production launcher.
+ROLE = os.environ.get('SMARTTRAFFIC_ROLE', 'standalone')
+IPC_ADDRESS = os.environ.get('SMARTTRAFFIC_IPC', os.path.join(BASE_DIR, 'controller.sock'))
+IPC_AUTHKEY = os.environ.get('SMARTTRAFFIC_IPC_KEY', app.secret_key).encode()
+SNAPSHOT_NAME = os.environ.get('SMARTTRAFFIC_SNAPSHOT', 'smarttraffic_status')
+MAIN_INTERSECTION = 'main'
+
+# -------------------- Density-adaptive green times --------------------
+def _adaptive_green(direction):
+    """Green seconds for the approach about to turn green (None = fixed green_time)."""
+    if not (traffic_settings['adaptive'] and traffic_settings['density_sensor']):
+        return None
+    adaptive.update(get_density())
+    return adaptive.green_for(direction)
+
+def _plan_directions(plan):
+    """Distinct phase directions in ring order: what the green provider is asked for."""
+    return list(dict.fromkeys(plan.directions))
+
+_registry_adapt_at = 0.0
+
+def _adapt_registry(transitions):
+    """Registry ticks: re-split every junction's greens from its density (one batched pass)."""
+    global _registry_adapt_at
+    if not (traffic_settings['adaptive'] and traffic_settings['density_sensor']):
+        return
+    now = registry.clock()
+    if now < _registry_adapt_at:
+        return
+    _registry_adapt_at = now + REGISTRY_ADAPT_INTERVAL
+    slots = list(registry.slots.items())
+    density = np.zeros((len(slots), MAX_DIRS))
+    for iid, i in slots:
+        sample = {k.lower(): v for k, v in get_density(iid).items()}
+        for k, d in enumerate(registry.directions[i]):
+            density[i, k] = sample.get(d, 0)
+    registry.adapt(registry_adaptive, density)
+
+def _apply_timing_config(changed):
+    for timing in (adaptive, registry_adaptive):
+        timing.config.update(traffic_settings.timing_config())
+        timing.smoother.alpha = float(timing.config["smoothing"])
+
+# -------------------- Event log --------------------
+# record() only queues; a background thread commits batches to SQLite
+# (every process writes its own batches; WAL lets them share the file).
+event_log = EventLog(EVENTS_DB).start()
+
+def _log_transitions(transitions):
+    direction = controller.active_direction()
+    for event, lateness in transitions:
+        event_log.record(TRANSITION, direction=direction, event=event,
+                         lateness_ms=round(1000 * lateness, 3))
+        if event == "emergency_end" and preemption is not None:
+            preemption.wake()  # next queued request can be granted now
+
+def _log_preemption(directions, requests, now):
+    group = "+".join(directions)
+    for req in requests:
+        event_log.record(EMERGENCY, direction=req.direction, intersection=MAIN_INTERSECTION,
+                         source=req.source, hits=req.hits, group=group,
+                         waited_ms=round(1000 * (now - req.arrival)))
+
+# Live status fan-out for /status/stream (published by the controller loop,
+# or in a worker by a poller following the shared snapshot)
+status_hub = StatusHub()
+status_snapshot = None
+
+def _status_payload():
+    """Flat status pushed to stream clients: controller fields + settings."""
+    try:
+        status = controller.get_status()
+    except Exception:
+        status = {}
+    return {**status, "settings": traffic_settings.as_dict()}
 
 # -------------------- Background Controller Thread --------------------
+def _publish_status():
+    try:
+        payload = _status_payload()
+        status_hub.publish(payload)
+        if status_snapshot is not None:
+            status_snapshot.write(payload)
+    except Exception as e:
+        print("[controller-loop] publish error:", e)
+
 def background_controller():
     """Main traffic loop (auto/emergency handling)."""
-    while True:
-        try:
-            if controller.mode == 'auto':
-                controller.auto_cycle()
-            elif controller.mode == 'emergency':
-                controller.handle_emergency()
-        except Exception as e:
-            print("[controller-loop] error:", e)
-        time.sleep(1)
+    scheduler.run()
+
+# -------------------- Corridor intersections --------------------
+# 'main' is the local junction (the controller above, wired to the sensors);
+# every other id lives in the registry and is ticked by one shared scheduler.
+def load_intersections(path=INTERSECTIONS_FILE):
+    """Register junctions from a JSON list: [{"id", "directions", "green", "yellow", "greens"}]."""
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, 'r') as f:
+            for item in json.load(f):
+                registry.add(str(item['id']),
+                             directions=item.get('directions', ("north", "east", "south", "west")),
+                             green_time=item.get('green', 15),
+                             yellow_time=item.get('yellow', 3),
+                             greens=item.get('greens'))
+    except Exception as e:
+        print("[intersections] load error:", e)
+
+# -------------------- Green-wave corridor --------------------
+# corridor.json: {"junctions": ["main", "J1", ...], "distances": [m, ...],
+#                 "speed_kmh": 50, "outbound": "west", "inbound": "east"}
+green_wave = None
+
+def _junction_specs():
+    phases = controller.plan.phases
+    specs = {MAIN_INTERSECTION: {"directions": controller.plan.directions,
+                                 "greens": [float(p.green_time or controller.green_time) for p in phases],
+                                 "yellow": float(controller.yellow_time)}}
+    for iid, i in list(registry.slots.items()):
+        specs[iid] = registry.spec(i)
+    return specs
+
+def _set_coordination(iid, plan):
+    if iid == MAIN_INTERSECTION:
+        controller.set_coordination(plan)
+    else:
+        registry.set_coordination(registry.slots[iid], plan)
+
+def apply_corridor(definition, persist=False):
+    """Optimize offsets for the corridor and hand every junction its plan."""
+    global green_wave
+    wave = optimize_green_wave(Corridor.from_dict(definition, _junction_specs()))
+    clear_corridor()
+    for iid, plan in wave.plans.items():
+        _set_coordination(iid, plan)
+    green_wave = wave
+    if persist:
+        tmp = CORRIDOR_FILE + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(definition, f, indent=2)
+        os.replace(tmp, CORRIDOR_FILE)
+    print(f"[corridor] {len(wave.plans)} junctions, cycle {wave.cycle:.0f}s, "
+          f"bands {wave.band_out:.1f}s / {wave.band_in:.1f}s")
+    return wave.as_dict()
+
+def clear_corridor():
+    global green_wave
+    if green_wave is not None:
+        for iid in green_wave.plans:
+            _set_coordination(iid, None)
+    green_wave = None
+
+def corridor_status():
+    return green_wave.as_dict() if green_wave is not None else None
+
+# -------------------- Phase plan --------------------
+# phase_plan.json: signal groups, preemption groups per approach and the
+# phases of the ring (see phase_plan.py); without it the four approaches run
+# one after another.
+def apply_phase_plan(definition, persist=False):
+    """Compile a plan and hand it to the main controller (starts at its first phase)."""
+    plan = compile_plan(definition)
+    if green_wave is not None and MAIN_INTERSECTION in green_wave.plans:
+        clear_corridor()  # offsets were computed for the old phases
+    controller.set_plan(plan)
+    adaptive.set_directions(_plan_directions(plan))
+    if persist:
+        tmp = PHASE_PLAN_FILE + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(definition, f, indent=2)
+        os.replace(tmp, PHASE_PLAN_FILE)
+    print(f"[phase-plan] {len(plan.phases)} phases, {len(plan.signals)} signals, "
+          f"{len(plan.steps)} steps")
+    return plan.as_dict()
+
+def phase_plan_status():
+    return controller.plan.as_dict()
+
+if ROLE == 'worker':
+    ipc = ControllerClient(IPC_ADDRESS, IPC_AUTHKEY)
+    status_snapshot = SnapshotBuffer.attach(SNAPSHOT_NAME)
+    controller = RemoteController(ipc, status_snapshot)
+    traffic_settings = RemoteSettings(ipc, status_snapshot)
+    registry = RemoteRegistry(ipc)
+    scheduler = RemoteScheduler(ipc)
+    preemption = None
+else:
+    # settings.json holds timings, mode, sensor switches and adaptive-timing
+    # parameters; changes reach the controller through the hooks below and
+    # are written back (debounced, atomic) by the store.
+    traffic_settings = SettingsStore(SETTINGS_FILE)
+    # main junction: one sample per green; registry: batched, see _adapt_registry
+    adaptive = AdaptiveTiming(traffic_settings.timing_config(),
+                              directions=_plan_directions(controller.plan))
+    registry_adaptive = AdaptiveTiming(traffic_settings.timing_config(), directions=())
+    try:
+        plan_definition = load_plan(PHASE_PLAN_FILE)
+        if plan_definition:
+            apply_phase_plan(plan_definition)  # also re-targets `adaptive`
+    except Exception as e:
+        print("[phase-plan] load error:", e)
+    controller.green_provider = _adaptive_green
+
+    # red is display-only: in the four-way ring an approach is red while the
+    # others run green + yellow, so the controller has no red timer to set.
+    traffic_settings.on_change(('green',), lambda c: controller.set_timer(c['green']))
+    traffic_settings.on_change(('yellow',), lambda c: controller.set_yellow(c['yellow']))
+    traffic_settings.on_change(('mode',), lambda c: controller.set_mode(c['mode']))
+    traffic_settings.on_change(TIMING_KEYS + ('yellow',), _apply_timing_config)
+
+    # start the controller from the persisted settings
+    controller.set_timer(traffic_settings['green'])
+    controller.set_yellow(traffic_settings['yellow'])
+    controller.set_mode(traffic_settings['mode'])
+
+    try:
+        event_log.import_text_log(LEGACY_LOG_FILE)  # no-op once imported
+    except Exception as e:
+        print("[events] logs.txt import error:", e)
+
+    # Deadline-driven loop: sleeps until the next transition (or countdown
+    # second while anybody watches) and wakes early on controller changes.
+    # The authority always ticks the countdown so the shared snapshot stays live.
+    scheduler = ControllerScheduler(
+        controller,
+        on_tick=_publish_status,
+        wants_countdown=lambda: ROLE == 'authority' or status_hub.subscriber_count() > 0,
+        on_transitions=_log_transitions,
+    )
+    # siren / camera detections are batched and arbitrated before preempting
+    preemption = PreemptionManager(controller, window=PREEMPT_WINDOW, cooldown=PREEMPT_COOLDOWN,
+                                   on_grant=_log_preemption)
+    registry = IntersectionRegistry()
+    registry_scheduler = ControllerScheduler(registry, name="intersections",
+                                             on_transitions=_adapt_registry)
+    load_intersections()
+
+    try:
+        corridor_definition = load_corridor(CORRIDOR_FILE)
+        if corridor_definition:
+            apply_corridor(corridor_definition)
+    except Exception as e:
+        print("[corridor] load error:", e)
+
+_status_feed = None
+
+def _ensure_status_feed():
+    """Worker: follow the shared snapshot and republish it to local SSE clients."""
+    global _status_feed
+    if ROLE != 'worker' or _status_feed is not None:
+        return
+
+    def follow():
+        seen = None
+        while True:
+            version = status_snapshot.version()
+            if version != seen:
+                seen = version
+                status_hub.publish(status_snapshot.read())
+            time.sleep(0.1)
+
+    _status_feed = Thread(target=follow, daemon=True)
+    _status_feed.start()
+
+def _controller_for(iid):
+    """Controller (or registry handle) for an intersection id; None if unknown."""
+    if iid is None:
+        iid = request.args.get('intersection')
+    if iid in (None, '', MAIN_INTERSECTION):
+        return controller
+    if iid in registry:
+        return registry.handle(iid)
+    return None
+
+def _unknown_intersection(iid):
+    return jsonify({'status': 'error', 'message': f'unknown intersection {iid}'}), 404
+
+# -------------------- Metrics (/metrics, Prometheus text) --------------------
+# Labelled by URL rule (not path), so per-intersection routes share a series.
+ROUTE_SECONDS = Histogram("smarttraffic_http_request_seconds", "Request handling time",
+                          ("route", "method", "status"))
+IMAGE_STAGE_SECONDS = Histogram("smarttraffic_image_stage_seconds",
+                                "Capture processing time per stage", ("stage",))
+_decode_seconds = IMAGE_STAGE_SECONDS.labels("decode")
+_face_seconds = IMAGE_STAGE_SECONDS.labels("face_detect")
+_license_seconds = IMAGE_STAGE_SECONDS.labels("license_render")
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def _record_latency(response):
+    start = g.get('request_start')
+    if start is not None:
+        rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        ROUTE_SECONDS.labels(rule, request.method, response.status_code).observe(
+            time.perf_counter() - start)
+    return response
+
+# -------------------- Camera detection workers --------------------
+# One process per source in cameras.json ([{"source", "direction", ...}]);
+# started from __main__ so spawned workers never start their own.
+camera_service = None
 
 # -------------------- Routes (login, pages) --------------------
+# users.json is parsed once (re-read on mtime change); hashing runs on a bounded pool
+user_store = UserStore(USERS_FILE, workers=2)
+
 @app.route('/', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
         try:
-            with open(USERS_FILE, 'r') as f:
-                users = json.load(f)
+            ok = user_store.verify(username, password)
+        except FuturesTimeout:
+            return render_template('login.html', error="Login service busy, please retry.")
         except Exception:
             return render_template('login.html', error="User data not found.")
-        if username and password and username in users and users[username] == password:
+        if ok:
             session['user'] = username
             return redirect(url_for('loading'))
         else:
@@ -107,237 +440,518 @@ def settings():
 
 # -------------------- API ROUTES (controller) --------------------
 @app.route('/get_status')
-def get_status():
+@app.route('/intersections/<iid>/get_status')
+def get_status(iid=None):
     """Return live controller status (mode, active direction, timers, etc.)."""
+    ctl = _controller_for(iid)
+    if ctl is None:
+        return _unknown_intersection(iid)
     try:
-        status = controller.get_status()
+        status = ctl.get_status()
     except Exception:
         status = {}
     # Merge in server-side traffic_settings for a consistent client view
     merged = {
         "controller_status": status,
-        "settings": traffic_settings
+        "settings": traffic_settings.as_dict()
     }
     return jsonify(merged)
 
+@app.route('/intersections', methods=['GET'])
+def list_intersections():
+    return jsonify({'intersections': [MAIN_INTERSECTION] + list(registry.ids)})
+
+@app.route('/intersections', methods=['POST'])
+def add_intersection():
+    data = request.get_json(force=True, silent=True) or {}
+    iid = str(data.get('id', '')).strip()
+    if not iid or iid == MAIN_INTERSECTION:
+        return jsonify({'status': 'error', 'message': 'invalid intersection id'}), 400
+    try:
+        registry.add(iid,
+                     directions=data.get('directions', ("north", "east", "south", "west")),
+                     green_time=int(data.get('green', traffic_settings['green'])),
+                     yellow_time=int(data.get('yellow', traffic_settings['yellow'])),
+                     greens=data.get('greens'))
+    except (ValueError, TypeError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'ok', 'id': iid})
+
+@app.route('/corridor', methods=['GET'])
+def get_corridor():
+    """Current green wave: common cycle, bands and per-junction offsets."""
+    wave = ipc.call('corridor') if ROLE == 'worker' else corridor_status()
+    return jsonify({'corridor': wave})
+
+@app.route('/corridor', methods=['POST'])
+def set_corridor():
+    """Optimize and apply a corridor definition (saved to corridor.json)."""
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        if ROLE == 'worker':
+            wave = ipc.call('apply_corridor', data, persist=True)
+        else:
+            wave = apply_corridor(data, persist=True)
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'ok', 'corridor': wave})
+
+@app.route('/corridor', methods=['DELETE'])
+def delete_corridor():
+    if ROLE == 'worker':
+        ipc.call('clear_corridor')
+    else:
+        clear_corridor()
+    if os.path.exists(CORRIDOR_FILE):
+        os.remove(CORRIDOR_FILE)
+    return jsonify({'status': 'ok'})
+
+@app.route('/phase_plan', methods=['GET'])
+def get_phase_plan():
+    """Phase plan the main junction is running."""
+    plan = ipc.call('phase_plan') if ROLE == 'worker' else phase_plan_status()
+    return jsonify({'phase_plan': plan})
+
+@app.route('/phase_plan', methods=['POST'])
+def set_phase_plan():
+    """Compile and run a phase plan (saved to phase_plan.json)."""
+    data = request.get_json(force=True, silent=True) or {}
+    try:
+        if ROLE == 'worker':
+            plan = ipc.call('apply_phase_plan', data, persist=True)
+        else:
+            plan = apply_phase_plan(data, persist=True)
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'ok', 'phase_plan': plan})
+
+@app.route('/status/stream')
+def status_stream():
+    """
+    Server-Sent Events feed of controller status. The first event is a full
+    'snapshot', later 'delta' events carry only the keys that changed.
+    """
+    _ensure_status_feed()
+    sub = status_hub.subscribe()
+    scheduler.wake()  # start per-second countdown ticks for this client
+
+    def generate():
+        try:
+            while True:
+                item = sub.get(timeout=15)
+                if item is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                event, payload = item
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            status_hub.unsubscribe(sub)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(generate(), mimetype='text/event-stream', headers=headers)
+
+@app.route('/camera_stats')
+def camera_stats():
+    """Per-camera frame / detection counters of the detection workers."""
+    if ROLE == 'worker':
+        return jsonify(ipc.call('camera_stats'))
+    if camera_service is None:
+        return jsonify({'cameras': []})
+    return jsonify(camera_service.stats())
+
+@app.route('/events')
+def events():
+    """Recorded events, newest first: ?kind=&direction=&since=&until=&limit="""
+    args = request.args
+    try:
+        since = float(args['since']) if 'since' in args else None
+        until = float(args['until']) if 'until' in args else None
+        limit = min(1000, int(args.get('limit', 100)))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'invalid query'}), 400
+    return jsonify({'events': event_log.query(kind=args.get('kind'), direction=args.get('direction'),
+                                              since=since, until=until, limit=limit)})
+
+@app.route('/events/emergencies_per_hour')
+def emergencies_per_hour():
+    """Emergency counts per direction per hour (epoch seconds), from the rollup."""
+    try:
+        since = float(request.args['since']) if 'since' in request.args else None
+        until = float(request.args['until']) if 'until' in request.args else None
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'invalid query'}), 400
+    return jsonify({'hours': event_log.emergencies_per_hour(since, until)})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint; a worker appends the authority's series."""
+    text = METRICS.render(skip_empty=True)
+    if ROLE == 'worker':
+        try:
+            text = merge_metrics(text, ipc.call('metrics'))
+        except Exception as e:
+            print("[metrics] authority unavailable:", e)
+    return Response(text, content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/scheduler_stats')
+def scheduler_stats():
+    """Tick jitter / transition lateness of the controller scheduler."""
+    return jsonify(scheduler.stats())
+
 # New: return just saved settings (simple)
 @app.route('/get_settings', methods=['GET'])
 def get_settings():
-    return jsonify(traffic_settings)
+    return jsonify(traffic_settings.as_dict())
+
+# request field -> settings key (the settings page posts density / siren)
+_SETTING_FIELDS = {'density': 'density_sensor', 'siren': 'siren_sensor'}
 
 # Save multiple settings in one call
 @app.route('/save_settings', methods=['POST'])
+@app.route('/update_timing', methods=['POST'])
 def save_settings():
-    global traffic_settings
     data = request.get_json(force=True, silent=True) or {}
-    # Validate and set
-    try:
-        g = int(data.get('green', traffic_settings['green']))
-        y = int(data.get('yellow', traffic_settings['yellow']))
-        r = int(data.get('red', traffic_settings['red']))
-    except Exception:
-        return jsonify({"status": "error", "message": "Invalid timing values"}), 400
-
-    traffic_settings['green'] = max(1, g)
-    traffic_settings['yellow'] = max(1, y)
-    traffic_settings['red'] = max(1, r)
-    traffic_settings['mode'] = data.get('mode', traffic_settings['mode'])
-    traffic_settings['density_sensor'] = bool(data.get('density', traffic_settings['density_sensor']))
-    traffic_settings['siren_sensor'] = bool(data.get('siren', traffic_settings['siren_sensor']))
-
-    # Try to update controller runtime config if possible
+    changes = {_SETTING_FIELDS.get(k, k): v for k, v in data.items()}
+    changes = {k: v for k, v in changes.items() if k in SETTINGS_SCHEMA}
     try:
-        # If controller exposes a setter for green timer, call it
-        if hasattr(controller, 'set_timer'):
-            controller.set_timer(int(traffic_settings['green']))
-        # Attempt best-effort attribute setting for yellow/red if controller supports them
-        if hasattr(controller, 'yellow'):
-            setattr(controller, 'yellow', int(traffic_settings['yellow']))
-        else:
-            # safe fallback: try set_yellow method
-            if hasattr(controller, 'set_yellow'):
-                controller.set_yellow(int(traffic_settings['yellow']))
-        if hasattr(controller, 'red'):
-            setattr(controller, 'red', int(traffic_settings['red']))
-        else:
-            if hasattr(controller, 'set_red'):
-                controller.set_red(int(traffic_settings['red']))
-        # Update mode on controller too if setter exists
-        if hasattr(controller, 'set_mode'):
-            controller.set_mode(traffic_settings['mode'])
-    except Exception as e:
-        print("[save_settings] controller update warning:", e)
+        changed = traffic_settings.update(**changes)
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Invalid settings: {e}"}), 400
+    if 'mode' in changed:
+        event_log.record(MODE, intersection=MAIN_INTERSECTION, mode=changed['mode'])
+    scheduler.wake()  # push the new settings to stream clients right away
 
-    return jsonify({"status": "ok", "message": "Settings saved", "settings": traffic_settings})
+    return jsonify({"status": "ok", "message": "Settings saved", "settings": traffic_settings.as_dict()})
 
 @app.route('/set_mode', methods=['POST'])
-def set_mode():
+@app.route('/intersections/<iid>/set_mode', methods=['POST'])
+def set_mode(iid=None):
+    ctl = _controller_for(iid)
+    if ctl is None:
+        return _unknown_intersection(iid)
     data = request.get_json(force=True, silent=True) or {}
     mode = data.get('mode', 'auto')
-    traffic_settings['mode'] = mode
     try:
-        controller.set_mode(mode)
+        if ctl is controller:
+            traffic_settings.update(mode=mode)  # hook forwards it to the controller
+        else:
+            ctl.set_mode(mode)
+        event_log.record(MODE, intersection=iid or MAIN_INTERSECTION, mode=mode)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     except Exception as e:
         print("[set_mode] warning:", e)
     return jsonify({'status': 'ok'})
 
 @app.route('/set_timer', methods=['POST'])
-def set_timer():
+@app.route('/intersections/<iid>/set_timer', methods=['POST'])
+def set_timer(iid=None):
+    ctl = _controller_for(iid)
+    if ctl is None:
+        return _unknown_intersection(iid)
     data = request.get_json(force=True, silent=True) or {}
     try:
         t = int(data.get('time', traffic_settings['green']))
     except Exception:
         return jsonify({'status':'error','message':'invalid time'}),400
-    traffic_settings['green'] = t
+    if t < 1:
+        return jsonify({'status':'error','message':'time must be at least 1 s'}),400
     try:
-        if hasattr(controller, 'set_timer'):
-            controller.set_timer(t)
+        # an unchanged green still restarts the running phase
+        if ctl is not controller or not traffic_settings.update(green=t):
+            ctl.set_timer(t)
+    except ValueError as e:
+        return jsonify({'status':'error','message':str(e)}),400
     except Exception as e:
         print("[set_timer] warning:", e)
     return jsonify({'status': 'ok'})
 
 @app.route('/start', methods=['POST'])
 def start():
-    controller.set_mode("auto")
-    traffic_settings['mode'] = 'auto'
+    traffic_settings.update(mode='auto')
+    event_log.record(MODE, intersection=MAIN_INTERSECTION, mode='auto')
     return jsonify({'status': 'started'})
 
 @app.route('/stop', methods=['POST'])
 def stop():
-    controller.set_mode("manual")
-    traffic_settings['mode'] = 'manual'
+    traffic_settings.update(mode='manual')
+    event_log.record(MODE, intersection=MAIN_INTERSECTION, mode='manual')
     return jsonify({'status': 'stopped'})
 
 # Manual test trigger (useful if mic not available)
 @app.route('/emergency/trigger', methods=['POST'])
-def emergency_trigger():
+@app.route('/intersections/<iid>/emergency/trigger', methods=['POST'])
+def emergency_trigger(iid=None):
+    ctl = _controller_for(iid)
+    if ctl is None:
+        return _unknown_intersection(iid)
     data = request.get_json(force=True, silent=True) or {}
     direction = data.get('direction', 'North')
-    controller.set_emergency(direction)
+    try:
+        ctl.set_emergency(direction)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    event_log.record(EMERGENCY, direction=direction, intersection=iid or MAIN_INTERSECTION,
+                     source='manual')
     return jsonify({'status': 'triggered', 'direction': direction})
 
-# -------------------- Serve saved images --------------------
+@app.route('/preemption')
+def preemption_status():
+    """Arbitration counters, the running preemption and the waiting requests."""
+    if ROLE == 'worker':
+        return jsonify(ipc.call('preemption'))
+    return jsonify(preemption.stats())
+
+# -------------------- Capture storage --------------------
+# Content-addressed files under a disk budget; the background pass (compaction
+# + eviction) runs in the process that owns the sensors.
+capture_store = CaptureStore(UPLOAD_FOLDER, budget_bytes=CAPTURE_BUDGET_BYTES,
+                             compact_after=CAPTURE_COMPACT_AFTER)
+camera_store = CaptureStore(CAMERA_CAPTURE_FOLDER, budget_bytes=CAPTURE_BUDGET_BYTES,
+                            compact_after=None)  # already JPEG
+IMAGE_MAX_AGE = 7 * 24 * 3600  # browser cache lifetime (names never change content)
+
+def _store_for(filename):
+    return camera_store if filename.startswith('emergency_') else capture_store
+
+def _send_stored(store, path, mimetype=None):
+    store.touch(path)
+    # conditional: ETag / Last-Modified validation and Range requests
+    return send_file(path, mimetype=mimetype, conditional=True, etag=True, max_age=IMAGE_MAX_AGE)
+
 @app.route('/captured_images/<path:filename>')
 def serve_captured_image(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    path = capture_store.path_for(filename)
+    if path is None:
+        abort(404)
+    return _send_stored(capture_store, path)
+
+@app.route('/camera_captures/<path:filename>')
+def serve_camera_capture(filename):
+    path = camera_store.path_for(filename)
+    if path is None:
+        abort(404)
+    return _send_stored(camera_store, path)
+
+@app.route('/thumbnails/<path:filename>')
+def serve_thumbnail(filename):
+    """JPEG thumbnail of a capture or camera match: ?size=160|320|640"""
+    store = _store_for(filename)
+    try:
+        path = store.thumbnail(filename, request.args.get('size', 320, type=int))
+    except Exception as e:
+        print("[captures] thumbnail error:", e)
+        abort(415)
+    if path is None:
+        abort(404)
+    return _send_stored(store, path, mimetype='image/jpeg')
+
+@app.route('/captures/stats')
+def capture_stats():
+    if ROLE == 'worker':
+        return jsonify(ipc.call('capture_stats'))
+    return jsonify({'captures': capture_store.stats(), 'camera': camera_store.stats()})
 
 # -------------------- Utility: create mock driving license image --------------------
-def create_mock_license(face_img_path, username_hint="Unknown"):
-    name = username_hint if username_hint else "Demo User"
-    dl_no = "DL" + datetime.now().strftime("%m%d%H%M%S")
-    dob = (datetime.now() - timedelta(days=25*365)).strftime("%d/%m/%Y")
-    issue = datetime.now().strftime("%d/%m/%Y")
-    expiry = (datetime.now() + timedelta(days=10*365)).strftime("%d/%m/%Y")
+@lru_cache(maxsize=1)
+def license_renderer():
+    """Card renderer (fonts + template are built on first use / warm-up)."""
+    return LicenseRenderer(fmt="png", compress_level=1)
+
+def create_mock_license(face_img, username_hint="Unknown"):
+    """Render the demo card into the capture store; `face_img` is a PIL image or a path."""
+    renderer = license_renderer()
+    return capture_store.put("license", renderer.render(face_img, username_hint), renderer.ext)
+
+# -------------------- Capture processing (runs on the image worker pool) --------------------
+FACE_DETECT_MAX_SIDE = 640  # faces are searched on a copy downscaled to this
+
+def detect_faces(img_bgr, max_side=FACE_DETECT_MAX_SIDE):
+    """Haar face boxes (x, y, w, h) in full-resolution coordinates."""
+    h, w = img_bgr.shape[:2]
+    scale = min(1.0, max_side / float(max(h, w)))
+    small = img_bgr
+    if scale < 1.0:
+        small = cv2.resize(img_bgr, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    min_side = max(20, int(50 * scale))
+    faces = face_cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5,
+                                            minSize=(min_side, min_side))
+    return [tuple(int(round(v / scale)) for v in box) for box in faces]
+
+def process_capture(job_id, image_b64, name_hint):
+    """Decode once, store the capture, crop the face and render the license in memory."""
+    image_bytes = base64.b64decode(image_b64)
+    capture_filename = capture_store.put("capture", image_bytes)
+
+    with _decode_seconds.time():
+        img_cv = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img_cv is None:
+        raise ValueError("could not decode image")
+
+    with _face_seconds.time():
+        faces = detect_faces(img_cv)
+    face_bgr = img_cv
+    if faces:
+        (x, y, wf, hf) = faces[0]
+        face_bgr = img_cv[y:y+hf, x:x+wf]
+        ok, buf = cv2.imencode('.jpg', face_bgr, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if ok:
+            capture_store.put("face", buf.tobytes(), "jpg")
+
+    with _license_seconds.time():
+        face_img = Image.fromarray(cv2.cvtColor(face_bgr, cv2.COLOR_BGR2RGB))
+        license_filename = create_mock_license(face_img, username_hint=name_hint)
+    event_log.record(CAPTURE, capture=capture_filename, license=license_filename,
+                     face_found=len(faces) > 0)
+    return {
+        "capture_filename": capture_filename,
+        "license_filename": license_filename,
+        "face_found": len(faces) > 0
+    }
 
-    w, h = 900, 560
-    card = Image.new("RGB", (w, h), (235, 245, 252))
-    draw = ImageDraw.Draw(card)
+# Jobs run and are kept in one process (standalone, or the authority under
+# serve.py), so a result poll finds its job whichever HTTP worker answers it.
+if ROLE == 'worker':
+    image_jobs = RemoteImageJobs(ipc)
+else:
+    image_jobs = ImageJobs(process_capture, workers=4, max_pending=64)
 
-    try:
-        font_bold = ImageFont.truetype("arialbd.ttf", 36)
-        font_regular = ImageFont.truetype("arial.ttf", 24)
-        font_large = ImageFont.truetype("arialbd.ttf", 48)
-    except Exception:
-        font_bold = ImageFont.load_default()
-        font_regular = ImageFont.load_default()
-        font_large = ImageFont.load_default()
+def warm_up_capture_path():
+    """Load what process_capture needs (OpenCV + cascade, NumPy, Pillow + card template)."""
+    return warm_up('numpy', 'cv2', face_cascade, 'PIL.Image', license_renderer,
+                   delay=WARM_UP_DELAY)
 
-    draw.rectangle([(0,0),(w,110)], fill=(18,60,150))
-    draw.text((24, 28), "DRIVING LICENSE (DEMO)", font=font_large, fill=(255,255,255))
-
-    if os.path.exists(face_img_path):
-        try:
-            face = Image.open(face_img_path).convert("RGB")
-            face_thumb = face.resize((260, 320))
-            card.paste(face_thumb, (40, 140))
-        except Exception:
-            pass
-
-    x_base = 320
-    draw.text((x_base, 150), f"Name: {name}", font=font_bold, fill=(0,0,0))
-    draw.text((x_base, 200), f"DL Number: {dl_no}", font=font_regular, fill=(0,0,0))
-    draw.text((x_base, 250), f"Date of Birth: {dob}", font=font_regular, fill=(0,0,0))
-    draw.text((x_base, 300), f"Issue Date: {issue}", font=font_regular, fill=(0,0,0))
-    draw.text((x_base, 350), f"Expiry Date: {expiry}", font=font_regular, fill=(0,0,0))
-    draw.line((x_base, 420, x_base+180, 480), fill=(0,0,0), width=3)
-    draw.text((x_base, 490), "Signature (Demo)", font=font_regular, fill=(0,0,0))
-
-    license_filename = f"license_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-    license_path = os.path.join(UPLOAD_FOLDER, secure_filename(license_filename))
-    card.save(license_path)
-    return os.path.basename(license_path)
+if ROLE != 'worker':  # a worker's /metrics appends the authority's series
+    CallbackMetric("smarttraffic_image_jobs_pending", "Capture jobs queued or running",
+                   lambda: image_jobs.stats()["pending"])
+CallbackMetric("smarttraffic_status_stream_clients", "Connected /status/stream clients",
+               status_hub.subscriber_count)
 
 # -------------------- SAVE IMAGE route (accept base64 from frontend) --------------------
 @app.route('/save_image', methods=['POST'])
 def save_image():
-    global capture_counter
-    data = request.get_json()
+    """Queue a capture; the result is fetched from /save_image/<job_id>."""
+    data = request.get_json(silent=True)
 
     if not data or 'image' not in data:
         return jsonify({"status": "error", "message": "No image data provided"}), 400
 
-    try:
-        image_b64 = data['image'].split(",")[1]
-        image_bytes = base64.b64decode(image_b64)
-        capture_filename = f"capture_{int(time.time())}.png"
-        capture_path = os.path.join(UPLOAD_FOLDER, secure_filename(capture_filename))
-        with open(capture_path, 'wb') as f:
-            f.write(image_bytes)
+    parts = data['image'].split(",", 1)
+    if len(parts) != 2:
+        return jsonify({"status": "error", "message": "Expected a data URL"}), 400
 
-        img_cv = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
-        if img_cv is None:
-            img_cv = cv2.imread(capture_path)
-
-        gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-        faces = FACE_CASCADE.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(50,50))
-
-        face_crop_path = capture_path
-        if len(faces) > 0:
-            (x,y,wf,hf) = faces[0]
-            face_roi = img_cv[y:y+hf, x:x+wf]
-            face_filename = f"face_{int(time.time())}.png"
-            face_path = os.path.join(UPLOAD_FOLDER, secure_filename(face_filename))
-            cv2.imwrite(face_path, face_roi)
-            face_crop_path = face_path
-
-        name_hint = session.get('user', 'Demo User')
-        license_filename = create_mock_license(face_crop_path, username_hint=name_hint)
-
-        capture_counter += 1
-        if capture_counter > 1000000:
-            capture_counter = 1
-
-        return jsonify({
-            "status": "ok",
-            "capture_filename": os.path.basename(capture_path),
-            "license_filename": license_filename,
-            "face_found": len(faces) > 0
-        })
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+    try:
+        job_id = image_jobs.submit(parts[1], session.get('user', 'Demo User'))
+    except queue.Full:
+        return jsonify({"status": "error", "message": "Image queue is full, retry shortly"}), 503
+
+    return jsonify({
+        "status": "queued",
+        "job_id": job_id,
+        "result_url": url_for('save_image_result', job_id=job_id)
+    }), 202
+
+@app.route('/save_image/<job_id>')
+def save_image_result(job_id):
+    """Job state; ?wait=N long-polls up to N seconds (max 30) for completion."""
+    try:
+        wait = min(30.0, max(0.0, float(request.args.get('wait', 0))))
+    except ValueError:
+        wait = 0.0
+    job = image_jobs.get(job_id, wait=wait)
+    if job is None:
+        return jsonify({"status": "error", "message": "unknown job"}), 404
+    return jsonify(job)
+
+@app.route('/image_jobs/stats')
+def image_job_stats():
+    return jsonify(image_jobs.stats())
 
 @app.route('/logout')
 def logout():
     session.clear()
     return redirect(url_for('login'))
 
-# -------------------- RUN APP --------------------
-if __name__ == '__main__':
+# -------------------- Background services (standalone / authority) --------------------
+def on_siren_detect(direction, source='siren'):
+    chosen = direction or 'North'
+    try:
+        outcome = preemption.submit(chosen, source=source)
+    except ValueError as e:
+        print(f"[{source}] trigger error:", e)
+        return
+    print(f"[{source}] Detected on {chosen}: {outcome}")
+
+def start_background_services():
+    """Controller loops, siren listener and camera workers (never in an HTTP worker)."""
+    global camera_service
+    # 0) capture storage: compaction + eviction to the disk budget
+    capture_store.start()
+    camera_store.start()
+
     # 1) traffic controller loop
     Thread(target=background_controller, daemon=True).start()
+    Thread(target=registry_scheduler.run, daemon=True).start()
+    preemption.start()
 
     # 2) MIC SIREN LISTENER (auto emergency trigger)
-    def on_siren_detect(direction):
-        if getattr(controller, "emergency_active", False):
-            return
-        chosen = direction or 'North'
-        print(f"[siren] Detected! Triggering emergency on {chosen}")
-        try:
-            controller.set_emergency(chosen)
-        except Exception as e:
-            print("[siren] trigger error:", e)
-
-    # Start listener; if mic/PyAudio missing, it auto-falls-back to simulation
-    Thread(target=start_siren_listener, args=(on_siren_detect,), kwargs={"cooldown": 15}, daemon=True).start()
+    # Start listener; if mic/PyAudio missing, it auto-falls-back to simulation.
+    # With a multi-channel input, MIC_DIRECTIONS names the approach of each channel.
+    Thread(target=start_siren_listener, args=(on_siren_detect,),
+           kwargs={"cooldown": 15, "directions": MIC_DIRECTIONS}, daemon=True).start()
+
+    # 3) CAMERA WORKERS (one process per configured source / approach)
+    cameras = load_camera_config(CAMERAS_FILE)
+    if cameras:
+        camera_service = CameraService(cameras, lambda d: on_siren_detect(d, source='camera'),
+                                       cooldown=15, store=camera_store).start()
+
+    # 4) deferred imports, once the server is up (captures run in this process)
+    warm_up_capture_path()
+
+def _intersection_call(iid, method, *args):
+    return getattr(registry.handle(iid), method)(*args)
+
+def run_authority():
+    """Authority process: background services + snapshot + IPC server; blocks forever."""
+    global status_snapshot
+    status_snapshot = SnapshotBuffer.create(SNAPSHOT_NAME)
+    _publish_status()
+    handlers = {
+        'set_mode': controller.set_mode,
+        'set_timer': controller.set_timer,
+        'set_yellow': controller.set_yellow,
+        'set_emergency': controller.set_emergency,
+        'update_settings': lambda changes: traffic_settings.update(**changes),
+        'wake': scheduler.wake,
+        'scheduler_stats': scheduler.stats,
+        'camera_stats': lambda: camera_service.stats() if camera_service else {'cameras': []},
+        'preemption': preemption.stats,
+        'submit_image_job': image_jobs.submit,
+        'image_job': image_jobs.get,
+        'image_job_stats': image_jobs.stats,
+        'capture_stats': lambda: {'captures': capture_store.stats(), 'camera': camera_store.stats()},
+        'metrics': lambda: METRICS.render(skip_empty=True),
+        'corridor': corridor_status,
+        'apply_corridor': apply_corridor,
+        'clear_corridor': clear_corridor,
+        'phase_plan': phase_plan_status,
+        'apply_phase_plan': apply_phase_plan,
+        'intersection_ids': lambda: list(registry.ids),
+        'add_intersection': registry.add,
+        'intersection': _intersection_call,
+    }
+    ControllerServer(IPC_ADDRESS, IPC_AUTHKEY, handlers).start()
+    start_background_services()
+    try:
+        while True:
+            time.sleep(3600)
+    finally:
+        traffic_settings.flush()
+        status_snapshot.close()
 
+# -------------------- RUN APP --------------------
+if __name__ == '__main__':
+    start_background_services()
     app.run(debug=True)
@@ -1,41 +1,279 @@
-import cv2
+"""
+Red-light (emergency beacon) detector for camera feeds.
+
+Frames flow through a four-stage pipeline, each stage on its own thread with
+a bounded queue in between:
+
+    capture -> preprocess -> detect -> persist
+
+- capture   grabs frames as fast as the source delivers them; for live
+            devices a full queue drops the *oldest* frame so detection always
+            works on fresh frames (files block instead, nothing is skipped)
+- preprocess optional ROI crop + downscale, then BGR -> HSV
+- detect    red masks + pixel count against a threshold scaled to the
+            processed area
+- persist   writes the full-resolution JPEG of matches off the hot path
+
+Works with a device index (0), a video file path, or any URL OpenCV accepts.
+Per-frame processing time (preprocess + detect), detections and dropped
+frames are exported at /metrics, labelled with the approach.
+
+Usage:
+    from camera_detection import detect_emergency_vehicle
+    for direction in detect_emergency_vehicle():      # 'north' or None per frame
+        ...
+
+    pipe = DetectionPipeline("recorded.mp4", scale=0.5).start()
+    for frame_no, hit, red_pixels in pipe.results():
+        ...
+"""
+
 import os
 import datetime
+import queue
+import threading
+import time
 
-def detect_emergency_vehicle():
-    cam = cv2.VideoCapture(0)
-    if not cam.isOpened():
-        print("Error: Camera not accessible")
-        return
+from lazy_imports import lazy_module
+from metrics import Counter, Histogram
 
-    capture_folder = 'static/captures'
-    os.makedirs(capture_folder, exist_ok=True)
+cv2 = lazy_module("cv2")
 
-    print("Starting camera detection...")
+CAPTURE_FOLDER = 'static/captures'
+RED_THRESHOLD = 5000  # red pixels at full resolution
+
+# HSV ranges for red (hue wraps around 0/180)
+LOWER_RED1, UPPER_RED1 = (0, 120, 70), (10, 255, 255)
+LOWER_RED2, UPPER_RED2 = (170, 120, 70), (180, 255, 255)
+
+_END = object()
+STOP_POLL = 0.1  # s a blocked queue operation waits before re-checking stop()
+
+FRAME_SECONDS = Histogram("smarttraffic_camera_frame_seconds",
+                          "Preprocess + red detection time per frame", ("direction",),
+                          buckets=(0.001, 0.0025, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.25, 0.5))
+FRAMES_TOTAL = Counter("smarttraffic_camera_frames_total", "Frames processed", ("direction",))
+DETECTIONS_TOTAL = Counter("smarttraffic_camera_detections_total",
+                     "Frames with an emergency light", ("direction",))
+DROPPED_TOTAL = Counter("smarttraffic_camera_frames_dropped_total",
+                  "Frames (or matches) dropped under backpressure", ("direction", "reason"))
+
+
+def red_pixel_count(hsv):
+    """Number of red pixels in an HSV frame."""
+    mask = cv2.inRange(hsv, LOWER_RED1, UPPER_RED1)
+    mask |= cv2.inRange(hsv, LOWER_RED2, UPPER_RED2)
+    return cv2.countNonZero(mask)
+
+
+def preprocess(frame, scale=1.0, roi=None):
+    """Crop to roi=(x, y, w, h), downscale by `scale`, convert to HSV."""
+    if roi is not None:
+        x, y, w, h = roi
+        frame = frame[y:y + h, x:x + w]
+    if scale != 1.0:
+        frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
 
-    while True:
-        ret, frame = cam.read()
-        if not ret:
-            break
 
-        # Dummy detection logic: Detect red color (simulate emergency light)
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        lower_red = (0, 120, 70)
-        upper_red = (10, 255, 255)
-        mask1 = cv2.inRange(hsv, lower_red, upper_red)
+class DetectionPipeline:
+    def __init__(self, source=0, direction='north', scale=1.0, roi=None,
+                 threshold=RED_THRESHOLD, queue_size=4, drop_stale=None,
+                 capture_folder=CAPTURE_FOLDER, save_matches=True, store=None):
+        """
+        source      : device index, video file path or stream URL
+        scale, roi  : preprocessing (threshold is scaled to the processed area)
+        drop_stale  : drop oldest frames under backpressure; default True for
+                      live devices / URLs, False for local files
+        store       : optional capture_store.CaptureStore for matches (else
+                      timestamped files in capture_folder)
+        """
+        self.source = source
+        self.direction = direction
+        self.scale = scale
+        self.roi = roi
+        self.threshold = threshold
+        self.capture_folder = capture_folder
+        self.save_matches = save_matches
+        self.store = store
+        if drop_stale is None:
+            drop_stale = not (isinstance(source, str) and os.path.isfile(source))
+        self.drop_stale = drop_stale
 
-        lower_red2 = (170, 120, 70)
-        upper_red2 = (180, 255, 255)
-        mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
+        self._frames = queue.Queue(maxsize=queue_size)
+        self._hsv = queue.Queue(maxsize=queue_size)
+        self._out = queue.Queue(maxsize=queue_size * 4)
+        self._persist = queue.Queue(maxsize=queue_size * 4)
+        self._stop = threading.Event()
+        self._threads = []
+        self._frame_seconds = FRAME_SECONDS.labels(direction)
+        self._frames_metric = FRAMES_TOTAL.labels(direction)
+        self._detections_metric = DETECTIONS_TOTAL.labels(direction)
+        self._stale_metric = DROPPED_TOTAL.labels(direction, "stale")
+        self._persist_metric = DROPPED_TOTAL.labels(direction, "persist")
 
-        mask = mask1 + mask2
-        red_detected = cv2.countNonZero(mask)
+        self.captured = 0
+        self.dropped = 0
+        self.processed = 0
+        self.detections = 0
+        self.saved = 0
+        self.persist_dropped = 0
 
-        if red_detected > 5000:
+    # -------------------- lifecycle --------------------
+    def start(self):
+        cam = cv2.VideoCapture(self.source)
+        if not cam.isOpened():
+            raise IOError(f"camera/video source not accessible: {self.source!r}")
+        if self.save_matches:
+            os.makedirs(self.capture_folder, exist_ok=True)
+        stages = [(self._capture_loop, (cam,)), (self._preprocess_loop, ()),
+                  (self._detect_loop, ()), (self._persist_loop, ())]
+        for target, args in stages:
+            t = threading.Thread(target=target, args=args, daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        """Stop every stage; blocked puts / gets notice within STOP_POLL."""
+        self._stop.set()
+
+    def join(self, timeout=None):
+        for t in self._threads:
+            t.join(timeout)
+
+    def results(self):
+        """Yield (frame_no, direction or None, red_pixels) until the source ends."""
+        while True:
+            item = self._get(self._out)
+            if item is _END:
+                return
+            yield item
+
+    def stats(self):
+        return {
+            "captured": self.captured, "dropped": self.dropped,
+            "processed": self.processed, "detections": self.detections,
+            "saved": self.saved, "persist_dropped": self.persist_dropped,
+        }
+
+    # -------------------- stages --------------------
+    def _put(self, q, item):
+        """Bounded put; drops the oldest entry instead of blocking if configured."""
+        if not self.drop_stale:
+            self._put_wait(q, item)
+            return
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    self.dropped += 1
+                    self._stale_metric.inc()
+                except queue.Empty:
+                    pass
+
+    def _put_wait(self, q, item):
+        """Blocking put that gives up (returns False) once stop() was called."""
+        while True:
+            try:
+                q.put(item, timeout=STOP_POLL)
+                return True
+            except queue.Full:
+                if self._stop.is_set():
+                    return False
+
+    def _get(self, q):
+        """Blocking get; _END once stop() was called and `q` is empty."""
+        while True:
+            try:
+                return q.get(timeout=STOP_POLL)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return _END
+
+    def _capture_loop(self, cam):
+        try:
+            while not self._stop.is_set():
+                ret, frame = cam.read()
+                if not ret:
+                    break
+                self.captured += 1
+                self._put(self._frames, (self.captured, frame))
+        finally:
+            cam.release()
+            self._put(self._frames, _END)
+
+    def _preprocess_loop(self):
+        while True:
+            item = self._get(self._frames)
+            if item is _END:
+                self._put_wait(self._hsv, _END)
+                return
+            frame_no, frame = item
+            start = time.perf_counter()
+            hsv = preprocess(frame, self.scale, self.roi)
+            self._put_wait(self._hsv, (frame_no, frame, hsv, time.perf_counter() - start))
+
+    def _detect_loop(self):
+        threshold = self.threshold * self.scale * self.scale
+        while True:
+            item = self._get(self._hsv)
+            if item is _END:
+                self._put_wait(self._persist, _END)
+                self._put(self._out, _END)
+                return
+            frame_no, frame, hsv, spent = item
+            start = time.perf_counter()
+            red = red_pixel_count(hsv)
+            self._frame_seconds.observe(spent + time.perf_counter() - start)
+            self.processed += 1
+            self._frames_metric.inc()
+            hit = red > threshold
+            if hit:
+                self.detections += 1
+                self._detections_metric.inc()
+                if self.save_matches:
+                    try:
+                        self._persist.put_nowait((frame_no, frame))
+                    except queue.Full:
+                        self.persist_dropped += 1
+                        self._persist_metric.inc()
+            self._put(self._out, (frame_no, self.direction if hit else None, red))
+
+    def _persist_loop(self):
+        while True:
+            item = self._get(self._persist)
+            if item is _END:
+                return
+            frame_no, frame = item
+            if self.store is not None:
+                ok, buf = cv2.imencode(".jpg", frame)
+                if ok:
+                    name = self.store.put(f"emergency_{self.direction}", buf.tobytes(), "jpg")
+                    self.saved += 1
+                    print(f"Emergency vehicle detected! Image saved as {name}")
+                continue
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{capture_folder}/emergency_{timestamp}.jpg"
-            cv2.imwrite(filename, frame)
-            print(f"Emergency vehicle detected! Image saved as {filename}")
-            yield 'north'  # Simulate direction
-        else:
-            yield None
+            filename = f"{self.capture_folder}/emergency_{timestamp}_{frame_no}.jpg"
+            if cv2.imwrite(filename, frame):
+                self.saved += 1
+                print(f"Emergency vehicle detected! Image saved as {filename}")
+
+
+def detect_emergency_vehicle(source=0, direction='north', **pipeline_kwargs):
+    """Yield `direction` for frames with an emergency light, None otherwise."""
+    try:
+        pipe = DetectionPipeline(source, direction=direction, **pipeline_kwargs).start()
+    except IOError:
+        print("Error: Camera not accessible")
+        return
+
+    print("Starting camera detection...")
+    try:
+        for _, hit, _ in pipe.results():
+            yield hit
+    finally:
+        pipe.stop()
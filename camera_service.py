@@ -0,0 +1,318 @@
+"""
+Multi-camera emergency-light detection on a process pool.
+
+One worker process per configured video source (device index, file path or
+stream URL), each mapped to the approach it watches:
+
+    [{"source": 0, "direction": "north"},
+     {"source": "rtsp://cam-east/live", "direction": "east", "scale": 0.5}]
+
+Workers capture, preprocess and count red pixels on their own core. Frames
+never cross the process boundary pickled: every worker owns a small ring of
+shared-memory frame slots; on a hit it copies the frame into a free slot and
+posts only (worker, slot, frame_no, red_pixels) on the result queue. The
+parent's dispatcher thread turns hits into on_detect(direction) calls (with a
+per-direction cooldown) and writes the matched frame from shared memory.
+
+Frames are resized to the slot size (640x360 unless configured); the red
+pixel threshold and roi are given in source pixels, as for
+camera_detection, and are scaled by the same factors so a resize never
+changes a camera's sensitivity.
+
+Workers are spawned with an empty __main__: spawn would otherwise re-run
+the parent's main script in every worker (under `python app.py`, the whole
+app setup: event log, controller, settings, legacy-log import).
+
+Workers count frames and bucket their per-frame processing time into
+shared counters; on each /metrics scrape the parent folds the increments
+into the camera_detection metrics, so both detectors export the same series.
+
+Usage:
+    from camera_service import CameraService, load_camera_config
+    service = CameraService(load_camera_config('cameras.json'), controller.set_emergency)
+    service.start()
+"""
+
+import contextlib
+import datetime
+import json
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+import types
+from bisect import bisect_left
+from multiprocessing import shared_memory
+
+from camera_detection import (CAPTURE_FOLDER, DETECTIONS_TOTAL, DROPPED_TOTAL, FRAME_SECONDS,
+                              FRAMES_TOTAL, RED_THRESHOLD, preprocess, red_pixel_count)
+from lazy_imports import lazy_module
+from metrics import REGISTRY
+
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+
+FRAME_SIZE = (640, 360)  # (width, height) frames are resized to in the workers
+SLOTS = 4                # shared-memory frame slots per worker
+
+# indexes into each worker's shared counters: totals, then the per-frame
+# processing time (ns) and its histogram buckets (FRAME_SECONDS bounds + +Inf)
+CAPTURED, PROCESSED, DETECTIONS, SLOT_DROPPED, FRAME_NS, BUCKETS = range(6)
+N_COUNTERS = BUCKETS + len(FRAME_SECONDS.buckets) + 1
+
+
+def load_camera_config(path):
+    """List of camera dicts from a JSON file ([] if missing or unreadable)."""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r') as f:
+            return list(json.load(f))
+    except Exception as e:
+        print("[cameras] config error:", e)
+        return []
+
+
+@contextlib.contextmanager
+def _bare_main():
+    """Processes started inside see an empty __main__, so spawn re-imports nothing."""
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+def _fit_to_frame(source_shape, shape, roi, threshold):
+    """roi / threshold given in source pixels, rescaled to the resized frame."""
+    sy, sx = shape[0] / float(source_shape[0]), shape[1] / float(source_shape[1])
+    if roi is not None:
+        x, y, w, h = roi
+        roi = (int(x * sx), int(y * sy), max(1, int(w * sx)), max(1, int(h * sy)))
+    return roi, threshold * sx * sy
+
+
+def _camera_worker(wid, source, shm_name, shape, slots, free_slots, results, counters,
+                   stop, scale, roi, threshold):
+    """Worker process: capture -> preprocess -> detect, hits go to shared memory."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((slots,) + shape, dtype=np.uint8, buffer=shm.buf)
+    height, width = shape[:2]
+    threshold = threshold * scale * scale
+    source_shape, frame_roi, frame_threshold = None, roi, threshold
+    bounds = FRAME_SECONDS.buckets
+    cam = cv2.VideoCapture(source)
+    try:
+        if not cam.isOpened():
+            results.put(("error", wid, f"camera/video source not accessible: {source!r}"))
+            return
+        while not stop.is_set():
+            ret, frame = cam.read()
+            if not ret:
+                break
+            counters[CAPTURED] += 1
+            start = time.perf_counter_ns()
+            if frame.shape[:2] != source_shape:
+                source_shape = frame.shape[:2]
+                frame_roi, frame_threshold = _fit_to_frame(source_shape, shape, roi, threshold)
+            if source_shape != (height, width):
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            red = red_pixel_count(preprocess(frame, scale, frame_roi))
+            spent = time.perf_counter_ns() - start
+            counters[FRAME_NS] += spent
+            counters[BUCKETS + bisect_left(bounds, spent / 1e9)] += 1
+            counters[PROCESSED] += 1
+            if red <= frame_threshold:
+                continue
+            counters[DETECTIONS] += 1
+            try:
+                slot = free_slots.get_nowait()
+                ring[slot] = frame
+            except queue.Empty:
+                # parent is still busy with every slot: report without a frame
+                slot = -1
+                counters[SLOT_DROPPED] += 1
+            results.put(("hit", wid, slot, counters[CAPTURED], red))
+    finally:
+        cam.release()
+        del ring
+        shm.close()
+        results.put(("end", wid))
+
+
+class _Worker:
+    def __init__(self, wid, cfg, ctx, results, stop):
+        self.wid = wid
+        self.source = cfg["source"]
+        self.direction = str(cfg["direction"]).lower()
+        width, height = cfg.get("width", FRAME_SIZE[0]), cfg.get("height", FRAME_SIZE[1])
+        self.shape = (int(height), int(width), 3)
+        self.slots = int(cfg.get("slots", SLOTS))
+        self.shm = shared_memory.SharedMemory(create=True,
+                                              size=self.slots * int(np.prod(self.shape)))
+        self.ring = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+        self.free_slots = ctx.Queue()
+        for s in range(self.slots):
+            self.free_slots.put(s)
+        self.counters = ctx.Array('q', N_COUNTERS, lock=False)
+        self.exported = [0] * N_COUNTERS  # counter values already folded into /metrics
+        roi = cfg.get("roi")
+        self.process = ctx.Process(
+            target=_camera_worker,
+            args=(wid, self.source, self.shm.name, self.shape, self.slots, self.free_slots,
+                  results, self.counters, stop, float(cfg.get("scale", 1.0)),
+                  tuple(roi) if roi else None, cfg.get("threshold", RED_THRESHOLD)),
+            daemon=True)
+        self.running = False
+
+    def release(self):
+        del self.ring
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class CameraService:
+    def __init__(self, cameras, on_detect, cooldown=15, capture_folder=CAPTURE_FOLDER,
+                 save_matches=True, store=None):
+        """
+        cameras   : list of {"source", "direction", optional "scale", "roi",
+                    "threshold", "width", "height", "slots"}
+        on_detect : callable(direction), e.g. controller.set_emergency
+        cooldown  : seconds before the same direction can trigger again
+        store     : optional capture_store.CaptureStore matched frames go to
+                    (content-addressed, disk-budgeted) instead of capture_folder
+        """
+        self.cameras = list(cameras)
+        self.on_detect = on_detect
+        self.cooldown = cooldown
+        self.capture_folder = capture_folder
+        self.save_matches = save_matches
+        self.store = store
+
+        # spawn: OpenCV capture backends are not fork-safe
+        self._ctx = mp.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._stop = self._ctx.Event()
+        self._workers = []
+        self._dispatcher = None
+        self._last_trigger = {}
+        self._export_lock = threading.Lock()
+
+        self.triggers = 0
+        self.saved = 0
+        self.errors = []
+
+    # -------------------- lifecycle --------------------
+    def start(self):
+        if self.save_matches:
+            os.makedirs(self.capture_folder, exist_ok=True)
+        for wid, cfg in enumerate(self.cameras):
+            w = _Worker(wid, cfg, self._ctx, self._results, self._stop)
+            with _bare_main():
+                w.process.start()
+            w.running = True
+            self._workers.append(w)
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+        REGISTRY.on_collect(self._export_metrics)
+        print(f"[cameras] {len(self._workers)} detection worker(s) started")
+        return self
+
+    def stop(self, timeout=5):
+        REGISTRY.remove_collect(self._export_metrics)
+        self._stop.set()
+        for w in self._workers:
+            w.process.join(timeout)
+            if w.process.is_alive():
+                w.process.terminate()
+        self._results.put(None)
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout)
+        for w in self._workers:
+            w.release()
+
+    def stats(self):
+        return {
+            "triggers": self.triggers,
+            "saved": self.saved,
+            "errors": list(self.errors),
+            "cameras": [{
+                "source": w.source,
+                "direction": w.direction,
+                "running": w.running,
+                "captured": w.counters[CAPTURED],
+                "processed": w.counters[PROCESSED],
+                "detections": w.counters[DETECTIONS],
+                "slot_dropped": w.counters[SLOT_DROPPED],
+            } for w in self._workers],
+        }
+
+    def _export_metrics(self):
+        """Fold worker counter increments since the last scrape into /metrics."""
+        with self._export_lock:
+            for w in self._workers:
+                now = list(w.counters)
+                delta = [a - b for a, b in zip(now, w.exported)]
+                w.exported = now
+                if delta[PROCESSED]:
+                    FRAMES_TOTAL.labels(w.direction).inc(delta[PROCESSED])
+                    FRAME_SECONDS.labels(w.direction).merge(delta[BUCKETS:], delta[FRAME_NS] / 1e9)
+                if delta[DETECTIONS]:
+                    DETECTIONS_TOTAL.labels(w.direction).inc(delta[DETECTIONS])
+                if delta[SLOT_DROPPED]:
+                    DROPPED_TOTAL.labels(w.direction, "slot").inc(delta[SLOT_DROPPED])
+
+    # -------------------- dispatcher --------------------
+    def _dispatch_loop(self):
+        while True:
+            msg = self._results.get()
+            if msg is None:
+                return
+            kind, wid = msg[0], msg[1]
+            w = self._workers[wid]
+            if kind == "hit":
+                _, _, slot, frame_no, _red = msg
+                if slot >= 0:
+                    try:
+                        self._persist(w, slot, frame_no)
+                    finally:
+                        w.free_slots.put(slot)
+                self._trigger(w.direction)
+            elif kind == "error":
+                self.errors.append(msg[2])
+                print("[cameras]", msg[2])
+            elif kind == "end":
+                w.running = False
+
+    def _trigger(self, direction):
+        now = time.monotonic()
+        last = self._last_trigger.get(direction)
+        if last is not None and now - last < self.cooldown:
+            return
+        self._last_trigger[direction] = now
+        self.triggers += 1
+        print(f"[cameras] Emergency light detected on {direction}")
+        try:
+            self.on_detect(direction)
+        except Exception as e:
+            print("[cameras] trigger error:", e)
+
+    def _persist(self, w, slot, frame_no):
+        if not self.save_matches:
+            return
+        if self.store is not None:
+            ok, buf = cv2.imencode(".jpg", w.ring[slot])
+            if ok:
+                self.store.put(f"emergency_{w.direction}", buf.tobytes(), "jpg")
+                self.saved += 1
+            return
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{self.capture_folder}/emergency_{w.direction}_{timestamp}_{frame_no}.jpg"
+        if cv2.imwrite(filename, w.ring[slot]):
+            self.saved += 1
@@ -0,0 +1,276 @@
+"""
+Disk-budgeted, content-addressed storage for captured images.
+
+Files are named <kind>_<sha256 prefix>.<ext> from their bytes, so two
+captures in the same second can no longer overwrite each other and storing
+the same image twice is a no-op. The stem is the stable id: when an old
+lossless file is re-encoded the extension changes, and lookups by the
+original name still resolve.
+
+A maintenance thread (one per folder, started only in the process that owns
+the sensors) periodically:
+
+- re-encodes lossless images older than `compact_after` to WebP (JPEG where
+  Pillow lacks WebP), keeping the smaller of the two,
+- deletes files older than `max_age`,
+- evicts least-recently-used files (and their thumbnails) while the folder
+  is above `budget_bytes`, down to `low_water` of it.
+
+Recency is the file's atime, set explicitly when a file is served (at most
+once per `touch_interval`) so it works on noatime mounts and across worker
+processes. Thumbnails are cached in <folder>/.thumbs per (stem, size).
+
+Usage:
+    from capture_store import CaptureStore
+    store = CaptureStore('captured_images', budget_bytes=512 << 20).start()
+    name = store.put('capture', png_bytes)          # 'capture_3f9a...e1.png'
+    path = store.path_for(name)                     # after compaction: .webp
+    thumb = store.thumbnail(name, 320)
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+
+from lazy_imports import lazy_module
+
+Image = lazy_module("PIL.Image")
+features = lazy_module("PIL.features")
+
+LOSSLESS = (".png", ".bmp")
+EXTENSIONS = (".png", ".webp", ".jpg", ".jpeg", ".bmp")
+THUMB_SIZES = (160, 320, 640)
+THUMB_DIR = ".thumbs"
+
+
+def sniff_ext(data):
+    """File extension from the image magic bytes (png when unknown)."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:2] == b"BM":
+        return "bmp"
+    return "png"
+
+
+class CaptureStore:
+    def __init__(self, folder, budget_bytes=512 << 20, max_age=None, compact_after=3600,
+                 quality=80, low_water=0.9, interval=60, touch_interval=600):
+        """
+        budget_bytes   : disk budget for originals + thumbnails
+        max_age        : seconds a file is kept at most (None = until evicted)
+        compact_after  : seconds before a lossless image is re-encoded (None = never)
+        """
+        self.folder = folder
+        self.thumb_folder = os.path.join(folder, THUMB_DIR)
+        self.budget_bytes = int(budget_bytes)
+        self.max_age = max_age
+        self.compact_after = compact_after
+        self.quality = quality
+        self.low_water = low_water
+        self.interval = interval
+        self.touch_interval = touch_interval
+        self._compact_format = None
+        os.makedirs(self.thumb_folder, exist_ok=True)
+
+        self._wake = threading.Event()
+        self._thread = None
+        self._skip_compact = set()  # stems whose re-encode was not smaller
+
+        self.stored = 0
+        self.deduplicated = 0
+        self.compacted = 0
+        self.compact_saved = 0
+        self.evicted = 0
+        self.bytes_used = 0
+
+    @property
+    def compact_format(self):
+        """(Pillow format, extension) for re-encoded files; probed on first compaction."""
+        if self._compact_format is None:
+            webp = features.check("webp")
+            self._compact_format = ("WEBP", ".webp") if webp else ("JPEG", ".jpg")
+        return self._compact_format
+
+    # -------------------- writing --------------------
+    def put(self, kind, data, ext=None):
+        """Store encoded image bytes; returns the content-addressed file name."""
+        ext = (ext or sniff_ext(data)).lstrip(".").lower()
+        stem = f"{kind}_{hashlib.sha256(data).hexdigest()[:24]}"
+        if self._resolve(stem) is not None:
+            self.deduplicated += 1
+            return f"{stem}.{ext}"
+        name = f"{stem}.{ext}"
+        path = os.path.join(self.folder, name)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.stored += 1
+        self.bytes_used += len(data)
+        if self.bytes_used > self.budget_bytes:
+            self._wake.set()
+        return name
+
+    # -------------------- reading --------------------
+    def _resolve(self, stem):
+        for ext in EXTENSIONS:
+            path = os.path.join(self.folder, stem + ext)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def path_for(self, name):
+        """Current path of a stored file (by name or stem), or None."""
+        name = os.path.basename(name)
+        if not name or name.startswith("."):
+            return None
+        path = os.path.join(self.folder, name)
+        if os.path.isfile(path):
+            return path
+        return self._resolve(os.path.splitext(name)[0])
+
+    def touch(self, path):
+        """Mark a file as recently used (for LRU eviction)."""
+        try:
+            st = os.stat(path)
+            now = time.time()
+            if now - st.st_atime > self.touch_interval:
+                os.utime(path, (now, st.st_mtime))
+        except OSError:
+            pass
+
+    def thumbnail(self, name, size=320):
+        """Path of a cached JPEG thumbnail (size snapped to THUMB_SIZES), or None."""
+        src = self.path_for(name)
+        if src is None:
+            return None
+        size = min(THUMB_SIZES, key=lambda s: abs(s - int(size)))
+        stem = os.path.splitext(os.path.basename(src))[0]
+        path = os.path.join(self.thumb_folder, f"{stem}_{size}.jpg")
+        if os.path.isfile(path):
+            return path
+        with Image.open(src) as img:
+            img.draft("RGB", (size, size))  # JPEG: decode at reduced scale
+            img = img.convert("RGB")
+            img.thumbnail((size, size))
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            img.save(tmp, "JPEG", quality=80)
+        os.replace(tmp, path)
+        return path
+
+    # -------------------- maintenance --------------------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            try:
+                self.maintain()
+            except Exception as e:
+                print("[captures] maintenance error:", e)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _scan(self, now=None):
+        """[(path, size, atime, mtime)] for originals and thumbnails."""
+        entries = []
+        for folder in (self.folder, self.thumb_folder):
+            with os.scandir(folder) as it:
+                for e in it:
+                    if not e.is_file():
+                        continue
+                    st = e.stat()
+                    if e.name.endswith(".tmp"):
+                        # left behind by a crashed writer
+                        if now is not None and now - st.st_mtime > 3600:
+                            self._unlink(e.path)
+                        continue
+                    entries.append((e.path, st.st_size, max(st.st_atime, st.st_mtime), st.st_mtime))
+        return entries
+
+    def _compact(self, path, mtime):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if stem in self._skip_compact:
+            return 0
+        fmt, ext = self.compact_format
+        st = os.stat(path)  # before reading: decoding may bump atime
+        with Image.open(path) as img:
+            buf = io.BytesIO()
+            img.convert("RGB").save(buf, fmt, quality=self.quality)
+        data = buf.getvalue()
+        old_size = st.st_size
+        if len(data) >= old_size:
+            self._skip_compact.add(stem)
+            return 0
+        new = os.path.join(self.folder, stem + ext)
+        tmp = new + ".tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.utime(tmp, (st.st_atime, mtime))
+        os.replace(tmp, new)
+        os.remove(path)
+        self.compacted += 1
+        return old_size - len(data)
+
+    def _unlink(self, path):
+        """Delete one file; returns the bytes freed (0 if already gone)."""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def _remove(self, path):
+        """Delete a file (and, for an original, its thumbnails); returns bytes freed."""
+        freed = self._unlink(path)
+        if freed and os.path.dirname(path) == self.folder:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            for size in THUMB_SIZES:
+                freed += self._unlink(os.path.join(self.thumb_folder, f"{stem}_{size}.jpg"))
+            self.evicted += 1
+        return freed
+
+    def maintain(self, now=None):
+        """One pass: compact old lossless files, expire by age, evict to budget."""
+        now = time.time() if now is None else now
+        if self.compact_after is not None:
+            for path, _, _, mtime in self._scan():
+                if (os.path.dirname(path) == self.folder and path.lower().endswith(LOSSLESS)
+                        and now - mtime > self.compact_after):
+                    try:
+                        self.compact_saved += self._compact(path, mtime)
+                    except Exception as e:
+                        print(f"[captures] could not re-encode {path}:", e)
+                        self._skip_compact.add(os.path.splitext(os.path.basename(path))[0])
+
+        entries = self._scan(now)
+        if self.max_age is not None:
+            for path, _, _, mtime in entries:
+                if now - mtime > self.max_age:
+                    self._remove(path)
+            entries = self._scan()
+
+        used = sum(size for _, size, _, _ in entries)
+        if used > self.budget_bytes:
+            target = self.budget_bytes * self.low_water
+            for path, _, _, _ in sorted(entries, key=lambda e: e[2]):
+                if used <= target:
+                    break
+                used -= self._remove(path)
+        self.bytes_used = used
+
+    def stats(self):
+        return {"folder": self.folder, "bytes_used": self.bytes_used,
+                "budget_bytes": self.budget_bytes, "stored": self.stored,
+                "deduplicated": self.deduplicated, "compacted": self.compacted,
+                "compact_saved_bytes": self.compact_saved, "evicted": self.evicted}
@@ -0,0 +1,345 @@
+"""
+IPC between the controller authority process and HTTP worker processes.
+
+In production there is exactly one process that owns the TrafficController,
+the intersection registry, the settings store and the sensor listeners
+(the "authority"). Any number of HTTP workers talk to it:
+
+- status reads come from a shared-memory snapshot the authority rewrites
+  on every tick (seqlock: even sequence = stable, odd = being written), so
+  /get_status never leaves the worker and never blocks on the authority;
+- commands (set_mode, set_timer, set_emergency, settings updates, ...) are
+  small pickled calls over a Unix socket (multiprocessing.connection with an
+  authkey), applied by the authority through the normal controller API.
+
+The Remote* classes give workers the same interface app.py already uses on
+the real objects, so routes do not care which process they run in.
+
+Usage (authority):
+    snapshot = SnapshotBuffer.create(SNAPSHOT_NAME)
+    snapshot.write(payload)                          # each tick
+    ControllerServer(address, authkey, handlers).start()
+
+Usage (worker):
+    ipc = ControllerClient(address, authkey)
+    controller = RemoteController(ipc, SnapshotBuffer.attach(SNAPSHOT_NAME))
+"""
+
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener
+
+_HEADER = struct.Struct("QI")  # sequence, payload length
+_DATA = 16
+
+
+def _attach_shm(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # Older Pythons register attached segments with the resource tracker,
+        # which would unlink the authority's segment when a worker exits.
+        from multiprocessing import resource_tracker
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+class SnapshotBuffer:
+    """Single-writer, many-reader JSON snapshot in shared memory."""
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self._seq = 0
+        self._cached_seq = None
+        self._cached = {}
+
+    @classmethod
+    def create(cls, name, size=1 << 16):
+        try:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _HEADER.pack_into(shm.buf, 0, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_attach_shm(name), owner=False)
+
+    def write(self, payload):
+        data = json.dumps(payload, separators=(",", ":")).encode()
+        if len(data) > self.shm.size - _DATA:
+            raise ValueError(f"snapshot of {len(data)} bytes does not fit")
+        buf = self.shm.buf
+        self._seq += 1  # odd: readers retry
+        _HEADER.pack_into(buf, 0, self._seq, 0)
+        buf[_DATA:_DATA + len(data)] = data
+        self._seq += 1
+        _HEADER.pack_into(buf, 0, self._seq, len(data))
+
+    def read(self, spins=1000):
+        """Latest snapshot dict (decoded once per version); {} before the first write."""
+        buf = self.shm.buf
+        for _ in range(spins):
+            seq, length = _HEADER.unpack_from(buf, 0)
+            if seq == self._cached_seq:
+                return self._cached
+            if seq & 1:
+                continue
+            data = bytes(buf[_DATA:_DATA + length])
+            if _HEADER.unpack_from(buf, 0)[0] != seq:
+                continue
+            self._cached = json.loads(data) if length else {}
+            self._cached_seq = seq
+            return self._cached
+        return self._cached
+
+    def version(self):
+        return _HEADER.unpack_from(self.shm.buf, 0)[0]
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+# -------------------- command channel --------------------
+_ERRORS = {"ValueError": ValueError, "KeyError": KeyError, "TypeError": TypeError,
+           "Full": queue.Full}
+
+
+class ControllerServer:
+    def __init__(self, address, authkey, handlers):
+        """handlers: {name: callable(*args, **kwargs)} run in the authority."""
+        self.address = address
+        self.authkey = authkey
+        self.handlers = handlers
+        self._listener = None
+        self.calls = 0
+
+    def start(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        print(f"[ipc] controller authority listening on {self.address}")
+        return self
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                print("[ipc] accept error:", e)
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    name, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                self.calls += 1
+                try:
+                    fn = self.handlers[name]
+                except KeyError:
+                    conn.send(("error", "KeyError", f"unknown command {name!r}"))
+                    continue
+                try:
+                    reply = ("ok", fn(*args, **kwargs))
+                except Exception as e:
+                    reply = ("error", type(e).__name__, str(e))
+                try:
+                    conn.send(reply)
+                except OSError:
+                    return  # the client gave up (timed out) and closed its end
+
+
+class ControllerClient:
+    """Per-thread connection to the authority; call(name, *args) -> result."""
+
+    def __init__(self, address, authkey, timeout=5.0):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        return conn
+
+    def _drop(self):
+        conn, self._local.conn = getattr(self._local, "conn", None), None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def call(self, name, *args, **kwargs):
+        """
+        Retried once on a fresh connection only if the old one failed before
+        the command was sent (authority restarted); once sent, a command is
+        never repeated -- a timeout or a lost reply raises.
+        """
+        for attempt in (0, 1):
+            try:
+                conn = self._conn()
+                conn.send((name, args, kwargs))
+            except (EOFError, ConnectionError):
+                self._drop()
+                if attempt:
+                    raise
+                continue
+            try:
+                if not conn.poll(self.timeout):
+                    raise TimeoutError(f"controller authority did not answer {name!r}")
+                reply = conn.recv()
+            except BaseException:
+                self._drop()  # a late reply must not be read as the next call's
+                raise
+            break
+        if reply[0] == "ok":
+            return reply[1]
+        raise _ERRORS.get(reply[1], RuntimeError)(reply[2])
+
+
+# -------------------- worker-side proxies --------------------
+class RemoteController:
+    """TrafficController interface backed by the shared snapshot + IPC."""
+
+    directions = ["north", "east", "south", "west"]
+
+    def __init__(self, ipc, snapshot):
+        self.ipc = ipc
+        self.status = snapshot
+
+    def get_status(self):
+        status = dict(self.status.read())
+        status.pop("settings", None)
+        return status
+
+    def set_mode(self, mode):
+        self.ipc.call("set_mode", mode)
+
+    def set_timer(self, time_val):
+        self.ipc.call("set_timer", time_val)
+
+    def set_yellow(self, time_val):
+        self.ipc.call("set_yellow", time_val)
+
+    def set_emergency(self, direction):
+        self.ipc.call("set_emergency", direction)
+
+
+class RemoteSettings:
+    """SettingsStore interface: reads from the snapshot, updates over IPC."""
+
+    def __init__(self, ipc, snapshot):
+        self.ipc = ipc
+        self.status = snapshot
+
+    def as_dict(self):
+        return dict(self.status.read().get("settings", {}))
+
+    def __getitem__(self, key):
+        return self.as_dict()[key]
+
+    def get(self, key, default=None):
+        return self.as_dict().get(key, default)
+
+    def update(self, **changes):
+        return self.ipc.call("update_settings", changes)
+
+
+class RemoteHandle:
+    def __init__(self, ipc, iid):
+        self.ipc = ipc
+        self.iid = iid
+
+    def _call(self, method, *args):
+        return self.ipc.call("intersection", self.iid, method, *args)
+
+    def get_status(self):
+        return self._call("get_status")
+
+    def set_emergency(self, direction):
+        self._call("set_emergency", direction)
+
+    def set_mode(self, mode):
+        self._call("set_mode", mode)
+
+    def set_timer(self, time_val):
+        self._call("set_timer", time_val)
+
+
+class RemoteRegistry:
+    def __init__(self, ipc):
+        self.ipc = ipc
+
+    @property
+    def ids(self):
+        return self.ipc.call("intersection_ids")
+
+    def __contains__(self, iid):
+        return iid in self.ids
+
+    def handle(self, iid):
+        return RemoteHandle(self.ipc, iid)
+
+    def add(self, iid, **kwargs):
+        return self.ipc.call("add_intersection", iid, **kwargs)
+
+
+class RemoteImageJobs:
+    """image_jobs.ImageJobs interface; the jobs run (and are stored) in the authority."""
+
+    def __init__(self, ipc):
+        self.ipc = ipc
+        # a long poll is split into calls that each answer well inside the IPC timeout
+        self.max_wait = ipc.timeout / 2
+
+    def submit(self, *args):
+        return self.ipc.call("submit_image_job", *args)
+
+    def get(self, job_id, wait=0):
+        deadline = time.monotonic() + wait
+        while True:
+            left = max(0.0, deadline - time.monotonic())
+            job = self.ipc.call("image_job", job_id, min(left, self.max_wait))
+            if job is None or job["status"] in ("ok", "error") or left <= self.max_wait:
+                return job
+
+    def stats(self):
+        return self.ipc.call("image_job_stats")
+
+
+class RemoteScheduler:
+    def __init__(self, ipc):
+        self.ipc = ipc
+
+    def wake(self):
+        self.ipc.call("wake")
+
+    def stats(self):
+        return self.ipc.call("scheduler_stats")
@@ -0,0 +1,238 @@
+"""
+Persistent, queryable event log (SQLite in WAL mode).
+
+Emergencies, phase transitions, mode changes and captures are recorded
+with record(), which only appends to an in-memory queue -- safe to call
+from request threads and the controller tick. A background writer drains
+the queue and commits in batches (one transaction per batch), so disk I/O
+never sits on those paths.
+
+Rows are indexed by time, by (direction, time) and by (kind, time). An
+hourly rollup table is updated in the same transaction, so "emergencies
+per direction per hour" is read from the rollup instead of scanning the
+event table.
+
+Usage:
+    from event_log import EventLog
+    log = EventLog('events.db').start()
+    log.record('emergency', direction='south', source='siren')
+    log.query(kind='emergency', since=time.time() - 3600)
+    log.emergencies_per_hour()
+    log.import_text_log('logs.txt')        # one-time, skipped once imported
+"""
+
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+EMERGENCY, TRANSITION, MODE, CAPTURE = "emergency", "transition", "mode", "capture"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id           INTEGER PRIMARY KEY,
+    ts           REAL NOT NULL,
+    kind         TEXT NOT NULL,
+    direction    TEXT,
+    intersection TEXT,
+    detail       TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_direction_ts ON events (direction, ts);
+CREATE INDEX IF NOT EXISTS events_kind_ts ON events (kind, ts);
+CREATE TABLE IF NOT EXISTS hourly (
+    hour      INTEGER NOT NULL,
+    kind      TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    count     INTEGER NOT NULL,
+    PRIMARY KEY (hour, kind, direction)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_INSERT = "INSERT INTO events (ts, kind, direction, intersection, detail) VALUES (?, ?, ?, ?, ?)"
+_ROLLUP = ("INSERT INTO hourly (hour, kind, direction, count) VALUES (?, ?, ?, ?) "
+           "ON CONFLICT (hour, kind, direction) DO UPDATE SET count = count + excluded.count")
+
+# "[Sat Aug  2 23:19:15 2025] Emergency detected at South"
+_TEXT_LINE = re.compile(r"^\[(?P<ts>[^\]]+)\]\s+Emergency detected at\s+(?P<direction>\w+)")
+
+
+class EventLog:
+    def __init__(self, path, batch_size=256, flush_interval=0.5, max_queue=10000):
+        """
+        batch_size     : max rows per transaction
+        flush_interval : max seconds a recorded event waits before commit
+        max_queue      : events buffered before record() starts dropping
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._q = queue.Queue(maxsize=max_queue)
+        self._local = threading.local()
+        self._thread = None
+
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # -------------------- writing --------------------
+    def start(self):
+        self._thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def record(self, kind, direction=None, intersection=None, ts=None, **detail):
+        """Queue one event; never blocks (drops and counts when saturated)."""
+        row = (time.time() if ts is None else ts, kind,
+               direction.lower() if direction else None, intersection,
+               json.dumps(detail) if detail else None)
+        try:
+            self._q.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=None):
+        """Wait until everything recorded so far is committed."""
+        done = threading.Event()
+        self._q.put(done)
+        return done.wait(timeout)
+
+    def _writer_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._q.get()]
+            # let a burst accumulate, then take everything up to batch_size
+            time.sleep(self.flush_interval)
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in batch if isinstance(item, tuple)]
+            if rows:
+                try:
+                    self._write(conn, rows)
+                except Exception as e:
+                    print("[events] write error:", e)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write(self, conn, rows, meta=None):
+        """Insert rows + hourly rollups (and an optional meta (key, value)) in one transaction."""
+        rollup = {}
+        for ts, kind, direction, _, _ in rows:
+            key = (int(ts // 3600), kind, direction or "")
+            rollup[key] = rollup.get(key, 0) + 1
+        with conn:
+            conn.executemany(_INSERT, rows)
+            conn.executemany(_ROLLUP, [k + (n,) for k, n in rollup.items()])
+            if meta is not None:
+                conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", meta)
+        self.written += len(rows)
+        self.batches += 1
+
+    # -------------------- queries --------------------
+    def query(self, kind=None, direction=None, since=None, until=None, limit=100):
+        """Newest-first events matching the filters (uses the ts indexes)."""
+        where, args = [], []
+        for clause, value in (("kind = ?", kind), ("ts >= ?", since), ("ts < ?", until)):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        if direction is not None:
+            where.append("direction = ?")
+            args.append(direction.lower())
+        sql = "SELECT ts, kind, direction, intersection, detail FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC LIMIT ?"
+        rows = self._reader().execute(sql, args + [int(limit)]).fetchall()
+        return [{"ts": ts, "kind": k, "direction": d, "intersection": i,
+                 **(json.loads(detail) if detail else {})}
+                for ts, k, d, i, detail in rows]
+
+    def per_hour(self, kind=EMERGENCY, since=None, until=None):
+        """[{hour (epoch seconds), direction, count}] from the hourly rollup."""
+        sql = "SELECT hour, direction, count FROM hourly WHERE kind = ?"
+        args = [kind]
+        if since is not None:
+            sql += " AND hour >= ?"
+            args.append(int(since // 3600))
+        if until is not None:
+            sql += " AND hour < ?"
+            args.append(int(-(-until // 3600)))
+        sql += " ORDER BY hour, direction"
+        return [{"hour": h * 3600, "direction": d or None, "count": n}
+                for h, d, n in self._reader().execute(sql, args)]
+
+    def emergencies_per_hour(self, since=None, until=None):
+        return self.per_hour(EMERGENCY, since, until)
+
+    def stats(self):
+        return {"written": self.written, "batches": self.batches,
+                "dropped": self.dropped, "queued": self._q.qsize()}
+
+    # -------------------- import --------------------
+    def import_text_log(self, path):
+        """
+        One-time import of the old free-text logs.txt. Returns rows imported
+        (0 if the file is missing or was imported before).
+        """
+        key = "imported:" + os.path.abspath(path)
+        conn = self._connect()
+        try:
+            if not os.path.exists(path) or conn.execute(
+                    "SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+            rows = [(ts, EMERGENCY, direction, None, json.dumps({"source": "logs.txt"}))
+                    for ts, direction in parse_text_log(path)]
+            # rows and the "imported" marker commit together: a crash can't import twice
+            self._write(conn, rows, meta=(key, str(len(rows))))
+            return len(rows)
+        finally:
+            conn.close()
+
+
+def parse_text_log(path):
+    """Yield (ts, direction) for each detection line of the old logs.txt."""
+    with open(path, 'r') as f:
+        for line in f:
+            m = _TEXT_LINE.match(line.strip())
+            if not m:
+                continue
+            try:
+                ts = time.mktime(time.strptime(m.group("ts"), "%a %b %d %H:%M:%S %Y"))
+            except ValueError:
+                continue
+            yield ts, m.group("direction").lower()
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 4 or sys.argv[1] != "import":
+        sys.exit("usage: python event_log.py import <logs.txt> <events.db>")
+    print(f"imported {EventLog(sys.argv[3]).import_text_log(sys.argv[2])} events")
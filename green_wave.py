@@ -0,0 +1,291 @@
+"""
+Green-wave coordination for a corridor of intersections.
+
+A corridor lists its junctions in order, the distances between them and the
+progression speed. Every junction gets the same cycle length and an offset:
+the time (within the cycle) its outbound approach turns green, so a platoon
+travelling at the progression speed meets green after green. The inbound
+direction gets the largest band the geometry allows at the same time.
+
+Optimizer (two-way bandwidth, MAXBAND-style without the integer program):
+for a candidate cycle C each junction's greens are scaled to C, which fixes
+its outbound green g_i, inbound green h_i and the gap phi_i between the two
+in its ring. Measured from junction 0, the outbound window of junction i
+starts at u_i = offset_i - t_i (t_i = travel time) and its inbound window at
+u_i + delta_i with delta_i = 2 t_i + phi_i. Both bands exist with total
+width B exactly when the circular arcs
+
+    [delta_i - g_i, delta_i - g_i + (g_i + h_i - B)]      (mod C)
+
+share a point, so the best B for C is
+
+    max_j min_i (g_i + h_i - ((c_j - c_i) mod C)),   c_i = delta_i - g_i
+
+-- a sort plus prefix / suffix minima per candidate cycle. The cycle with the largest
+bandwidth / cycle ratio wins and offsets are read back from the arcs
+(centred in their slack). When no cycle admits bands both ways, the
+outbound direction alone is progressed. A 500-junction corridor takes a fraction of a
+second; see green_wave_bench.py.
+
+Controllers follow a CoordinationPlan: whenever an approach turns green
+(normal ring step, or the end of an emergency preemption) its green is
+chosen so it ends where the coordinated schedule says -- cut short to
+min_green when the junction is behind, held up to max_green when it is a
+little ahead -- so a junction drifts back into the wave within about a
+cycle after set_emergency / handle_emergency.
+
+Usage:
+    from green_wave import Corridor, optimize
+    corridor = Corridor([{"id": "main", "directions": [...], "greens": [...], "yellow": 3}, ...],
+                        distances=[250, 400], speed_kmh=50, outbound="west", inbound="east")
+    wave = optimize(corridor)
+    controller.set_coordination(wave.plans["main"])
+"""
+
+import json
+
+from lazy_imports import lazy_module
+
+np = lazy_module("numpy")
+
+
+def coordinated_green(start, window_start, green, cycle, min_green, max_green):
+    """
+    Green seconds for an approach turning green at `start` so it ends with
+    its coordinated window [window_start + k*cycle, ... + green]. Works on
+    scalars or arrays.
+    """
+    rel = np.mod(start - window_start, cycle)   # time since the window opened
+    inside = rel <= green - min_green           # in the window with enough left
+    ahead = cycle - rel                         # until the next window opens
+    dwell = ahead + green <= max_green          # a little early: hold to its end
+    return np.where(inside, green - rel, np.where(dwell, ahead + green, min_green))
+
+
+class CoordinationPlan:
+    """Fixed-time coordinated plan of one junction (its ring order, clock seconds)."""
+
+    def __init__(self, cycle, offset, greens, yellow, outbound_index=0, epoch=0.0,
+                 min_green=5.0, max_green=None):
+        """
+        cycle          : common cycle length (s)
+        offset         : seconds after `epoch` (mod cycle) the outbound approach turns green
+        greens         : green seconds per approach, in the junction's ring order
+        outbound_index : ring index of the corridor's outbound approach
+        epoch          : shared reference time on the controllers' clock
+        """
+        self.cycle = float(cycle)
+        self.offset = float(offset) % self.cycle
+        self.greens = [float(g) for g in greens]
+        self.yellow = float(yellow)
+        self.outbound_index = int(outbound_index)
+        self.epoch = float(epoch)
+        self.min_green = float(min_green)
+        self.max_green = float(max_green) if max_green is not None else 1.5 * max(self.greens)
+
+        # window start of every approach relative to the outbound green start
+        n = len(self.greens)
+        self.starts = [0.0] * n
+        t = 0.0
+        for step in range(n):
+            k = (self.outbound_index + step) % n
+            self.starts[k] = t
+            t += self.greens[k] + self.yellow
+
+    def window_start(self, index):
+        """Clock time of one (any) opening of approach `index`'s window."""
+        return self.epoch + self.offset + self.starts[index]
+
+    def green_for(self, index, start):
+        return float(coordinated_green(start, self.window_start(index), self.greens[index],
+                                       self.cycle, self.min_green,
+                                       max(self.max_green, self.greens[index])))
+
+    def as_dict(self):
+        return {"cycle": self.cycle, "offset": round(self.offset, 3),
+                "greens": [round(g, 3) for g in self.greens], "yellow": self.yellow,
+                "outbound_index": self.outbound_index}
+
+
+class Corridor:
+    def __init__(self, junctions, distances, speed_kmh=50.0, outbound="west", inbound="east",
+                 cycle_range=(60, 120), cycle_step=1.0, min_green=5.0, weights=(1.0, 1.0)):
+        """
+        junctions : ordered [{"id", "directions", "greens", "yellow"}]; greens
+                    give the split that is scaled to the common cycle
+        distances : metres between consecutive junctions (len(junctions) - 1)
+        outbound  : approach carrying corridor traffic in the direction of travel
+                    (traffic heading east arrives from the "west" approach)
+        inbound   : approach carrying the opposite direction
+        weights   : (outbound, inbound) share of the band when both are limited
+        """
+        if not junctions:
+            raise ValueError("a corridor needs at least one junction")
+        if len(distances) != len(junctions) - 1:
+            raise ValueError("need one distance per pair of consecutive junctions")
+        if speed_kmh <= 0:
+            raise ValueError("progression speed must be positive")
+        self.junctions = list(junctions)
+        self.ids = [str(j["id"]) for j in self.junctions]
+        self.distances = [float(d) for d in distances]
+        self.speed_kmh = float(speed_kmh)
+        self.outbound = outbound.lower()
+        self.inbound = inbound.lower()
+        self.cycle_range = (float(cycle_range[0]), float(cycle_range[1]))
+        self.cycle_step = float(cycle_step)
+        self.min_green = float(min_green)
+        self.weights = (float(weights[0]), float(weights[1]))
+
+    @classmethod
+    def from_dict(cls, data, junction_specs):
+        """Definition dict (corridor.json) + {id: spec} for its junctions."""
+        missing = [j for j in data["junctions"] if j not in junction_specs]
+        if missing:
+            raise KeyError(f"unknown junction(s) {missing}")
+        return cls([dict(junction_specs[j], id=j) for j in data["junctions"]],
+                   data.get("distances", []),
+                   speed_kmh=data.get("speed_kmh", 50.0),
+                   outbound=data.get("outbound", "west"),
+                   inbound=data.get("inbound", "east"),
+                   cycle_range=data.get("cycle_range", (60, 120)),
+                   cycle_step=data.get("cycle_step", 1.0),
+                   min_green=data.get("min_green", 5.0),
+                   weights=data.get("weights", (1.0, 1.0)))
+
+    def travel_times(self):
+        """Seconds from the first junction to each junction at the progression speed."""
+        return np.concatenate([[0.0], np.cumsum(self.distances)]) / (self.speed_kmh / 3.6)
+
+    def _arrays(self):
+        """Per-junction vectors the optimizer works on."""
+        n = len(self.junctions)
+        raw_out, raw_in, total, yellow, n_dirs, between_g, between_n = (np.zeros(n) for _ in range(7))
+        out_idx = np.zeros(n, np.int64)
+        for i, j in enumerate(self.junctions):
+            dirs = [d.lower() for d in j["directions"]]
+            greens = [float(g) for g in j["greens"]]
+            if self.outbound not in dirs or self.inbound not in dirs:
+                raise ValueError(f"junction {j['id']!r} lacks {self.outbound!r}/{self.inbound!r}")
+            o, k = dirs.index(self.outbound), dirs.index(self.inbound)
+            out_idx[i] = o
+            raw_out[i], raw_in[i] = greens[o], greens[k]
+            total[i] = sum(greens)
+            yellow[i] = float(j.get("yellow", 3))
+            n_dirs[i] = len(dirs)
+            # approaches served from the outbound green start up to the inbound one
+            step = o
+            while step != k:
+                between_g[i] += greens[step]
+                between_n[i] += 1
+                step = (step + 1) % len(dirs)
+        return raw_out, raw_in, total, yellow, n_dirs, between_g, between_n, out_idx
+
+
+class GreenWave:
+    """Optimizer result: common cycle, bands and one CoordinationPlan per junction."""
+
+    def __init__(self, cycle, band_out, band_in, plans, travel_times):
+        self.cycle = cycle
+        self.band_out = band_out
+        self.band_in = band_in
+        self.plans = plans
+        self.travel_times = travel_times
+
+    @property
+    def efficiency(self):
+        return (self.band_out + self.band_in) / (2 * self.cycle)
+
+    def as_dict(self):
+        return {
+            "cycle": self.cycle,
+            "band_out": round(self.band_out, 3),
+            "band_in": round(self.band_in, 3),
+            "efficiency": round(self.efficiency, 4),
+            "junctions": {iid: plan.as_dict() for iid, plan in self.plans.items()},
+        }
+
+
+def _best_band(delta, g, h, cycle):
+    """
+    max_j min_i (w_i - ((c_j - c_i) mod C)) and its arg j in O(n log n):
+    with c in [0, C), (c_j - c_i) mod C is c_j - c_i for c_i <= c_j and
+    c_j - c_i + C otherwise, so the inner min is a prefix / suffix minimum
+    of (w_i + c_i) over the sorted c.
+    """
+    c = np.mod(delta - g, cycle)
+    key = g + h + c
+    order = np.argsort(c, kind="stable")
+    cs, ks = c[order], key[order]
+    prefix = np.minimum.accumulate(ks)
+    suffix = np.append(np.minimum.accumulate(ks[::-1])[::-1], np.inf)
+    split = np.searchsorted(cs, cs, side="right")  # i < split: c_i <= c_j
+    vals = np.minimum(prefix[split - 1] - cs, suffix[split] - cs - cycle)
+    j = int(np.argmax(vals))
+    return float(vals[j]), int(order[j])
+
+
+def optimize(corridor, epoch=0.0):
+    """Common cycle and offsets maximizing two-way bandwidth / cycle."""
+    raw_out, raw_in, total, yellow, n_dirs, between_g, between_n, out_idx = corridor._arrays()
+    t = corridor.travel_times()
+    lost = n_dirs * yellow
+    wo, wi = corridor.weights
+    lo, hi = corridor.cycle_range
+
+    best = None
+    for cycle in np.arange(lo, hi + 1e-9, corridor.cycle_step):
+        usable = cycle - lost
+        if np.any(usable < n_dirs * corridor.min_green):
+            continue
+        scale = usable / total
+        g, h = raw_out * scale, raw_in * scale
+        phi = between_g * scale + between_n * yellow
+        delta = np.mod(2 * t + phi, cycle)
+        band, j = _best_band(delta, g, h, cycle)
+        # any cycle with a common two-way band beats every one-way cycle; the
+        # outbound band alone only ranks cycles when none has one
+        score = (band > 0, (band if band > 0 else g.min()) / cycle)
+        if best is None or score[0] > best[0][0] or (
+                score[0] == best[0][0] and score[1] > best[0][1] + 1e-12):
+            best = (score, cycle, band, j, g, h, delta, scale)
+    if best is None:
+        raise ValueError("no cycle in range leaves every approach its minimum green")
+
+    _, cycle, band, j, g, h, delta, scale = best
+    cycle = float(cycle)
+    if band > 0:
+        b_out = min(g.min(), band * wo / (wo + wi))
+        b_in = min(h.min(), band - b_out)
+        b_out = min(g.min(), band - b_in)
+        # outbound band at [0, b_out], inbound band at [r, r + b_in] with
+        # r = c_j + b_out. u_i must lie on the outbound arc [b_out - g_i, 0]
+        # and on the inbound arc ending at r - delta_i; measured from the
+        # outbound arc's start that end is (c_j - c_i) mod C (exactly 0 for
+        # i = j -- taking it from r - delta_i let rounding wrap it to ~C).
+        c = np.mod(delta - g, cycle)
+        lo1 = b_out - g
+        e2 = lo1 + np.mod(c[j] - c, cycle)
+        s2 = e2 - (h - b_in)
+        u = (np.maximum(lo1, s2) + np.minimum(0.0, e2)) / 2
+    else:
+        # no common two-way band: progress the outbound direction only
+        b_out, b_in = float(g.min()), 0.0
+        u = (b_out - g) / 2
+    offsets = np.mod(u + t, cycle)
+
+    plans = {}
+    for i, jn in enumerate(corridor.junctions):
+        greens = [float(x) * scale[i] for x in jn["greens"]]
+        plans[corridor.ids[i]] = CoordinationPlan(
+            cycle, offsets[i], greens, float(jn.get("yellow", 3)), outbound_index=out_idx[i],
+            epoch=epoch, min_green=corridor.min_green)
+    return GreenWave(cycle, float(b_out), float(b_in), plans, t)
+
+
+def load_corridor(path):
+    """Corridor definition dict from JSON, or None if the file is missing."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,70 @@
+"""
+Green-wave optimizer benchmark.
+
+Builds random corridors (four-approach junctions, random splits and link
+lengths) of increasing size and reports how long green_wave.optimize takes,
+together with the chosen cycle and the outbound / inbound bands. A band_in
+of 0.0 means no cycle in range admits a two-way band (random splits over ten
+or more junctions rarely do; use --sizes 2,3 to see two-way bands) and the
+outbound direction alone is progressed.
+
+Usage:
+    python green_wave_bench.py                          # 10 .. 2000 junctions
+    python green_wave_bench.py --sizes 50,500 --step 0.5 --repeat 5 --json
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from green_wave import Corridor, optimize
+
+DIRECTIONS = ["north", "east", "south", "west"]
+
+
+def make_corridor(n, rng, cycle_step=1.0, speed_kmh=50):
+    junctions = [{"id": f"J{i}", "directions": DIRECTIONS,
+                  "greens": rng.uniform(10, 30, len(DIRECTIONS)).tolist(), "yellow": 3}
+                 for i in range(n)]
+    distances = rng.uniform(150, 600, n - 1).tolist()
+    return Corridor(junctions, distances, speed_kmh=speed_kmh, cycle_step=cycle_step)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="green-wave optimizer benchmark")
+    ap.add_argument('--sizes', default="10,100,500,2000", help="junction counts")
+    ap.add_argument('--step', type=float, default=1.0, help="cycle search step (s)")
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--json', action='store_true')
+    args = ap.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    for n in (int(x) for x in args.sizes.split(",")):
+        corridor = make_corridor(n, rng, args.step)
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            wave = optimize(corridor)
+            times.append(time.perf_counter() - start)
+        results.append({"junctions": n, "best_ms": round(1000 * min(times), 2),
+                        "cycle": wave.cycle, "band_out": round(wave.band_out, 2),
+                        "band_in": round(wave.band_in, 2)})
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return results
+    cols = ("best_ms", "cycle", "band_out", "band_in")
+    print(f"{'junctions':<10}" + "".join(f"{c:>12}" for c in cols))
+    for r in results:
+        print(f"{r['junctions']:<10}" + "".join(f"{str(r[c]):>12}" for c in cols))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Background job queue for captured images.
+
+/save_image only validates the upload and enqueues it; decoding, face
+detection and license rendering run on a small worker pool (OpenCV and PIL
+release the GIL for the heavy parts, so threads scale across cores). Each
+job gets a random id (uuid4) the client polls, or long-polls, for its
+result. Jobs live in the process that runs them: under serve.py that is the
+authority, and HTTP workers reach it through controller_ipc.RemoteImageJobs,
+so a poll finds the job whichever worker answers it.
+
+The queue is bounded: when `max_pending` jobs are waiting, submit() raises
+queue.Full so the route can answer 503 instead of piling up memory.
+
+Usage:
+    from image_jobs import ImageJobs
+    jobs = ImageJobs(process_capture, workers=4)
+    job_id = jobs.submit(image_b64, "officer1")     # request thread
+    jobs.get(job_id, wait=10)                      # {'status': 'ok', ...}
+"""
+
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ImageJobs:
+    def __init__(self, process, workers=4, max_pending=64, keep=1024):
+        """
+        process     : callable(job_id, *args) -> result dict, run on a worker
+        max_pending : queued + running jobs before submit() refuses
+        keep        : finished jobs remembered for polling (oldest dropped)
+        """
+        self.process = process
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._cond = threading.Condition()
+        self._jobs = OrderedDict()
+
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def submit(self, *args):
+        """Queue a job and return its id (raises queue.Full when saturated)."""
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise queue.Full("image queue is full")
+        job_id = uuid.uuid4().hex
+        with self._cond:
+            self._jobs[job_id] = {"status": "queued", "job_id": job_id}
+            self._trim()
+        self.submitted += 1
+        self._pool.submit(self._run, job_id, args)
+        return job_id
+
+    def _run(self, job_id, args):
+        self._set(job_id, {"status": "running", "job_id": job_id})
+        try:
+            result = {"status": "ok", **self.process(job_id, *args), "job_id": job_id}
+        except Exception as e:
+            self.failed += 1
+            result = {"status": "error", "message": str(e), "job_id": job_id}
+        finally:
+            self._slots.release()
+        self._set(job_id, result)
+
+    def _set(self, job_id, value):
+        with self._cond:
+            self._jobs[job_id] = value
+            self._cond.notify_all()
+
+    def _trim(self):
+        while len(self._jobs) > self.keep:
+            self._jobs.popitem(last=False)
+
+    def get(self, job_id, wait=0):
+        """Job dict (None if unknown); waits up to `wait` s for it to finish."""
+        deadline = time.monotonic() + wait
+        with self._cond:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] in ("ok", "error"):
+                    return job
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return job
+                self._cond.wait(left)
+
+    def stats(self):
+        with self._cond:
+            pending = sum(1 for j in self._jobs.values() if j["status"] in ("queued", "running"))
+        return {"submitted": self.submitted, "rejected": self.rejected,
+                "failed": self.failed, "pending": pending}
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,372 @@
+"""
+Registry for many intersections ticking in one vectorized pass.
+
+Per-junction state is kept as struct-of-arrays (NumPy) instead of one
+TrafficController object (and thread) per junction:
+
+    phase[i]      0 = green, 1 = yellow
+    index[i]      active approach in the junction's ring
+    deadline[i]   monotonic time the current phase / emergency ends
+    green[i, k]   green time of approach k (each junction has its own plan)
+
+Junctions in a green-wave corridor also carry their coordinated plan
+(common cycle, per-approach window starts); their greens are then chosen
+by green_wave.coordinated_green, vectorized like the rest.
+
+`auto_cycle(now)` advances every due junction with array operations and
+`next_deadline()` is the earliest deadline over the whole corridor, so the
+registry plugs into the same ControllerScheduler as the single controller:
+one shared timer for all junctions.
+
+Request threads (routes, IPC) and the scheduler thread share the arrays,
+so every method that reads or writes them holds the registry lock; add()
+may replace the arrays with larger copies, which must not happen in the
+middle of a tick.
+
+Usage:
+    from intersections import IntersectionRegistry
+    registry = IntersectionRegistry()
+    registry.add("J1", directions=["north", "east", "south", "west"], green_time=20)
+    registry.handle("J1").set_emergency("east")
+"""
+
+import threading
+import time
+
+from green_wave import coordinated_green
+from lazy_imports import lazy_module
+
+np = lazy_module("numpy")
+
+GREEN, YELLOW = 0, 1
+AUTO, MANUAL = 0, 1
+MAX_DIRS = 8
+_PHASES = ("green", "yellow")
+_MODES = ("auto", "manual")
+MIN_TIME = 1.0  # shortest green / yellow accepted (s), as the settings store
+
+
+def _seconds(name, value):
+    """`value` as float seconds, ValueError below MIN_TIME (or not a number)."""
+    secs = float(value)
+    if not secs >= MIN_TIME:
+        raise ValueError(f"{name} must be at least {MIN_TIME:g} s, got {value!r}")
+    return secs
+
+
+class IntersectionRegistry:
+    def __init__(self, capacity=64, clock=time.monotonic):
+        self.clock = clock
+        self.mode = "auto"  # registry-level; each junction has its own mode
+        self.driven = False
+        self.size = 0
+        self.ids = []
+        self.slots = {}
+        self.directions = []
+        self._change_listeners = []
+        self._lock = threading.RLock()  # guards the arrays and the id tables
+        # arrays are allocated with the first junction, so an empty registry
+        # (the usual single-junction setup) never imports NumPy
+        self.initial_capacity = capacity
+        self.capacity = 0
+
+    def _alloc(self, capacity):
+        def grow(arr, fill):
+            new = np.full((capacity,) + arr.shape[1:], fill, dtype=arr.dtype)
+            new[:self.size] = arr[:self.size]
+            return new
+
+        if self.size == 0:
+            self.phase = np.zeros(capacity, np.int8)
+            self.index = np.zeros(capacity, np.int16)
+            self.n_dirs = np.ones(capacity, np.int16)
+            self.modes = np.zeros(capacity, np.int8)
+            self.emergency = np.full(capacity, -1, np.int16)
+            self.deadline = np.full(capacity, np.inf)
+            self.remaining = np.zeros(capacity)
+            self.green = np.zeros((capacity, MAX_DIRS), np.float32)
+            self.yellow = np.zeros(capacity, np.float32)
+            self.coord_cycle = np.zeros(capacity)  # 0 = not coordinated
+            self.coord_start = np.zeros((capacity, MAX_DIRS))
+            self.coord_min = np.zeros(capacity)
+            self.coord_max = np.zeros(capacity)
+        else:
+            self.phase = grow(self.phase, 0)
+            self.index = grow(self.index, 0)
+            self.n_dirs = grow(self.n_dirs, 1)
+            self.modes = grow(self.modes, 0)
+            self.emergency = grow(self.emergency, -1)
+            self.deadline = grow(self.deadline, np.inf)
+            self.remaining = grow(self.remaining, 0)
+            self.green = grow(self.green, 0)
+            self.yellow = grow(self.yellow, 0)
+            self.coord_cycle = grow(self.coord_cycle, 0)
+            self.coord_start = grow(self.coord_start, 0)
+            self.coord_min = grow(self.coord_min, 0)
+            self.coord_max = grow(self.coord_max, 0)
+        self.capacity = capacity
+
+    # -------------------- registration --------------------
+    def add(self, iid, directions=("north", "east", "south", "west"),
+            green_time=15, yellow_time=3, greens=None):
+        """
+        Register a junction. `greens` optionally gives a green time per
+        approach (same order as `directions`), otherwise all use green_time.
+        """
+        directions = [d.lower() for d in directions]
+        if not 1 <= len(directions) <= MAX_DIRS:
+            raise ValueError(f"1..{MAX_DIRS} directions required")
+        # validate everything before touching the tables: a failure below
+        # must not leave a half-registered junction behind
+        if greens is None:
+            greens = [_seconds("green_time", green_time)] * len(directions)
+        else:
+            greens = [_seconds("green", g) for g in greens]
+            if len(greens) != len(directions):
+                raise ValueError(f"{len(greens)} greens for {len(directions)} directions")
+        yellow_time = _seconds("yellow_time", yellow_time)
+        with self._lock:
+            if iid in self.slots:
+                raise ValueError(f"intersection {iid!r} already registered")
+            if self.size == self.capacity:
+                self._alloc(max(self.initial_capacity, self.capacity * 2))
+
+            i = self.size
+            self.size += 1
+            self.ids.append(iid)
+            self.slots[iid] = i
+            self.directions.append(directions)
+            self.n_dirs[i] = len(directions)
+            self.green[i, :len(directions)] = greens
+            self.yellow[i] = yellow_time
+            self.phase[i] = GREEN
+            self.index[i] = 0
+            self.modes[i] = AUTO
+            self.emergency[i] = -1
+            self.coord_cycle[i] = 0
+            self.deadline[i] = self.clock() + self.green[i, 0]
+        self._notify()
+        return i
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, iid):
+        return iid in self.slots
+
+    def handle(self, iid):
+        """Controller-like view of one junction (raises KeyError if unknown)."""
+        return IntersectionHandle(self, self.slots[iid])
+
+    def spec(self, i):
+        """Timing of junction slot i as green_wave expects it (consistent copy)."""
+        with self._lock:
+            n = int(self.n_dirs[i])
+            return {"directions": list(self.directions[i]),
+                    "greens": self.green[i, :n].tolist(),
+                    "yellow": float(self.yellow[i])}
+
+    def valid_mask(self):
+        """(size, MAX_DIRS) bool: which approach columns each junction has."""
+        if self.size == 0:
+            return np.zeros((0, MAX_DIRS), bool)
+        return np.arange(MAX_DIRS) < self.n_dirs[:self.size, None]
+
+    def adapt(self, timing, density):
+        """
+        Recompute every junction's green split from a (rows, MAX_DIRS)
+        density array using an AdaptiveTiming (batched + EWMA smoothed).
+        Rows follow slot order; junctions added after the sample was taken
+        are left alone, and so are junctions in a green-wave corridor (they
+        keep their plan's greens). New greens apply from each approach's
+        next green phase.
+        """
+        with self._lock:
+            n = min(self.size, len(density))
+            if n == 0:
+                return np.zeros((0, MAX_DIRS))
+            greens = timing.update(np.asarray(density)[:n], valid=self.valid_mask()[:n])
+            coordinated = self.coord_cycle[:n] > 0
+            self.green[:n] = np.where(coordinated[:, None], self.green[:n], greens)
+            return greens
+
+    # -------------------- vectorized ticking --------------------
+    def _greens(self, rows, idx, start):
+        """Green seconds for approaches idx of junctions rows turning green at start."""
+        greens = self.green[rows, idx].astype(np.float64)
+        co = self.coord_cycle[rows] > 0
+        if co.any():
+            r, k = rows[co], idx[co]
+            s = start[co] if np.ndim(start) else start
+            greens[co] = coordinated_green(s, self.coord_start[r, k], self.green[r, k],
+                                           self.coord_cycle[r], self.coord_min[r],
+                                           np.maximum(self.coord_max[r], self.green[r, k]))
+        return greens
+
+    def countdowns(self, now=None):
+        with self._lock:
+            now = self.clock() if now is None else now
+            n = self.size
+            if n == 0:
+                return np.zeros(0, np.int32)
+            left = np.where(self.modes[:n] == MANUAL, self.remaining[:n], self.deadline[:n] - now)
+            return np.maximum(0, np.ceil(left - 1e-9)).astype(np.int32)
+
+    def next_deadline(self):
+        with self._lock:
+            if self.size == 0:
+                return None
+            d = float(self.deadline[:self.size].min())
+            return None if d == np.inf else d
+
+    def auto_cycle(self, now=None):
+        """Advance every junction that is due. Returns [(event, max_lateness)]."""
+        with self._lock:
+            now = self.clock() if now is None else now
+            n = self.size
+            if n == 0:
+                return []
+            transitions = []
+            dl = self.deadline[:n]
+
+            ended = np.flatnonzero((self.emergency[:n] >= 0) & (dl <= now))
+            if ended.size:
+                transitions.append(("emergency_end", float((now - dl[ended]).max())))
+                self.emergency[ended] = -1
+                self.phase[ended] = GREEN
+                dl[ended] = now + self._greens(ended, self.index[ended], now)
+
+            # loop only repeats for junctions woken more than one phase late
+            while True:
+                due = np.flatnonzero((dl <= now) & (self.emergency[:n] < 0))
+                if not due.size:
+                    break
+                late = float((now - dl[due]).max())
+                to_yellow = due[self.phase[due] == GREEN]
+                to_green = due[self.phase[due] == YELLOW]
+                if to_yellow.size:
+                    self.phase[to_yellow] = YELLOW
+                    dl[to_yellow] += self.yellow[to_yellow]
+                    transitions.append(("yellow", late))
+                if to_green.size:
+                    nxt = (self.index[to_green] + 1) % self.n_dirs[to_green]
+                    self.index[to_green] = nxt
+                    self.phase[to_green] = GREEN
+                    dl[to_green] += self._greens(to_green, nxt, dl[to_green])
+                    transitions.append(("green", late))
+            return transitions
+
+    handle_emergency = tick = auto_cycle
+
+    # -------------------- per-junction commands --------------------
+    def status(self, i, now=None):
+        with self._lock:
+            now = self.clock() if now is None else now
+            dirs = self.directions[i]
+            state = {d: "red" for d in dirs}
+            em = int(self.emergency[i])
+            if em >= 0:
+                state[dirs[em]] = "green"
+            else:
+                state[dirs[self.index[i]]] = _PHASES[self.phase[i]]
+            if self.modes[i] == MANUAL:
+                left = self.remaining[i]
+            else:
+                left = self.deadline[i] - now
+            return {
+                **state,
+                "mode": _MODES[self.modes[i]],
+                "countdown": int(max(0, np.ceil(left - 1e-9))),
+                "phase": _PHASES[self.phase[i]],
+                "emergency": em >= 0,
+                "emergency_direction": dirs[em] if em >= 0 else None,
+            }
+
+    def set_emergency(self, i, direction):
+        with self._lock:
+            dirs = self.directions[i]
+            d = direction.lower()
+            if d not in dirs:
+                raise ValueError(f"unknown direction {direction!r}")
+            self.emergency[i] = dirs.index(d)
+            if self.modes[i] == MANUAL:
+                self.remaining[i] = self.green[i, self.index[i]]
+            else:
+                self.deadline[i] = self.clock() + self.green[i, self.index[i]]
+        self._notify()
+
+    def set_mode(self, i, mode):
+        with self._lock:
+            if mode == "manual" and self.modes[i] != MANUAL:
+                self.remaining[i] = max(0.0, self.deadline[i] - self.clock())
+                self.deadline[i] = np.inf
+                self.modes[i] = MANUAL
+            elif mode != "manual" and self.modes[i] == MANUAL:
+                self.deadline[i] = self.clock() + self.remaining[i]
+                self.modes[i] = AUTO
+        self._notify()
+
+    def set_coordination(self, i, plan):
+        """Follow a green_wave.CoordinationPlan (None = uncoordinated) from the next green."""
+        with self._lock:
+            n = self.n_dirs[i]
+            if plan is None:
+                self.coord_cycle[i] = 0
+            else:
+                if len(plan.greens) != n:
+                    raise ValueError(f"plan has {len(plan.greens)} greens, junction has {n} approaches")
+                self.green[i, :n] = plan.greens
+                self.yellow[i] = plan.yellow
+                self.coord_start[i, :n] = [plan.window_start(k) for k in range(n)]
+                self.coord_min[i] = plan.min_green
+                self.coord_max[i] = plan.max_green
+                self.coord_cycle[i] = plan.cycle
+        self._notify()
+
+    def set_timer(self, i, time_val):
+        time_val = _seconds("time", time_val)
+        with self._lock:
+            self.green[i, :self.n_dirs[i]] = time_val
+            if self.modes[i] == MANUAL:
+                self.remaining[i] = time_val
+            else:
+                self.deadline[i] = self.clock() + time_val
+        self._notify()
+
+    # -------------------- change listeners --------------------
+    def add_change_listener(self, fn):
+        self._change_listeners.append(fn)
+
+    def _notify(self):
+        for fn in self._change_listeners:
+            try:
+                fn()
+            except Exception as e:
+                print("[intersections] listener error:", e)
+
+
+class IntersectionHandle:
+    """TrafficController-style facade over one registry slot."""
+
+    def __init__(self, registry, slot):
+        self.registry = registry
+        self.slot = slot
+
+    @property
+    def iid(self):
+        return self.registry.ids[self.slot]
+
+    def get_status(self):
+        return self.registry.status(self.slot)
+
+    def set_emergency(self, direction):
+        self.registry.set_emergency(self.slot, direction)
+
+    def set_mode(self, mode):
+        self.registry.set_mode(self.slot, mode)
+
+    def set_timer(self, time_val):
+        self.registry.set_timer(self.slot, time_val)
+
+    def set_coordination(self, plan):
+        self.registry.set_coordination(self.slot, plan)
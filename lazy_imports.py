@@ -0,0 +1,82 @@
+"""
+Deferred imports for the heavy dependencies (OpenCV, NumPy, Pillow, PyAudio).
+
+lazy_module('cv2') returns a stand-in that imports the real module on first
+attribute access and then caches each attribute it hands out, so after
+warm-up `cv2.resize` costs the same as on the real module. Importing a
+project module that needs OpenCV for one route no longer pays for it at
+startup.
+
+warm_up() runs the deferred work on a daemon thread a moment after start,
+once the server is accepting connections, so the first request that needs
+it rarely has to wait either.
+
+Usage:
+    from lazy_imports import lazy_module, warm_up
+    cv2 = lazy_module('cv2')
+    np = lazy_module('numpy')
+    ...
+    warm_up('numpy', 'cv2', load_cascade, delay=2.0)
+"""
+
+import importlib
+import threading
+import time
+
+
+class LazyModule:
+    def __init__(self, name):
+        self.__dict__["_lazy_name"] = name
+        self.__dict__["_lazy_module"] = None
+
+    def _lazy_load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            # the import system's per-module lock makes concurrent first uses safe
+            module = importlib.import_module(self.__dict__["_lazy_name"])
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        value = getattr(self._lazy_load(), attr)
+        self.__dict__[attr] = value  # next lookup is a plain instance-dict hit
+        return value
+
+    @property
+    def loaded(self):
+        return self.__dict__["_lazy_module"] is not None
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module {self.__dict__['_lazy_name']!r} ({state})>"
+
+
+def lazy_module(name):
+    return LazyModule(name)
+
+
+def warm_up(*targets, delay=0.0, name="warm-up"):
+    """
+    Import module names / call functions in order on a daemon thread after
+    `delay` seconds. Failures are logged and skipped (the first real use will
+    raise them again). Returns the thread.
+    """
+    def run():
+        if delay:
+            time.sleep(delay)
+        for target in targets:
+            start = time.perf_counter()
+            try:
+                if isinstance(target, str):
+                    importlib.import_module(target)
+                else:
+                    target()
+            except Exception as e:
+                print(f"[{name}] {getattr(target, '__name__', target)}: {e}")
+                continue
+            label = target if isinstance(target, str) else target.__name__
+            print(f"[{name}] {label} ready in {1000 * (time.perf_counter() - start):.0f} ms")
+
+    t = threading.Thread(target=run, name=name, daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,93 @@
+"""
+Benchmark of license card rendering (cards per second).
+
+Compares the original from-scratch renderer (new canvas, font loads, full
+draw, default PNG compression) with the cached-template LicenseRenderer in
+each output format, using a synthetic face photo.
+
+Usage:
+    python license_bench.py              # 200 cards per variant
+    python license_bench.py -n 1000 --json
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from PIL import Image, ImageDraw, ImageFont
+
+from license_card import LicenseRenderer
+
+
+def render_from_scratch(face, name):
+    """The pre-template create_mock_license, minus the disk write."""
+    now = datetime.now()
+    w, h = 900, 560
+    card = Image.new("RGB", (w, h), (235, 245, 252))
+    draw = ImageDraw.Draw(card)
+    try:
+        font_bold = ImageFont.truetype("arialbd.ttf", 36)
+        font_regular = ImageFont.truetype("arial.ttf", 24)
+        font_large = ImageFont.truetype("arialbd.ttf", 48)
+    except Exception:
+        font_bold = ImageFont.load_default()
+        font_regular = ImageFont.load_default()
+        font_large = ImageFont.load_default()
+    draw.rectangle([(0, 0), (w, 110)], fill=(18, 60, 150))
+    draw.text((24, 28), "DRIVING LICENSE (DEMO)", font=font_large, fill=(255, 255, 255))
+    card.paste(face.convert("RGB").resize((260, 320)), (40, 140))
+    x_base = 320
+    draw.text((x_base, 150), f"Name: {name}", font=font_bold, fill=(0, 0, 0))
+    draw.text((x_base, 200), f"DL Number: DL{now.strftime('%m%d%H%M%S')}", font=font_regular, fill=(0, 0, 0))
+    draw.text((x_base, 250), f"Date of Birth: {(now - timedelta(days=25*365)).strftime('%d/%m/%Y')}", font=font_regular, fill=(0, 0, 0))
+    draw.text((x_base, 300), f"Issue Date: {now.strftime('%d/%m/%Y')}", font=font_regular, fill=(0, 0, 0))
+    draw.text((x_base, 350), f"Expiry Date: {(now + timedelta(days=10*365)).strftime('%d/%m/%Y')}", font=font_regular, fill=(0, 0, 0))
+    draw.line((x_base, 420, x_base + 180, 480), fill=(0, 0, 0), width=3)
+    draw.text((x_base, 490), "Signature (Demo)", font=font_regular, fill=(0, 0, 0))
+    buf = io.BytesIO()
+    card.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def bench(render, face, n):
+    render(face, "warmup")
+    size = 0
+    start = time.perf_counter()
+    for i in range(n):
+        size += len(render(face, f"Officer {i}"))
+    wall = time.perf_counter() - start
+    return {"cards_per_s": round(n / wall, 1), "ms_per_card": round(1000 * wall / n, 3),
+            "avg_kb": round(size / n / 1024, 1)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="license card rendering benchmark")
+    ap.add_argument('-n', type=int, default=200, help="cards per variant")
+    ap.add_argument('--json', action='store_true')
+    args = ap.parse_args(argv)
+
+    face = Image.effect_noise((480, 640), 64).convert("RGB")
+    variants = {
+        "from scratch (png/6)": render_from_scratch,
+        "template png/6": LicenseRenderer("png", compress_level=6).render,
+        "template png/1": LicenseRenderer("png", compress_level=1).render,
+        "template webp/85": LicenseRenderer("webp", quality=85).render,
+        "template jpeg/85": LicenseRenderer("jpeg", quality=85).render,
+    }
+    results = {name: bench(fn, face, args.n) for name, fn in variants.items()}
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return results
+    print(f"{'variant':<24}{'cards/s':>10}{'ms/card':>10}{'avg KB':>10}")
+    for name, r in results.items():
+        print(f"{name:<24}{r['cards_per_s']:>10}{r['ms_per_card']:>10}{r['avg_kb']:>10}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
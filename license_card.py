@@ -0,0 +1,144 @@
+"""
+Demo driving-license card renderer.
+
+Everything that is the same on every card -- background, header band,
+title, field labels, signature line -- is drawn once into a template. Each
+card is a copy of that template plus the face photo and the field values,
+so a render is one image copy, one paste and five short text draws. Fonts
+are loaded once per (file, size) and thread: a FreeType face is not safe to
+draw with from several threads at once, and ImageJobs renders on a pool.
+
+Output format is configurable: PNG (with a compression level; 1 is much
+faster than PIL's default 6 for a few % larger files), WebP or JPEG.
+
+Usage:
+    from license_card import LicenseRenderer
+    renderer = LicenseRenderer(fmt="png", compress_level=1)
+    data = renderer.render(face_image, "officer1")          # encoded bytes
+"""
+
+import io
+import threading
+from datetime import datetime, timedelta
+
+from lazy_imports import lazy_module
+
+Image = lazy_module("PIL.Image")
+ImageDraw = lazy_module("PIL.ImageDraw")
+ImageFont = lazy_module("PIL.ImageFont")
+
+CARD_SIZE = (900, 560)
+BACKGROUND = (235, 245, 252)
+HEADER = (18, 60, 150)
+TEXT = (0, 0, 0)
+FACE_BOX = (40, 140, 260, 320)  # x, y, w, h
+X_BASE = 320
+
+# (label, y, bold) -- values are drawn right after the label
+FIELDS = (
+    ("Name: ", 150, True),
+    ("DL Number: ", 200, False),
+    ("Date of Birth: ", 250, False),
+    ("Issue Date: ", 300, False),
+    ("Expiry Date: ", 350, False),
+)
+
+FORMATS = {"png": "PNG", "webp": "WEBP", "jpeg": "JPEG", "jpg": "JPEG"}
+
+
+_fonts = threading.local()
+
+
+def load_font(name, size):
+    """TrueType font, or PIL's default when it isn't installed (memoized per thread)."""
+    cache = getattr(_fonts, "cache", None)
+    if cache is None:
+        cache = _fonts.cache = {}
+    font = cache.get((name, size))
+    if font is None:
+        try:
+            font = ImageFont.truetype(name, size)
+        except Exception:
+            font = ImageFont.load_default()
+        cache[(name, size)] = font
+    return font
+
+
+class LicenseRenderer:
+    def __init__(self, fmt="png", compress_level=1, quality=85):
+        """
+        fmt            : "png", "webp" or "jpeg"
+        compress_level : PNG zlib level 0-9
+        quality        : WebP / JPEG quality
+        """
+        fmt = fmt.lower()
+        if fmt not in FORMATS:
+            raise ValueError(f"unsupported license format {fmt!r}")
+        self.fmt = fmt
+        self.ext = "jpg" if FORMATS[fmt] == "JPEG" else fmt
+        self.compress_level = compress_level
+        self.quality = quality
+        self._value_x = []
+        self._template = self._build_template()
+
+    # the calling thread's own instances
+    @property
+    def font_bold(self):
+        return load_font("arialbd.ttf", 36)
+
+    @property
+    def font_regular(self):
+        return load_font("arial.ttf", 24)
+
+    @property
+    def font_large(self):
+        return load_font("arialbd.ttf", 48)
+
+    def _build_template(self):
+        w, h = CARD_SIZE
+        card = Image.new("RGB", CARD_SIZE, BACKGROUND)
+        draw = ImageDraw.Draw(card)
+        draw.rectangle([(0, 0), (w, 110)], fill=HEADER)
+        draw.text((24, 28), "DRIVING LICENSE (DEMO)", font=self.font_large, fill=(255, 255, 255))
+        for label, y, bold in FIELDS:
+            font = self.font_bold if bold else self.font_regular
+            draw.text((X_BASE, y), label, font=font, fill=TEXT)
+            self._value_x.append(X_BASE + draw.textlength(label, font=font))
+        draw.line((X_BASE, 420, X_BASE + 180, 480), fill=TEXT, width=3)
+        draw.text((X_BASE, 490), "Signature (Demo)", font=self.font_regular, fill=TEXT)
+        return card
+
+    def card(self, face_img, name, now=None):
+        """Card as a PIL image; `face_img` is a PIL image or a path (None = blank)."""
+        now = now or datetime.now()
+        values = (
+            name or "Demo User",
+            "DL" + now.strftime("%m%d%H%M%S"),
+            (now - timedelta(days=25 * 365)).strftime("%d/%m/%Y"),
+            now.strftime("%d/%m/%Y"),
+            (now + timedelta(days=10 * 365)).strftime("%d/%m/%Y"),
+        )
+        card = self._template.copy()
+        if face_img is not None:
+            try:
+                face = face_img if isinstance(face_img, Image.Image) else Image.open(face_img)
+                x, y, fw, fh = FACE_BOX
+                card.paste(face.convert("RGB").resize((fw, fh)), (x, y))
+            except Exception:
+                pass
+        draw = ImageDraw.Draw(card)
+        for (_, y, bold), vx, value in zip(FIELDS, self._value_x, values):
+            draw.text((vx, y), value, font=self.font_bold if bold else self.font_regular, fill=TEXT)
+        return card
+
+    def encode(self, card):
+        buf = io.BytesIO()
+        if self.fmt == "png":
+            card.save(buf, "PNG", compress_level=self.compress_level)
+        else:
+            card.save(buf, FORMATS[self.fmt], quality=self.quality)
+        return buf.getvalue()
+
+    def render(self, face_img, name, now=None):
+        """Encoded card bytes."""
+        return self.encode(self.card(face_img, name, now))
@@ -0,0 +1,205 @@
+"""
+HTTP load driver for a running Smart Traffic server.
+
+Hits /get_status, /save_settings, /emergency/trigger and /save_image from a
+pool of client threads and reports per-route throughput and p50 / p90 / p99
+latency. The route mix is weighted (reads dominate, like the dashboard).
+With --follow each /save_image job is also long-polled until done, so
+capture latency end to end shows up as save_image:done.
+
+The payload for /save_image is a generated PNG (no camera needed);
+/emergency/trigger cycles through the four approaches.
+
+Usage:
+    python app.py &                      # or: python serve.py
+    python load_bench.py                                  # 16 threads, 10 s
+    python load_bench.py --url http://127.0.0.1:8000 --threads 64 --duration 30 --json
+    python load_bench.py --mix get_status=1 --threads 128  # status reads only
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import struct
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+DIRECTIONS = ["north", "east", "south", "west"]
+ROUTES = ("get_status", "save_settings", "emergency_trigger", "save_image")
+DEFAULT_MIX = "get_status=80,save_settings=8,emergency_trigger=2,save_image=10"
+
+
+def make_png(width=320, height=240):
+    """Small gradient PNG as a data URL, built without PIL."""
+    rows = b"".join(b"\x00" + bytes(v for x in range(width)
+                                    for v in (x * 255 // width, y * 255 // height, 128))
+                    for y in range(height))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    png = (b"\x89PNG\r\n\x1a\n"
+           + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+           + chunk(b"IDAT", zlib.compress(rows, 6))
+           + chunk(b"IEND", b""))
+    return "data:image/png;base64," + base64.b64encode(png).decode()
+
+
+class Driver:
+    def __init__(self, base_url, timeout=30.0, follow=False):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.follow = follow
+        self.image = make_png()
+        self._directions = itertools.cycle(DIRECTIONS)
+        self._green = itertools.cycle(range(10, 31))
+        self._lock = threading.Lock()
+        self.samples = {}  # route -> [latency_s]
+        self.errors = {}
+
+    def _request(self, path, body=None):
+        data = None if body is None else json.dumps(body).encode()
+        req = urllib.request.Request(self.base_url + path, data=data,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def _record(self, route, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    # -------------------- routes --------------------
+    def get_status(self):
+        return self._request("/get_status")
+
+    def save_settings(self):
+        return self._request("/save_settings", {"green": next(self._green)})
+
+    def emergency_trigger(self):
+        return self._request("/emergency/trigger", {"direction": next(self._directions)})
+
+    def save_image(self):
+        status, body = self._request("/save_image", {"image": self.image})
+        if self.follow and status == 202:
+            start = time.perf_counter()
+            url = json.loads(body)["result_url"]
+            while True:
+                s, b = self._request(url + "?wait=10")
+                if s != 200 or json.loads(b).get("status") not in ("queued", "running"):
+                    break
+            self._record("save_image:done", time.perf_counter() - start, s == 200)
+        return status, body
+
+    def hit(self, route):
+        start = time.perf_counter()
+        try:
+            status, _ = getattr(self, route)()
+            ok = status < 400
+        except Exception:
+            ok = False
+        self._record(route, time.perf_counter() - start, ok)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, max(0, int(round(q / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in ROUTES:
+            raise SystemExit(f"unknown route in --mix: {route!r}")
+        mix[route] = float(weight or 1)
+    return mix
+
+
+def run(driver, mix, threads, duration=None, requests=None):
+    routes = [r for r, w in mix.items() for _ in range(max(1, int(w)))]
+    schedule = itertools.cycle(routes)
+    sched_lock = threading.Lock()
+    stop_at = None if duration is None else time.perf_counter() + duration
+    remaining = [requests]
+
+    def worker():
+        while True:
+            with sched_lock:
+                if stop_at is not None and time.perf_counter() >= stop_at:
+                    return
+                if remaining[0] is not None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                route = next(schedule)
+            driver.hit(route)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for _ in range(threads):
+            pool.submit(worker)
+    wall = time.perf_counter() - start
+
+    results = []
+    for route, samples in sorted(driver.samples.items()):
+        results.append({
+            "route": route,
+            "n": len(samples),
+            "errors": driver.errors.get(route, 0),
+            "req_per_s": round(len(samples) / wall, 1),
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p90_ms": round(percentile(samples, 90) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            "max_ms": round(max(samples) * 1000, 2),
+        })
+    return results
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="HTTP load driver")
+    ap.add_argument('--url', default="http://127.0.0.1:5000")
+    ap.add_argument('--threads', type=int, default=16, help="concurrent clients")
+    ap.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    ap.add_argument('--requests', type=int, default=None, help="stop after N requests instead")
+    ap.add_argument('--mix', default=DEFAULT_MIX, help="route=weight,... over " + ", ".join(ROUTES))
+    ap.add_argument('--follow', action='store_true', help="long-poll /save_image jobs to completion")
+    ap.add_argument('--timeout', type=float, default=30.0)
+    ap.add_argument('--json', action='store_true')
+    args = ap.parse_args(argv)
+
+    driver = Driver(args.url, args.timeout, args.follow)
+    try:
+        driver.get_status()
+    except Exception as e:
+        raise SystemExit(f"server at {args.url} not reachable: {e}")
+    duration = None if args.requests else args.duration
+    results = run(driver, parse_mix(args.mix), args.threads, duration, args.requests)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return results
+    cols = ("n", "errors", "req_per_s", "p50_ms", "p90_ms", "p99_ms", "max_ms")
+    print(f"{'route':<20}" + "".join(f"{c:>11}" for c in cols))
+    for r in results:
+        print(f"{r['route']:<20}" + "".join(f"{str(r[c]):>11}" for c in cols))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Login throughput benchmark for the credential store.
+
+Creates a throwaway users file and measures logins per second through
+UserStore.verify at a given concurrency, for first-time logins (a full
+PBKDF2 run each), repeat logins (verification cache) and wrong passwords,
+plus the old path (json.load + plaintext compare on every call).
+
+Usage:
+    python login_bench.py                       # 64 users, 8 client threads
+    python login_bench.py --users 200 --threads 32 --iterations 100000 --json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from user_store import ITERATIONS, UserStore, hash_file
+
+
+def legacy_login(path, username, password):
+    with open(path, 'r') as f:
+        users = json.load(f)
+    return username in users and users[username] == password
+
+
+def run(fn, creds, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda c: fn(*c), creds))
+    wall = time.perf_counter() - start
+    return {"logins_per_s": round(len(creds) / wall, 1), "ok": sum(results), "n": len(creds)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="login throughput benchmark")
+    ap.add_argument('--users', type=int, default=64)
+    ap.add_argument('--threads', type=int, default=8, help="concurrent login requests")
+    ap.add_argument('--workers', type=int, default=2, help="UserStore hash workers")
+    ap.add_argument('--iterations', type=int, default=ITERATIONS, help="PBKDF2 cost")
+    ap.add_argument('--json', action='store_true')
+    args = ap.parse_args(argv)
+
+    creds = [(f"officer{i}", f"pw-{i}") for i in range(args.users)]
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "plain.json")
+        hashed = os.path.join(tmp, "hashed.json")
+        for path in (plain, hashed):
+            with open(path, 'w') as f:
+                json.dump(dict(creds), f)
+        hash_file(hashed, args.iterations)
+
+        store = UserStore(hashed, iterations=args.iterations, workers=args.workers)
+        results = {
+            "legacy json+plaintext": run(lambda u, p: legacy_login(plain, u, p), creds * 10, args.threads),
+            "store first login": run(store.verify, creds, args.threads),
+            "store repeat login": run(store.verify, creds * 10, args.threads),
+            "store wrong password": run(store.verify, [(u, "nope") for u, _ in creds], args.threads),
+        }
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return results
+    print(f"{'case':<24}{'logins/s':>12}{'ok':>8}{'n':>8}")
+    for name, r in results.items():
+        print(f"{name:<24}{r['logins_per_s']:>12}{r['ok']:>8}{r['n']:>8}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
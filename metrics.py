@@ -0,0 +1,337 @@
+"""
+Lightweight in-process metrics in Prometheus text format.
+
+Counters and histograms aggregate per thread: every thread that records a
+value gets its own small list of accumulators and is the only writer of it,
+so inc() / observe() take no lock -- a thread-local lookup, a bisect and two
+list updates. A scrape sums the per-thread lists (cells of threads that
+have exited are folded into a retired total, so per-request threads do not
+pile up).
+
+Values that live elsewhere (other processes, stats() dicts) are exported
+with CallbackMetric, or merged into a histogram on scrape via
+Registry.on_collect hooks.
+
+Usage:
+    from metrics import Counter, Histogram, REGISTRY
+    TICKS = Histogram('smarttraffic_tick_seconds', 'Controller tick duration', ('scheduler',))
+    tick_hist = TICKS.labels('main')          # resolve children once, off the hot path
+    with tick_hist.time():
+        controller.tick()
+    REGISTRY.render()                         # text for GET /metrics
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+
+# fold cells of exited threads once this many are registered
+_FOLD_AT = 64
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._names = set()
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._names:
+                raise ValueError(f"duplicate metric {metric.name!r}")
+            self._names.add(metric.name)
+            self._metrics.append(metric)
+        return metric
+
+    def on_collect(self, fn):
+        """Call fn() before every render (e.g. pull counters from worker processes)."""
+        self._hooks.append(fn)
+
+    def remove_collect(self, fn):
+        try:
+            self._hooks.remove(fn)
+        except ValueError:
+            pass
+
+    def render(self, skip_empty=False):
+        """Prometheus text exposition of every metric; skip_empty drops all-zero families."""
+        for fn in list(self._hooks):
+            try:
+                fn()
+            except Exception as e:
+                print("[metrics] collect hook error:", e)
+        out = []
+        for metric in list(self._metrics):
+            try:
+                lines = metric.collect()
+            except Exception as e:
+                print(f"[metrics] {metric.name} collect error:", e)
+                continue
+            if skip_empty and not lines:
+                continue
+            out.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def merge(*texts):
+    """Concatenate renders from several processes; a family keeps its first source."""
+    seen = set()
+    out = []
+    for text in texts:
+        skip = False
+        local = set()
+        for line in text.splitlines():
+            if line.startswith("# HELP "):
+                name = line.split(" ", 3)[2]
+                skip = name in seen
+                local.add(name)
+            if not skip and line:
+                out.append(line)
+        seen |= local
+    return "\n".join(out) + "\n"
+
+
+# -------------------- formatting --------------------
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape_value(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(value):
+    if isinstance(value, int):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _histogram_lines(name, labelnames, values, bounds, counts, total):
+    """counts: per bucket (not cumulative), the last one being +Inf."""
+    lines = []
+    running = 0
+    for bound, n in zip(bounds + (float("inf"),), counts):
+        running += n
+        le = 'le="%s"' % _num(bound)
+        lines.append(f"{name}_bucket{_labels(labelnames, values, le)} {running}")
+    lines.append(f"{name}_sum{_labels(labelnames, values)} {_num(total)}")
+    lines.append(f"{name}_count{_labels(labelnames, values)} {running}")
+    return lines
+
+
+# -------------------- per-thread storage --------------------
+class _Cells:
+    """Per-thread accumulator lists; each thread writes only its own."""
+
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._live = []             # (thread, cell)
+        self._retired = [0] * size  # sums of cells whose thread has exited
+
+    def cell(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            return self._new()
+
+    def _new(self):
+        cell = [0] * self.size
+        with self._lock:
+            if len(self._live) >= _FOLD_AT:
+                self._fold()
+            self._live.append((threading.current_thread(), cell))
+        self._local.cell = cell
+        return cell
+
+    def _fold(self):
+        live = []
+        for thread, cell in self._live:
+            if thread.is_alive():
+                live.append((thread, cell))
+            else:
+                for i, v in enumerate(cell):
+                    self._retired[i] += v
+        self._live = live
+
+    def total(self):
+        with self._lock:
+            self._fold()
+            out = list(self._retired)
+            for _, cell in self._live:
+                for i, v in enumerate(cell):
+                    out[i] += v
+        return out
+
+
+# -------------------- metric families --------------------
+class _Family:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+        self._default = self.labels() if not self.labelnames else None
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def collect(self):
+        lines = []
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._child_lines(values, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        self._cells = _Cells(1)
+
+    def inc(self, amount=1):
+        self._cells.cell()[0] += amount
+
+    @property
+    def value(self):
+        return self._cells.total()[0]
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def _child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _child_lines(self, values, child):
+        value = child.value
+        if not value:
+            return []
+        return [f"{self.name}{_labels(self.labelnames, values)} {_num(value)}"]
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramChild:
+    __slots__ = ("_cells", "bounds")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # one slot per bucket, +Inf, then the sum
+        self._cells = _Cells(len(bounds) + 2)
+
+    def observe(self, value):
+        cell = self._cells.cell()
+        cell[bisect_left(self.bounds, value)] += 1
+        cell[-1] += value
+
+    def merge(self, counts, total):
+        """Add pre-bucketed observations (same bounds, +Inf last) and their sum."""
+        cell = self._cells.cell()
+        for i, n in enumerate(counts):
+            cell[i] += n
+        cell[-1] += total
+
+    def time(self):
+        return _Timer(self)
+
+    def snapshot(self):
+        cells = self._cells.total()
+        return cells[:-1], cells[-1]
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS,
+                 registry=REGISTRY):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _child_lines(self, values, child):
+        counts, total = child.snapshot()
+        if not sum(counts):
+            return []
+        return _histogram_lines(self.name, self.labelnames, values, self.buckets, counts, total)
+
+
+class CallbackMetric:
+    """
+    Gauge or counter read on scrape: fn() returns a number, or
+    {label_values_tuple: number} when labelnames are given.
+    """
+
+    def __init__(self, name, documentation, fn, kind="gauge", labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        if registry is not None:
+            registry.register(self)
+
+    def collect(self):
+        result = self.fn()
+        if result is None:
+            return []
+        if not self.labelnames:
+            result = {(): result}
+        return [f"{self.name}{_labels(self.labelnames, values)} {_num(value)}"
+                for values, value in sorted(result.items())]
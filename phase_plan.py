@@ -0,0 +1,192 @@
+"""
+Signal phase plans declared as data, compiled into a transition table.
+
+A plan names its signal groups (through movements, protected lefts,
+pedestrian crossings), which groups belong to each approach (used for
+emergency preemption), and the phases of the ring in order -- which groups
+each phase turns green and how long its intervals last:
+
+    {"signals": {"north": "vehicle", "north_left": "left", "ped_ns": "ped", ...},
+     "approaches": {"north": ["north", "north_left"], ...},
+     "phases": [
+        {"name": "ns_left", "green": ["north_left", "south_left"], "green_time": 8,
+         "direction": "north"},
+        {"name": "ns", "green": ["north", "south", "ped_ew"], "all_red": 2},
+        ...]}
+
+Omitted green_time / yellow follow the controller's green provider and
+yellow setting at run time; all_red defaults to 0 (no clearance step).
+`direction` is the approach a phase is reported, timed (adaptive timing)
+and coordinated under; it defaults to the phase name.
+
+compile_plan expands every phase into its intervals -- green, clearance
+(yellow for the groups that do not stay green into the next phase) and an
+optional all-red -- and precomputes for each step its read-only signal
+view, the [(signal, colour)] diff from its predecessor and its successor.
+Advancing the controller is then an index step plus that diff: the cost
+depends on how many signals change, not on how many phases or signals the
+plan has, and snapshots share the precomputed views instead of copying.
+
+Usage:
+    from phase_plan import compile_plan, load_plan, ring_plan
+    plan = compile_plan(load_plan('phase_plan.json') or ring_plan(["north", "east", "south", "west"]))
+    controller.set_plan(plan)
+"""
+
+import json
+from collections import namedtuple
+from types import MappingProxyType
+
+GREEN, YELLOW, ALL_RED = "green", "yellow", "all_red"
+
+# colour shown by each kind of signal group while green / in clearance / red
+COLOURS = {
+    "vehicle": ("green", "yellow", "red"),
+    "left": ("green_arrow", "yellow_arrow", "red"),
+    "ped": ("walk", "flashing_dont_walk", "dont_walk"),
+}
+
+Step = namedtuple("Step", ["kind", "phase", "duration", "view", "changes", "prev", "next"])
+Step.__doc__ = """
+One interval of the ring. `duration` is fixed seconds or None (green:
+controller's green for the phase, yellow: its yellow time); `changes` is
+the diff from step `prev`'s view; `next` is the index of the successor.
+"""
+
+
+def ring_plan(directions):
+    """The classic ring: one approach green at a time, no all-red."""
+    return {"signals": {d: "vehicle" for d in directions},
+            "approaches": {d: [d] for d in directions},
+            "phases": [{"name": d, "green": [d]} for d in directions]}
+
+
+def load_plan(path):
+    """Plan dict from JSON, or None if the file is missing."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class Phase:
+    def __init__(self, name, green, green_time=None, yellow=None, all_red=0.0, direction=None):
+        self.name = str(name)
+        self.green = frozenset(green)
+        self.green_time = None if green_time is None else float(green_time)
+        self.yellow = None if yellow is None else float(yellow)
+        self.all_red = float(all_red or 0)
+        self.direction = (direction or self.name).lower()
+
+
+class CompiledPlan:
+    """Immutable transition table of a plan; shared by every snapshot."""
+
+    def __init__(self, signals, approaches, phases, steps, green_step, preempt, off):
+        self.signals = signals          # {name: kind}, declaration order
+        self.approaches = approaches    # {direction: [signal]}, preemption groups
+        self.phases = phases            # [Phase]
+        self.steps = steps              # [Step]
+        self.green_step = green_step    # phase index -> its green step
+        self.preempt = preempt          # direction -> read-only view
+        self.off = off                  # everything red
+        self._preempt_views = {frozenset((d,)): v for d, v in preempt.items()}
+        self._preempt_views[frozenset()] = off
+
+    @property
+    def directions(self):
+        """Per-phase direction (ring order), as green_wave / adaptive timing expect."""
+        return [p.direction for p in self.phases]
+
+    def preempt_view(self, directions):
+        """Read-only view with every approach in `directions` green (built once per set)."""
+        key = frozenset(directions)
+        view = self._preempt_views.get(key)
+        if view is None:
+            groups = frozenset(s for d in key for s in self.approaches[d])
+            view = _view(self.signals, lambda s: 0 if s in groups else 2)
+            self._preempt_views[key] = view
+        return view
+
+    def as_dict(self):
+        return {"signals": dict(self.signals),
+                "approaches": {d: list(groups) for d, groups in self.approaches.items()},
+                "phases": [{"name": p.name, "green": sorted(p.green), "green_time": p.green_time,
+                            "yellow": p.yellow, "all_red": p.all_red, "direction": p.direction}
+                           for p in self.phases]}
+
+
+def _view(signals, colour_of):
+    return MappingProxyType({s: COLOURS[kind][colour_of(s)] for s, kind in signals.items()})
+
+
+def compile_plan(data):
+    """Validate a plan dict (or pass a CompiledPlan through) and build its table."""
+    if isinstance(data, CompiledPlan):
+        return data
+    signals = {str(s).lower(): str(kind) for s, kind in data["signals"].items()}
+    for s, kind in signals.items():
+        if kind not in COLOURS:
+            raise ValueError(f"signal {s!r}: unknown kind {kind!r} (one of {sorted(COLOURS)})")
+    phases = []
+    for p in data["phases"]:
+        green = [str(s).lower() for s in p["green"]]
+        unknown = [s for s in green if s not in signals]
+        if unknown:
+            raise ValueError(f"phase {p['name']!r} uses undeclared signal(s) {unknown}")
+        if not green:
+            raise ValueError(f"phase {p['name']!r} turns nothing green")
+        phase = Phase(p["name"], green, p.get("green_time"), p.get("yellow"),
+                      p.get("all_red", 0), p.get("direction"))
+        # a zero-length ring would never let the controller's catch-up loop finish
+        for field in ("green_time", "yellow"):
+            value = getattr(phase, field)
+            if value is not None and not value > 0:
+                raise ValueError(f"phase {phase.name!r}: {field} must be positive, got {value}")
+        if not phase.all_red >= 0:
+            raise ValueError(f"phase {phase.name!r}: all_red must not be negative, "
+                             f"got {phase.all_red}")
+        phases.append(phase)
+    if not phases:
+        raise ValueError("a plan needs at least one phase")
+
+    approaches = data.get("approaches") or {p.direction: sorted(p.green) for p in phases}
+    approaches = {str(d).lower(): [str(s).lower() for s in groups]
+                  for d, groups in approaches.items()}
+    for d, groups in approaches.items():
+        unknown = [s for s in groups if s not in signals]
+        if unknown:
+            raise ValueError(f"approach {d!r} uses undeclared signal(s) {unknown}")
+
+    # expand phases into green -> clearance -> (all-red) intervals
+    raw = []  # (kind, phase index, duration, {signal: colour index})
+    n = len(phases)
+    for i, p in enumerate(phases):
+        nxt = phases[(i + 1) % n]
+        raw.append((GREEN, i, p.green_time, {s: 0 for s in p.green}))
+        # groups that stay green into the next phase (overlaps) do not clear
+        clearing = p.green - nxt.green
+        held = p.green & nxt.green
+        if not clearing:
+            continue
+        state = {s: 1 for s in clearing}
+        state.update({s: 0 for s in held})
+        raw.append((YELLOW, i, p.yellow, state))
+        if p.all_red > 0:
+            raw.append((ALL_RED, i, p.all_red, {s: 0 for s in held}))
+
+    views = [_view(signals, lambda s, st=st: st.get(s, 2)) for _, _, _, st in raw]
+    steps = []
+    green_step = {}
+    for k, (kind, i, duration, _) in enumerate(raw):
+        prev = (k - 1) % len(raw)
+        changes = tuple((s, c) for s, c in views[k].items() if views[prev][s] != c)
+        steps.append(Step(kind, i, duration, views[k], changes, prev, (k + 1) % len(raw)))
+        if kind == GREEN:
+            green_step[i] = k
+
+    preempt = {d: _view(signals, lambda s, g=frozenset(groups): 0 if s in g else 2)
+               for d, groups in approaches.items()}
+    off = _view(signals, lambda s: 2)
+    return CompiledPlan(signals, approaches, phases, steps, green_step, preempt, off)
@@ -0,0 +1,102 @@
+"""
+Phase-plan controller benchmark.
+
+Runs a TrafficController on a fake clock with plans of growing size (N
+phases, each with its own through, left and pedestrian groups plus an
+all-red step) and reports the cost of a tick -- idle (nothing due) and with
+a transition -- plus get_status, and the memory blocks a transition
+allocates. With the compiled table these stay flat as the plan grows.
+
+Usage:
+    python phase_plan_bench.py                          # 4 .. 256 phases
+    python phase_plan_bench.py --phases 8,64 --ticks 50000 --json
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from traffic_controller import TrafficController
+
+
+def make_plan(n_phases):
+    signals, phases = {}, []
+    for i in range(n_phases):
+        through, left, ped = f"a{i}", f"a{i}_left", f"ped{i}"
+        signals.update({through: "vehicle", left: "left", ped: "ped"})
+        phases.append({"name": f"p{i}", "green": [through, left, ped], "green_time": 10,
+                       "yellow": 3, "all_red": 1, "direction": through})
+    return {"signals": signals, "phases": phases}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def bench(n_phases, ticks):
+    clock = FakeClock()
+    ctl = TrafficController(clock=clock, plan=make_plan(n_phases))
+    ctl.driven = True
+    ctl.tick()
+
+    # idle: nothing due, nothing to publish
+    start = time.perf_counter()
+    for _ in range(ticks):
+        ctl.tick()
+    idle = (time.perf_counter() - start) / ticks
+
+    # every tick lands on the next deadline
+    start = time.perf_counter()
+    for _ in range(ticks):
+        clock.now = ctl.phase_deadline
+        ctl.tick()
+    step = (time.perf_counter() - start) / ticks
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        ctl.get_status()
+    status = (time.perf_counter() - start) / ticks
+
+    sample = min(ticks, 2000)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(sample):
+        clock.now = ctl.phase_deadline
+        ctl.tick()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(s.count_diff for s in after.compare_to(before, "filename") if s.count_diff > 0)
+
+    return {"phases": n_phases, "signals": len(ctl.plan.signals), "steps": len(ctl.plan.steps),
+            "idle_us": round(idle * 1e6, 3), "transition_us": round(step * 1e6, 3),
+            "status_us": round(status * 1e6, 3), "retained_blocks": blocks}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="phase-plan controller benchmark")
+    ap.add_argument('--phases', default="4,16,64,256", help="plan sizes (phases)")
+    ap.add_argument('--ticks', type=int, default=20000)
+    ap.add_argument('--json', action='store_true')
+    args = ap.parse_args(argv)
+
+    results = [bench(int(n), args.ticks) for n in args.phases.split(",")]
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return results
+    cols = ("signals", "steps", "idle_us", "transition_us", "status_us", "retained_blocks")
+    print(f"{'phases':<8}" + "".join(f"{c:>16}" for c in cols))
+    for r in results:
+        print(f"{r['phases']:<8}" + "".join(f"{str(r[c]):>16}" for c in cols))
+    return results
+
+
+if __name__ == '__main__':
+    main()
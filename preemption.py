@@ -0,0 +1,305 @@
+"""
+Emergency-preemption arbitration for the main junction.
+
+Detections no longer go straight to controller.set_emergency, where a
+second siren during a preemption was either dropped (the "already in
+emergency" guard) or replaced the first one. Siren and camera hits are
+submitted to a PreemptionManager instead, which:
+
+- collects requests into short batching windows, so detections a second
+  or two apart are arbitrated together instead of first-come-wins;
+- merges repeat hits for a direction that is already waiting (confidences
+  combine as independent evidence: two 0.7 hits give 0.91) and drops hits
+  for a direction that is being served or was served less than `cooldown`
+  seconds ago;
+- keeps the rest in a priority queue ordered by confidence, then arrival;
+- grants the head of the queue together with every waiting request whose
+  direction is compatible with it (opposite approaches by default), and
+  lets a compatible late request join a running preemption while the
+  total hold stays under `max_hold`; conflicting requests wait for the
+  next grant and expire after `max_wait`.
+
+All decisions happen in step(now), so the manager can be driven by its own
+thread (start()) or by a simulated clock (preemption_bench.py).
+
+Usage:
+    from preemption import PreemptionManager
+    preemption = PreemptionManager(controller, window=2.0, cooldown=15).start()
+    preemption.submit("south", source="camera")
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from metrics import Counter, Histogram
+
+# confidence of one detection by source (explicit values override)
+SOURCE_CONFIDENCE = {"manual": 1.0, "camera": 0.9, "siren": 0.7}
+DEFAULT_CONFIDENCE = 0.5
+# approaches whose emergency vehicles can be given green at the same time
+DEFAULT_COMPATIBLE = (("north", "south"), ("east", "west"))
+
+PREEMPTION_REQUESTS = Counter("smarttraffic_preemption_requests_total",
+                              "Emergency preemption requests by outcome", ("outcome",))
+PREEMPTION_WAIT = Histogram("smarttraffic_preemption_wait_seconds",
+                            "Detection to emergency green",
+                            buckets=(0.5, 1, 2, 3, 5, 10, 20, 30, 60, 120))
+
+
+class PreemptionRequest:
+    __slots__ = ("direction", "confidence", "arrival", "source", "hits", "seq")
+
+    def __init__(self, direction, confidence, arrival, source, seq):
+        self.direction = direction
+        self.confidence = confidence
+        self.arrival = arrival
+        self.source = source
+        self.hits = 1
+        self.seq = seq
+
+    def merge(self, confidence, source):
+        self.confidence = 1.0 - (1.0 - self.confidence) * (1.0 - confidence)
+        self.hits += 1
+        if source not in self.source.split("+"):
+            self.source += "+" + source
+
+    def key(self):
+        return (-self.confidence, self.arrival, self.seq)
+
+    def as_dict(self, now):
+        return {"direction": self.direction, "confidence": round(self.confidence, 3),
+                "waiting_s": round(now - self.arrival, 2), "source": self.source,
+                "hits": self.hits}
+
+
+class PreemptionManager:
+    def __init__(self, controller, window=2.0, cooldown=15.0, grant_timeout=5.0, hold=None,
+                 max_hold=None, max_wait=90.0, compatible=DEFAULT_COMPATIBLE, on_grant=None,
+                 clock=None):
+        """
+        window        : seconds a batch stays open after its first request
+        cooldown      : seconds after a direction's preemption ends during which
+                        new hits for it are treated as the same vehicle
+        grant_timeout : seconds a grant may take to show up in the controller
+                        snapshot; if it never does (the command failed or was
+                        dropped) it counts as ended and the queue moves on
+        hold          : preemption green (None = the controller's green time)
+        max_hold      : longest a preemption may be extended by joiners (None = 2 * hold)
+        max_wait      : queued requests older than this are dropped
+        on_grant      : fn(directions, requests, now) after each grant / join
+        """
+        self.controller = controller
+        self.clock = clock or controller.clock
+        self.window = float(window)
+        self.cooldown = float(cooldown)
+        self.grant_timeout = float(grant_timeout)
+        self.hold = hold
+        self.max_hold = max_hold
+        self.max_wait = float(max_wait)
+        self.compatible = {frozenset(pair) for pair in compatible}
+        self.on_grant = on_grant
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._seq = itertools.count()
+
+        self._batch = {}          # direction -> request, window still open
+        self._batch_close = None
+        self._heap = []           # (key, request); stale when key != request.key()
+        self._queued = {}         # direction -> request waiting in the heap
+        self._active = ()         # directions of our running preemption
+        self._active_since = None
+        self._active_hold = 0.0
+        self._sent_at = None      # last grant or join handed to the controller
+        self._seen = False        # controller has applied it
+        self._served_until = {}   # direction -> when its last preemption ended
+
+        self.counts = {"batched": 0, "merged": 0, "suppressed": 0, "expired": 0,
+                       "granted": 0, "joined": 0, "groups": 0}
+
+    # -------------------- intake (any thread) --------------------
+    def submit(self, direction, confidence=None, source="siren", now=None):
+        """Queue one detection; returns batched / merged / suppressed."""
+        d = direction.lower()
+        if d not in self.controller.directions:
+            raise ValueError(f"unknown direction {direction!r}")
+        if confidence is None:
+            confidence = SOURCE_CONFIDENCE.get(source, DEFAULT_CONFIDENCE)
+        with self._lock:
+            now = self.clock() if now is None else now
+            outcome = self._submit(d, min(1.0, max(0.0, float(confidence))), source, now)
+            self.counts[outcome] += 1
+        PREEMPTION_REQUESTS.labels(outcome).inc()
+        self._wake.set()
+        return outcome
+
+    def _submit(self, d, confidence, source, now):
+        if d in self._active or now - self._served_until.get(d, -self.cooldown) < self.cooldown:
+            return "suppressed"
+        req = self._batch.get(d)
+        if req is not None:
+            req.merge(confidence, source)
+            return "merged"
+        req = self._queued.get(d)
+        if req is not None:
+            key = req.key()
+            req.merge(confidence, source)
+            if req.key() != key:
+                heapq.heappush(self._heap, (req.key(), req))  # the old entry goes stale
+            return "merged"
+        self._batch[d] = PreemptionRequest(d, confidence, now, source, next(self._seq))
+        if self._batch_close is None:
+            self._batch_close = now + self.window
+        return "batched"
+
+    # -------------------- arbitration --------------------
+    def _ordered(self):
+        """Queued requests in priority order; compacts stale heap entries away."""
+        live = {}
+        for key, req in self._heap:
+            if self._queued.get(req.direction) is req and key == req.key():
+                live[req.direction] = (key, req)
+        self._heap = list(live.values())  # keys are unique (seq), so entries never tie
+        heapq.heapify(self._heap)
+        return [req for _, req in sorted(self._heap, key=lambda e: e[0])]
+
+    def _compatible(self, a, b):
+        return a == b or frozenset((a, b)) in self.compatible
+
+    def _fits(self, direction, group):
+        return all(self._compatible(direction, g) for g in group)
+
+    def _take(self, requests):
+        for req in requests:
+            del self._queued[req.direction]
+
+    def step(self, now=None):
+        """Advance arbitration to `now`; returns the directions granted or joined (or ())."""
+        with self._lock:
+            now = self.clock() if now is None else now
+            granted = self._step(now)
+        if granted and self.on_grant is not None:
+            try:
+                self.on_grant(*granted)
+            except Exception as e:
+                print("[preemption] on_grant error:", e)
+        return granted[0] if granted else ()
+
+    def _step(self, now):
+        # 1) close the batching window: its requests enter the priority queue
+        if self._batch_close is not None and now >= self._batch_close:
+            for req in self._batch.values():
+                self._queued[req.direction] = req
+                heapq.heappush(self._heap, (req.key(), req))
+            self._batch.clear()
+            self._batch_close = None
+
+        # 2) has our preemption ended (or been replaced by a manual trigger)?
+        snap = self.controller.snapshot
+        ours = snap.emergency and set(snap.emergency_directions) == set(self._active)
+        if self._active:
+            if ours:
+                self._seen = True
+            elif self._seen or now - self._sent_at > self.grant_timeout:
+                for d in self._active:
+                    self._served_until[d] = now
+                self._active = ()
+                self._seen = False
+
+        # 3) expire requests nobody could serve in time
+        queue = self._ordered()
+        for req in queue:
+            if now - req.arrival > self.max_wait:
+                del self._queued[req.direction]
+                self.counts["expired"] += 1
+                PREEMPTION_REQUESTS.labels("expired").inc()
+        queue = [r for r in queue if self._queued.get(r.direction) is r]
+        if not queue:
+            return None
+
+        hold = float(self.hold if self.hold is not None else self.controller.green_time)
+        if self._active:
+            # 4a) compatible requests join the running preemption (bounded hold)
+            max_hold = self.max_hold if self.max_hold is not None else 2 * hold
+            if now + hold - self._active_since > max_hold:
+                return None
+            joiners = []
+            group = list(self._active)
+            for req in queue:
+                if self._fits(req.direction, group):
+                    joiners.append(req)
+                    group.append(req.direction)
+            if not joiners:
+                return None
+            return self._grant(group, joiners, hold, now, "joined")
+        if snap.emergency:
+            return None  # someone else's preemption (manual trigger): wait for it
+
+        # 4b) grant the head of the queue plus everything compatible with it
+        group, chosen = [], []
+        for req in queue:
+            if self._fits(req.direction, group):
+                chosen.append(req)
+                group.append(req.direction)
+        return self._grant(group, chosen, hold, now, "granted")
+
+    def _grant(self, group, requests, hold, now, outcome):
+        self._take(requests)
+        self.controller.set_emergency(list(group), duration=hold)
+        if outcome == "granted":
+            self._active_since = now
+            self.counts["groups"] += 1
+        self._active = tuple(group)
+        self._active_hold = now + hold - self._active_since
+        self._sent_at = now  # a join restarts the wait for the controller
+        self._seen = False
+        self.counts[outcome] += len(requests)
+        for req in requests:
+            PREEMPTION_REQUESTS.labels(outcome).inc()
+            PREEMPTION_WAIT.observe(now - req.arrival)
+        print(f"[preemption] {outcome} {'+'.join(group)} for {hold:.0f}s "
+              f"({', '.join(f'{r.direction}@{r.confidence:.2f}' for r in requests)})")
+        return tuple(group), requests, now
+
+    # -------------------- background driver --------------------
+    def next_wakeup(self):
+        """Clock time step() next has work to do (None = only on submit)."""
+        times = []
+        if self._batch_close is not None:
+            times.append(self._batch_close)
+        if self._active or self._queued:
+            deadline = self.controller.snapshot.deadline
+            times.append(deadline if deadline is not None else self.clock() + 1.0)
+        return min(times) if times else None
+
+    def wake(self):
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            try:
+                self.step()
+            except Exception as e:
+                print("[preemption] error:", e)
+            nxt = self.next_wakeup()
+            # never spin: the ticker may apply a due transition a moment late
+            self._wake.wait(None if nxt is None else max(0.05, nxt - self.clock()))
+            self._wake.clear()
+
+    def stats(self):
+        with self._lock:
+            now = self.clock()
+            return {**self.counts,
+                    "active": list(self._active),
+                    "active_hold_s": round(self._active_hold, 1) if self._active else 0,
+                    "batch": [r.as_dict(now) for r in self._batch.values()],
+                    "queue": [r.as_dict(now) for r in self._ordered()]}
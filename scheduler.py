@@ -0,0 +1,176 @@
+"""
+Deadline-based scheduler for the TrafficController.
+
+Replaces the old `tick(); time.sleep(1)` loop. Wake-ups are computed from
+monotonic deadlines, so the time a tick takes is never added on top of the
+period and the cycle does not drift:
+
+- it sleeps until the controller's next phase transition (green → yellow,
+  yellow → next direction, emergency expiry),
+- optionally also wakes on each whole-second countdown boundary while
+  somebody is watching (e.g. /status/stream clients),
+- sleeps indefinitely while the controller is paused (manual mode),
+- wakes early when the controller reports a change (mode, timer, emergency).
+
+It records tick jitter (actual wake - planned wake) and transition lateness
+(tick time - transition deadline) so timing accuracy can be checked; tick
+duration, jitter and lateness are also exported as /metrics histograms,
+labelled with the scheduler's name.
+
+Usage:
+    from scheduler import ControllerScheduler
+    sched = ControllerScheduler(controller, on_tick=publish)
+    Thread(target=sched.run, daemon=True).start()
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+from metrics import Counter, Histogram
+
+TICK_SECONDS = Histogram("smarttraffic_controller_tick_seconds",
+                         "Time spent in one controller tick", ("scheduler",),
+                         buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                                  0.001, 0.0025, 0.01, 0.05))
+TICK_JITTER = Histogram("smarttraffic_controller_tick_jitter_seconds",
+                        "Actual minus planned scheduler wake-up", ("scheduler",))
+TRANSITION_LATENESS = Histogram("smarttraffic_controller_transition_lateness_seconds",
+                                "Tick time minus phase transition deadline", ("scheduler",))
+TICK_ERRORS = Counter("smarttraffic_controller_tick_errors_total",
+                      "Controller ticks that raised", ("scheduler",))
+
+
+class TimingStats:
+    """Rolling window of timing samples (seconds)."""
+
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def summary(self):
+        data = sorted(self.samples)
+        if not data:
+            return {"count": self.count, "mean_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        p99 = data[min(len(data) - 1, int(math.ceil(0.99 * len(data))) - 1)]
+        return {
+            "count": self.count,
+            "mean_ms": round(1000 * sum(data) / len(data), 3),
+            "p99_ms": round(1000 * p99, 3),
+            "max_ms": round(1000 * self.max, 3),
+        }
+
+
+class ControllerScheduler:
+    def __init__(self, controller, on_tick=None, wants_countdown=None, idle_wait=None,
+                 on_transitions=None, name="main"):
+        """
+        controller      : TrafficController (uses its clock, tick, next_deadline)
+        on_tick         : called after every tick (e.g. publish status)
+        on_transitions  : called with [(event, lateness)] after ticks that changed phase
+        wants_countdown : callable -> bool; when True also wake on every
+                          countdown second so displays see it tick
+        idle_wait       : max seconds to sleep with nothing scheduled (None = forever)
+        name            : `scheduler` label of the exported metrics
+        """
+        self.controller = controller
+        self.on_tick = on_tick
+        self.wants_countdown = wants_countdown or (lambda: False)
+        self.idle_wait = idle_wait
+        self.on_transitions = on_transitions
+        self.clock = controller.clock
+
+        self.name = name
+        self._tick_hist = TICK_SECONDS.labels(name)
+        self._jitter_hist = TICK_JITTER.labels(name)
+        self._lateness_hist = TRANSITION_LATENESS.labels(name)
+        self._errors = TICK_ERRORS.labels(name)
+
+        self.jitter = TimingStats()
+        self.lateness = TimingStats()
+        self.ticks = 0
+        self.early_wakes = 0
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        controller.add_change_listener(self.wake)
+
+    def wake(self):
+        """Ask the loop to re-evaluate now (called on external changes)."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def next_wakeup(self, now):
+        """Monotonic time of the next moment the controller's state changes."""
+        deadline = self.controller.next_deadline()
+        if deadline is None:
+            return None
+        if self.wants_countdown():
+            # whole-second boundaries of the countdown, counted back from the deadline
+            left = deadline - now
+            if left > 1.0:
+                return deadline - (math.ceil(left) - 1)
+        return deadline
+
+    def tick(self, now=None):
+        now = self.clock() if now is None else now
+        start = time.perf_counter()
+        transitions = self.controller.tick(now) or []
+        self._tick_hist.observe(time.perf_counter() - start)
+        for _, late in transitions:
+            self.lateness.add(late)
+            self._lateness_hist.observe(late)
+        self.ticks += 1
+        if transitions and self.on_transitions:
+            self.on_transitions(transitions)
+        if self.on_tick:
+            self.on_tick()
+        return transitions
+
+    def run(self):
+        """Scheduler loop; run on its own thread."""
+        planned = None
+        # from now on commands are applied by this thread only
+        self.controller.driven = True
+        while not self._stop.is_set():
+            now = self.clock()
+            if planned is not None:
+                late = max(0.0, now - planned)
+                self.jitter.add(late)
+                self._jitter_hist.observe(late)
+            try:
+                self.tick(now)
+            except Exception as e:
+                self._errors.inc()
+                print("[controller-loop] error:", e)
+
+            planned = self.next_wakeup(self.clock())
+            if planned is None:
+                timeout = self.idle_wait
+            else:
+                timeout = max(0.0, planned - self.clock())
+            if self._wake.wait(timeout):
+                # woken early by a change: no jitter sample for this wake-up
+                self._wake.clear()
+                self.early_wakes += 1
+                planned = None
+        self.controller.driven = False
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "early_wakes": self.early_wakes,
+            "jitter": self.jitter.summary(),
+            "transition_lateness": self.lateness.summary(),
+        }
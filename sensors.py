@@ -1,6 +1,7 @@
 import random
 
-def get_density():
+def get_density(intersection=None):
+    """Vehicles per approach at a junction (None = the main junction); simulated."""
     return {
         'North': random.randint(10, 100),
         'South': random.randint(10, 100),
@@ -0,0 +1,87 @@
+"""
+Production launcher: one controller authority + N HTTP workers.
+
+    python serve.py                      # authority + gunicorn, 4 workers on :8000
+    python serve.py --workers 8 --bind 0.0.0.0:80
+    python serve.py authority            # only the authority (workers started elsewhere)
+
+The authority process owns the signal state (controller, intersection
+registry, settings store, siren listener, camera workers) and exposes it
+over a Unix socket plus a shared-memory status snapshot (controller_ipc).
+HTTP workers are started with SMARTTRAFFIC_ROLE=worker, so importing app.py
+there builds IPC proxies instead of a second controller. Workers use
+gunicorn's gthread class so long-lived /status/stream clients don't pin a
+whole process each. Do not use --preload: worker threads must start after
+the fork.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_authority():
+    os.environ['SMARTTRAFFIC_ROLE'] = 'authority'
+    sys.path.insert(0, BASE_DIR)
+    import app
+    app.run_authority()
+
+
+def _wait_for(path, proc, timeout):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if proc.poll() is not None:
+            sys.exit(f"controller authority exited with code {proc.returncode}")
+        if time.monotonic() > deadline:
+            proc.terminate()
+            sys.exit(f"controller authority did not open {path} within {timeout}s")
+        time.sleep(0.05)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="SmartTraffic production server")
+    ap.add_argument('role', nargs='?', choices=('all', 'authority'), default='all')
+    ap.add_argument('--workers', type=int, default=4)
+    ap.add_argument('--threads', type=int, default=16, help="threads per HTTP worker")
+    ap.add_argument('--bind', default='127.0.0.1:8000')
+    ap.add_argument('--ipc', default=os.path.join(BASE_DIR, 'controller.sock'),
+                    help="Unix socket of the controller authority")
+    args = ap.parse_args(argv)
+
+    os.environ['SMARTTRAFFIC_IPC'] = args.ipc
+    if args.role == 'authority':
+        run_authority()
+        return
+
+    if os.path.exists(args.ipc):
+        os.unlink(args.ipc)
+    authority = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'authority',
+                                  '--ipc', args.ipc], cwd=BASE_DIR)
+    workers = None
+    try:
+        _wait_for(args.ipc, authority, timeout=60)
+        env = dict(os.environ, SMARTTRAFFIC_ROLE='worker')
+        workers = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app',
+                                    '--workers', str(args.workers),
+                                    '--worker-class', 'gthread', '--threads', str(args.threads),
+                                    '--bind', args.bind, '--chdir', BASE_DIR], env=env)
+        while authority.poll() is None and workers.poll() is None:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in (workers, authority):
+            if proc is not None and proc.poll() is None:
+                proc.terminate()
+                try:
+                    proc.wait(10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Typed, persistent settings shared by the app and the controller.
+
+One schema covers the runtime signal settings (green / yellow / red, mode,
+sensor switches) and the density-adaptive timing parameters, all stored in
+settings.json. The file is read once at startup; values are validated and
+coerced on every update, and the resulting set is checked against the
+cross-field RULES (e.g. minGreen <= maxGreen) before anything is applied.
+
+Components subscribe to the keys they care about with on_change(); hooks
+run once per update with only the keys that actually changed, so pushing
+settings onto the controller is explicit instead of probing attributes.
+
+Disk writes are coalesced: an update only marks the store dirty, and a
+background thread writes after `debounce` seconds without further changes
+(at most `max_delay` after the first one) through a temp file + fsync +
+atomic rename. A slider firing many /save_settings calls costs one write.
+
+Usage:
+    from settings_store import SettingsStore
+    settings = SettingsStore('settings.json')
+    settings.on_change(('green',), lambda changed: controller.set_timer(changed['green']))
+    settings.update(green=20, mode='manual')
+    settings['green']                     # 20
+"""
+
+import json
+import os
+import threading
+import time
+
+
+def _int_at_least(lo):
+    def coerce(v):
+        return max(lo, int(v))
+    return coerce
+
+
+def _float_between(lo, hi):
+    def coerce(v):
+        return min(hi, max(lo, float(v)))
+    return coerce
+
+
+def _choice(*options):
+    def coerce(v):
+        if v not in options:
+            raise ValueError(f"expected one of {options}, got {v!r}")
+        return v
+    return coerce
+
+
+def _bool(v):
+    if isinstance(v, str):
+        return v.strip().lower() in ("1", "true", "yes", "on")
+    return bool(v)
+
+
+# key -> (default, coerce)
+SCHEMA = {
+    # signal timing / operation
+    "green": (15, _int_at_least(1)),
+    "yellow": (3, _int_at_least(1)),
+    "red": (18, _int_at_least(1)),
+    "mode": ("auto", _choice("auto", "manual", "emergency")),
+    "density_sensor": (True, _bool),
+    "siren_sensor": (True, _bool),
+    "adaptive": (False, _bool),
+    # density-adaptive timing (see adaptive_timing.DEFAULT_CONFIG)
+    "baseGreen": (15, _float_between(1, 600)),
+    "minGreen": (5, _float_between(1, 600)),
+    "maxGreen": (45, _float_between(1, 600)),
+    "densitySensitivity": (0.6, _float_between(0.0, 1.0)),
+    "smoothing": (0.3, _float_between(0.01, 1.0)),
+    "method": ("proportional", _choice("proportional", "webster")),
+    "saturationFlow": (1800, _float_between(1, 10000)),
+    "maxCycle": (120, _float_between(10, 600)),
+}
+
+# cross-field rules: (keys, check(values) -> bool, message)
+RULES = (
+    (("minGreen", "maxGreen"), lambda v: v["minGreen"] <= v["maxGreen"],
+     "minGreen must not exceed maxGreen"),
+)
+
+
+def check_rules(values):
+    """Raise ValueError for the first rule the complete `values` dict breaks."""
+    for keys, check, message in RULES:
+        if not check(values):
+            raise ValueError(f"{message} ({', '.join(f'{k}={values[k]}' for k in keys)})")
+
+
+# older settings.json keys -> schema keys
+ALIASES = {"yellowTime": "yellow"}
+
+TIMING_KEYS = ("baseGreen", "minGreen", "maxGreen", "densitySensitivity",
+               "smoothing", "method", "saturationFlow", "maxCycle")
+
+
+class SettingsStore:
+    def __init__(self, path, debounce=0.5, max_delay=5.0):
+        self.path = path
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._values = {k: default for k, (default, _) in SCHEMA.items()}
+        self._extra = {}  # unknown keys in the file are kept as-is
+        self._hooks = []
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._dirty_since = None
+        self._last_change = None
+        self._writer = None
+        self._write_lock = threading.Lock()  # writer thread and flush() write one at a time
+        self._dispatch_lock = threading.RLock()  # update + its hooks, one update at a time
+        self._version = 0          # bumped by every applied update
+        self._written_version = 0  # version of the file on disk
+
+        self.writes = 0
+        self.updates = 0
+        self._load()
+
+    # -------------------- loading --------------------
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print("[settings] using defaults, could not read", self.path, "-", e)
+            return
+        for key, value in raw.items():
+            key = ALIASES.get(key, key)
+            if key not in SCHEMA:
+                self._extra[key] = value
+                continue
+            try:
+                self._values[key] = SCHEMA[key][1](value)
+            except (TypeError, ValueError) as e:
+                print(f"[settings] ignoring {key}={value!r}: {e}")
+        for keys, check, message in RULES:
+            if not check(self._values):
+                print(f"[settings] {message}: using defaults for {', '.join(keys)}")
+                self._values.update({k: SCHEMA[k][0] for k in keys})
+
+    # -------------------- reading --------------------
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def as_dict(self):
+        return dict(self._values)
+
+    def timing_config(self):
+        """Config dict for adaptive_timing.AdaptiveTiming."""
+        cfg = {k: self._values[k] for k in TIMING_KEYS}
+        cfg["yellowTime"] = self._values["yellow"]
+        return cfg
+
+    # -------------------- writing --------------------
+    def on_change(self, keys, fn):
+        """Call fn({key: new_value}) whenever any of `keys` changes."""
+        self._hooks.append((frozenset(keys), fn))
+
+    def update(self, **changes):
+        """
+        Validate and apply changes (all or nothing). Returns the keys that
+        changed; raises ValueError/KeyError on bad input.
+        """
+        coerced = {}
+        for key, value in changes.items():
+            if key not in SCHEMA:
+                raise KeyError(f"unknown setting {key!r}")
+            coerced[key] = SCHEMA[key][1](value)
+        # hooks run outside the value lock (they may be slow or read the
+        # store) but inside the dispatch lock, so two concurrent updates
+        # reach the hooks in the order they were applied
+        with self._dispatch_lock:
+            with self._cond:
+                check_rules({**self._values, **coerced})
+                changed = {k: v for k, v in coerced.items() if self._values[k] != v}
+                if not changed:
+                    return {}
+                self._values.update(changed)
+                self.updates += 1
+                self._version += 1
+                now = time.monotonic()
+                self._last_change = now
+                if self._dirty_since is None:
+                    self._dirty_since = now
+                self._ensure_writer()
+                self._cond.notify()
+            for keys, fn in self._hooks:
+                hit = {k: v for k, v in changed.items() if k in keys}
+                if hit:
+                    try:
+                        fn(hit)
+                    except Exception as e:
+                        print("[settings] hook error:", e)
+        return changed
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer.start()
+
+    def _writer_loop(self):
+        while True:
+            with self._cond:
+                while self._dirty_since is None:
+                    self._cond.wait()
+                # wait for a quiet period, but never longer than max_delay
+                while self._dirty_since is not None:
+                    now = time.monotonic()
+                    due = min(self._last_change + self.debounce, self._dirty_since + self.max_delay)
+                    if now >= due:
+                        break
+                    self._cond.wait(due - now)
+                if self._dirty_since is None:  # flushed meanwhile
+                    continue
+                data = {**self._extra, **self._values}
+                version = self._version
+                self._dirty_since = None
+            try:
+                self._write(data, version)
+            except Exception as e:
+                print("[settings] write error:", e)
+
+    def _write(self, data, version):
+        """Replace the file with `data`, unless a newer version already landed."""
+        tmp = self.path + ".tmp"
+        with self._write_lock:
+            if version <= self._written_version:
+                return
+            with open(tmp, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._written_version = version
+            self.writes += 1
+
+    def flush(self):
+        """Write pending changes now (e.g. on shutdown)."""
+        with self._cond:
+            if self._dirty_since is None:
+                return
+            data = {**self._extra, **self._values}
+            version = self._version
+            self._dirty_since = None
+        self._write(data, version)
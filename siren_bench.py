@@ -0,0 +1,142 @@
+"""
+Offline evaluation / benchmark of the siren detector.
+
+Feeds recorded audio through the same SirenDetector the mic loop uses, as
+fast as the CPU allows, and reports:
+
+- throughput       audio seconds processed per wall-clock second
+- chunk latency    p50 / p99 / max time of one feed() call (one hop)
+- detection delay  first siren hop after the labelled onset
+- false triggers   siren hops before the onset, per audio minute
+
+Inputs are 16-bit WAV files ("path" = noise only, "path@onset_s" = siren
+starting at onset_s) and/or synthetic clips built from static/siren.mp3
+(decoded with ffmpeg) mixed into white noise at the requested SNRs.
+
+Usage:
+    python siren_bench.py                          # bundled siren at 20/10/0 dB SNR
+    python siren_bench.py --snr 5 --hop 512 street.wav intersection.wav@4.5
+    python siren_bench.py --json > baseline.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from sound_sensor import RATE, HOP, SirenDetector, read_wav
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SIREN_FILE = os.path.join(BASE_DIR, 'static', 'siren.mp3')
+
+
+def decode_audio(path, rate=RATE):
+    """Mono int16 samples of any file ffmpeg can read (WAV is read directly)."""
+    if path.lower().endswith('.wav'):
+        file_rate, samples = read_wav(path)
+        if file_rate != rate:
+            raise ValueError(f"{path}: {file_rate} Hz, expected {rate} Hz")
+        return samples.mean(axis=1).astype(np.int16)
+    try:
+        out = subprocess.run(['ffmpeg', '-v', 'error', '-i', path, '-f', 's16le', '-ac', '1',
+                              '-ar', str(rate), '-'], capture_output=True, check=True)
+    except FileNotFoundError:
+        raise SystemExit(f"ffmpeg is required to decode {path} (or pass 16-bit WAV files)")
+    return np.frombuffer(out.stdout, dtype=np.int16)
+
+
+def mix_clip(siren, snr_db, lead_s=5.0, rate=RATE, seed=0):
+    """White noise with `siren` starting after lead_s seconds at the given SNR."""
+    rng = np.random.default_rng(seed)
+    siren = siren.astype(np.float64)
+    lead = int(lead_s * rate)
+    p_sig = np.mean(siren ** 2) or 1.0
+    noise_rms = np.sqrt(p_sig / 10 ** (snr_db / 10.0))
+    clip = rng.normal(0.0, noise_rms, lead + len(siren))
+    clip[lead:] += siren
+    peak = np.abs(clip).max() or 1.0
+    if peak > 32767:
+        clip *= 32767 / peak
+    return clip.astype(np.int16)
+
+
+def evaluate(samples, onset_s=None, rate=RATE, **detector_kwargs):
+    """Run one clip hop by hop through a fresh detector and collect metrics."""
+    detector = SirenDetector(rate=rate, **detector_kwargs)
+    hop = detector.hop
+    onset = None if onset_s is None else int(onset_s * rate)
+    timings = np.empty((len(samples) + hop - 1) // hop)
+    first_hit = None
+    false_hits = 0
+
+    start = time.perf_counter()
+    for k, pos in enumerate(range(0, len(samples), hop)):
+        t0 = time.perf_counter()
+        hit = detector.feed(samples[pos:pos + hop])
+        timings[k] = time.perf_counter() - t0
+        if hit:
+            end = pos + hop
+            if onset is None or end <= onset:
+                false_hits += 1
+            elif first_hit is None:
+                first_hit = end
+    wall = time.perf_counter() - start
+
+    audio_s = len(samples) / rate
+    negative_s = audio_s if onset is None else min(audio_s, onset_s)
+    return {
+        "audio_s": round(audio_s, 3),
+        "throughput_x": round(audio_s / wall, 1) if wall > 0 else float('inf'),
+        "chunk_p50_us": round(1e6 * float(np.percentile(timings, 50)), 1),
+        "chunk_p99_us": round(1e6 * float(np.percentile(timings, 99)), 1),
+        "chunk_max_us": round(1e6 * float(timings.max()), 1),
+        "detected": first_hit is not None,
+        "detection_delay_ms": (None if first_hit is None
+                               else round(1000 * (first_hit - onset) / rate, 1)),
+        "false_hops": false_hits,
+        "false_per_min": round(60 * false_hits / negative_s, 2) if negative_s else 0.0,
+    }
+
+
+def _clips(args):
+    for spec in args.files:
+        path, _, onset = spec.partition('@')
+        yield os.path.basename(spec), decode_audio(path), float(onset) if onset else None
+    if args.files and not args.snr:
+        return
+    siren = decode_audio(args.siren)
+    for snr in args.snr or [20, 10, 0]:
+        yield f"siren.mp3 @ {snr:g} dB", mix_clip(siren, snr, lead_s=args.lead), args.lead
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    ap.add_argument('files', nargs='*', help="WAV files, optionally path@onset_seconds")
+    ap.add_argument('--siren', default=SIREN_FILE, help="siren recording for synthetic clips")
+    ap.add_argument('--snr', type=float, action='append', help="synthetic clip SNR (dB), repeatable")
+    ap.add_argument('--lead', type=float, default=5.0, help="noise-only seconds before the siren")
+    ap.add_argument('--hop', type=int, default=HOP)
+    ap.add_argument('--json', action='store_true', help="print results as JSON")
+    args = ap.parse_args(argv)
+
+    results = {}
+    for name, samples, onset in _clips(args):
+        results[name] = evaluate(samples, onset, hop=args.hop)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return results
+    cols = ("throughput_x", "chunk_p50_us", "chunk_p99_us", "detection_delay_ms", "false_per_min")
+    print(f"{'clip':<28}" + "".join(f"{c:>20}" for c in cols))
+    for name, r in results.items():
+        print(f"{name:<28}" + "".join(f"{str(r[c]):>20}" for c in cols))
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -2,91 +2,354 @@
 Mic-based ambulance siren detector with graceful fallback.
 
 - If PyAudio + microphone available: listens in real-time and detects siren-like energy
-  in ~500–1500 Hz with simple modulation check.
+  in ~500–1500 Hz with simple modulation check, on overlapping FFT frames
+  (SirenDetector, one decision per HOP samples).
 - Else: falls back to random simulation (so demo continues to work).
 
+- With one mic per approach (multi-channel input), MultiSirenDetector picks the
+  approach from per-channel band energy or arrival delay (TDOA).
+
 Usage:
     from sound_sensor import start_siren_listener
     start_siren_listener(on_detect_callback, cooldown=15)
+    start_siren_listener(on_detect_callback, directions=['north', 'east', 'south', 'west'])
+
+    from sound_sensor import locate_in_wav        # offline, multi-channel WAV
+    locate_in_wav('junction.wav', ['north', 'east', 'south', 'west'])
 """
 
+import importlib
 import time
 import math
 import random
 import threading
+import wave
+from functools import lru_cache
 
-# Try to import mic deps
-try:
-    import pyaudio
-    import numpy as np
-    HAVE_MIC = True
-except Exception:
-    HAVE_MIC = False
-    # lazy import numpy only if needed elsewhere
-    try:
-        import numpy as np  # might be present anyway
-    except Exception:
-        np = None
+from lazy_imports import lazy_module
+from metrics import Counter, Histogram
+
+# NumPy and PyAudio load on first use; probing PyAudio initialises PortAudio,
+# which is slow, so it happens on the listener thread (mic_available)
+np = lazy_module("numpy")
+pyaudio = lazy_module("pyaudio")
 
 # Config
 RATE = 44100
-CHUNK = 4096
+CHUNK = 4096      # FFT frame (samples)
+HOP = 1024        # samples between decisions (frames overlap by CHUNK - HOP)
 LOW_F = 500
 HIGH_F = 1500
 
-def _band_energy(fft_abs, freqs, low, high):
-    """Sum of magnitude in [low, high] Hz band."""
-    band = (freqs >= low) & (freqs <= high)
-    if not np.any(band):
-        return 0.0
-    return float(np.sum(fft_abs[band]))
+# exported at /metrics (one FFT frame = one analysed hop)
+FFT_SECONDS = Histogram("smarttraffic_siren_fft_seconds",
+                        "Time to analyse one FFT frame", ("detector",),
+                        buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05))
+SIREN_HITS = Counter("smarttraffic_siren_hits_total",
+                     "FFT frames that looked like a siren", ("detector",))
+SIREN_DETECTIONS = Counter("smarttraffic_siren_detections_total",
+                           "Siren detections passed to the controller", ("source",))
+
+
+class RollingStats:
+    """O(1) mean / std over the last `window` values (running sums on a ring)."""
+
+    def __init__(self, window):
+        self.window = window
+        self._ring = np.zeros(window)
+        self._pos = 0
+        self.count = 0
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+    def push(self, x):
+        if self.count == self.window:
+            old = self._ring[self._pos]
+            self._sum -= old
+            self._sumsq -= old * old
+        else:
+            self.count += 1
+        self._ring[self._pos] = x
+        self._pos = (self._pos + 1) % self.window
+        self._sum += x
+        self._sumsq += x * x
+
+    def std(self):
+        if self.count == 0:
+            return 0.0
+        mean = self._sum / self.count
+        return math.sqrt(max(0.0, self._sumsq / self.count - mean * mean))
+
+
+class SirenDetector:
+    """
+    Streaming siren detector over overlapping FFT frames.
+
+    A `frame`-sample window slides forward by `hop` samples, so a decision is
+    made every hop (23 ms at the defaults) instead of once per 93 ms chunk.
+    Window, frequency bins and the band index slice are computed once; audio
+    is copied straight into a preallocated float32 frame buffer and the
+    modulation check is a rolling std over the last `history_s` seconds.
+    """
+
+    def __init__(self, rate=RATE, frame=CHUNK, hop=HOP, low=LOW_F, high=HIGH_F,
+                 band_ratio=0.35, modulation=0.02, history_s=12 * CHUNK / RATE):
+        if not 0 < hop <= frame:
+            raise ValueError("hop must be in 1..frame")
+        self.rate = rate
+        self.frame = frame
+        self.hop = hop
+        self.band_ratio = band_ratio
+        self.modulation = modulation
+
+        self.window = np.hanning(frame).astype(np.float32)
+        freqs = np.fft.rfftfreq(frame, 1.0 / rate)
+        self.band = slice(int(np.searchsorted(freqs, low, 'left')),
+                          int(np.searchsorted(freqs, high, 'right')))
+
+        self._buf = np.zeros(frame, dtype=np.float32)   # last `frame` samples
+        self._windowed = np.empty(frame, dtype=np.float32)
+        self._mag = np.empty(len(freqs))
+        self._fill = frame - hop                        # first frame needs one hop
+        self.history = RollingStats(max(1, int(round(history_s * rate / hop))))
+        self.samples_seen = 0
+        self.ratio = 0.0
+        self._fft_seconds = FFT_SECONDS.labels("single")
+        self._hits = SIREN_HITS.labels("single")
+
+    def _analyze(self):
+        np.multiply(self._buf, self.window, out=self._windowed)
+        np.abs(np.fft.rfft(self._windowed), out=self._mag)
+        total = float(self._mag.sum()) + 1e-9
+        ratio = float(self._mag[self.band].sum()) / total
+        self.history.push(ratio)
+        self.ratio = ratio
+        return ratio > self.band_ratio and self.history.std() > self.modulation
+
+    def feed(self, samples):
+        """
+        Push int16 PCM (bytes or array) of any length. Returns the number of
+        hops in it that looked like a siren.
+        """
+        if isinstance(samples, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(samples, dtype=np.int16)
+        hits = 0
+        pos, n = 0, len(samples)
+        buf, frame = self._buf, self.frame
+        while pos < n:
+            take = min(frame - self._fill, n - pos)
+            np.copyto(buf[self._fill:self._fill + take], samples[pos:pos + take], casting='unsafe')
+            self._fill += take
+            pos += take
+            if self._fill == frame:
+                start = time.perf_counter()
+                hit = self._analyze()
+                self._fft_seconds.observe(time.perf_counter() - start)
+                if hit:
+                    hits += 1
+                buf[:frame - self.hop] = buf[self.hop:]
+                self._fill = frame - self.hop
+        self.samples_seen += n
+        if hits:
+            self._hits.inc(hits)
+        return hits
+
+
+class MultiSirenDetector:
+    """
+    Siren detector for one mic per approach (or a small array).
+
+    All channels share one (channels, frame) buffer and go through a single
+    batched rfft per hop. The siren is on the approach whose mic has the
+    most band energy ("energy"), or -- for a compact array where loudness
+    barely differs -- the channel the wavefront reaches first, from
+    band-limited GCC-PHAT delays against channel 0 ("tdoa").
+
+    max_delay_s bounds the searched delay to the array's acoustic aperture
+    (mic spacing / 343 m/s); sirens are narrowband, so a bound beyond half a
+    wail period makes the delay ambiguous.
+    """
+
+    def __init__(self, directions, rate=RATE, frame=CHUNK, hop=HOP, low=LOW_F, high=HIGH_F,
+                 band_ratio=0.35, modulation=0.02, history_s=12 * CHUNK / RATE,
+                 method="energy", max_delay_s=0.0005):
+        if method not in ("energy", "tdoa"):
+            raise ValueError(f"unknown localization method {method!r}")
+        if not 0 < hop <= frame:
+            raise ValueError("hop must be in 1..frame")
+        self.directions = list(directions)
+        self.channels = len(self.directions)
+        self.rate = rate
+        self.frame = frame
+        self.hop = hop
+        self.band_ratio = band_ratio
+        self.modulation = modulation
+        self.method = method
+
+        self.window = np.hanning(frame).astype(np.float32)
+        freqs = np.fft.rfftfreq(frame, 1.0 / rate)
+        self.band = slice(int(np.searchsorted(freqs, low, 'left')),
+                          int(np.searchsorted(freqs, high, 'right')))
+        # circular-correlation indices for lags in [-max_lag, max_lag]
+        max_lag = max(1, min(frame // 2 - 1, int(round(max_delay_s * rate))))
+        self.lags = np.arange(-max_lag, max_lag + 1)
+        self._lag_idx = self.lags % frame
+        self._cross = np.zeros((self.channels, len(freqs)), dtype=np.complex128)
+
+        self._buf = np.zeros((self.channels, frame), dtype=np.float32)
+        self._windowed = np.empty((self.channels, frame), dtype=np.float32)
+        self._mag = np.empty((self.channels, len(freqs)))
+        self._fill = frame - hop
+        self.history = RollingStats(max(1, int(round(history_s * rate / hop))))
+        self.samples_seen = 0
+        self.ratio = np.zeros(self.channels)
+        self.band_energy = np.zeros(self.channels)
+        self.delays = np.zeros(self.channels)
+        self.direction = None
+        self._fft_seconds = FFT_SECONDS.labels("multi")
+        self._hits = SIREN_HITS.labels("multi")
+
+    def _locate(self, spectra):
+        if self.method == "energy" or self.channels == 1:
+            return int(np.argmax(self.band_energy))
+        b = self.band
+        cross = spectra[:, b] * np.conj(spectra[0, b])
+        cross /= np.abs(cross) + 1e-12
+        self._cross[:, b] = cross
+        cc = np.fft.irfft(self._cross, n=self.frame, axis=-1)[:, self._lag_idx]
+        self.delays = self.lags[np.argmax(cc, axis=-1)] / self.rate
+        return int(np.argmin(self.delays))
+
+    def _analyze(self):
+        np.multiply(self._buf, self.window, out=self._windowed)
+        spectra = np.fft.rfft(self._windowed, axis=-1)
+        np.abs(spectra, out=self._mag)
+        total = self._mag.sum(axis=-1) + 1e-9
+        self.band_energy = self._mag[:, self.band].sum(axis=-1)
+        self.ratio = self.band_energy / total
+        best = float(self.ratio.max())
+        self.history.push(best)
+        if best > self.band_ratio and self.history.std() > self.modulation:
+            self.direction = self.directions[self._locate(spectra)]
+            return True
+        return False
+
+    def feed(self, samples):
+        """
+        Push interleaved int16 PCM (bytes, or an (n, channels) array). Returns
+        the number of siren hops; `direction` holds the latest located approach.
+        """
+        if isinstance(samples, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(samples, dtype=np.int16).reshape(-1, self.channels)
+        hits = 0
+        pos, n = 0, len(samples)
+        buf, frame = self._buf, self.frame
+        while pos < n:
+            take = min(frame - self._fill, n - pos)
+            np.copyto(buf[:, self._fill:self._fill + take], samples[pos:pos + take].T,
+                      casting='unsafe')
+            self._fill += take
+            pos += take
+            if self._fill == frame:
+                start = time.perf_counter()
+                hit = self._analyze()
+                self._fft_seconds.observe(time.perf_counter() - start)
+                if hit:
+                    hits += 1
+                buf[:, :frame - self.hop] = buf[:, self.hop:]
+                self._fill = frame - self.hop
+        self.samples_seen += n
+        if hits:
+            self._hits.inc(hits)
+        return hits
+
+
+def read_wav(path):
+    """(rate, int16 array shaped (n, channels)) from a 16-bit PCM WAV file."""
+    with wave.open(path, 'rb') as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM is supported")
+        rate, channels = w.getframerate(), w.getnchannels()
+        data = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+    return rate, data.reshape(-1, channels)
 
 
-def _mic_loop(on_detect, cooldown):
+def locate_in_wav(path, directions, **detector_kwargs):
     """
-    Simple heuristic: if band energy (500–1500 Hz) dominates overall energy,
-    and shows temporal modulation over consecutive frames -> siren detected.
+    Offline run of MultiSirenDetector over a multi-channel WAV (one channel
+    per entry in `directions`). Returns [(seconds, direction)] per siren hop.
     """
+    rate, samples = read_wav(path)
+    if samples.shape[1] != len(directions):
+        raise ValueError(f"{path}: {samples.shape[1]} channels for {len(directions)} directions")
+    detector = MultiSirenDetector(directions, rate=rate, **detector_kwargs)
+    hits = []
+    for pos in range(0, len(samples), detector.hop):
+        if detector.feed(samples[pos:pos + detector.hop]):
+            hits.append((detector.samples_seen / rate, detector.direction))
+    return hits
+
+
+def _mic_loop(on_detect, cooldown, hop=None):
+    """
+    Feed the mic stream hop by hop through a SirenDetector: band energy
+    (500–1500 Hz) dominating overall energy plus temporal modulation -> siren.
+    """
+    detector = SirenDetector(hop=hop or HOP)
     p = pyaudio.PyAudio()
     stream = p.open(format=pyaudio.paInt16, channels=1, rate=RATE, input=True,
-                    frames_per_buffer=CHUNK)
+                    frames_per_buffer=detector.hop)
     last_trigger = 0
-    modulation_history = []
 
     print("[siren] Mic listener started.")
     try:
         while True:
-            data = stream.read(CHUNK, exception_on_overflow=False)
-            audio = np.frombuffer(data, dtype=np.int16).astype(np.float32)
-            if audio.size == 0:
+            data = stream.read(detector.hop, exception_on_overflow=False)
+            if not detector.feed(data):
                 continue
 
-            # FFT
-            fft = np.fft.rfft(audio)
-            mag = np.abs(fft)
-            freqs = np.fft.rfftfreq(len(audio), 1.0 / RATE)
+            now = time.time()
+            if (now - last_trigger) > cooldown:
+                last_trigger = now
+                # choose a direction (in real-world, map cam/sensor → approach road)
+                direction = random.choice(['North', 'East', 'South', 'West'])
+                SIREN_DETECTIONS.labels("mic").inc()
+                on_detect(direction)
+    except Exception as e:
+        print("[siren] Mic loop error:", e)
+    finally:
+        try:
+            stream.stop_stream()
+            stream.close()
+        except Exception:
+            pass
+        try:
+            p.terminate()
+        except Exception:
+            pass
+        print("[siren] Mic listener stopped.")
 
-            # Energies
-            band_e = _band_energy(mag, freqs, LOW_F, HIGH_F)
-            total_e = float(np.sum(mag) + 1e-9)
-            ratio = band_e / total_e  # how dominant siren band is
 
-            # track modulation (siren usually wails up/down)
-            modulation_history.append(ratio)
-            if len(modulation_history) > 12:
-                modulation_history.pop(0)
+def _multi_mic_loop(on_detect, cooldown, directions, method="energy", device=None):
+    """One input channel per approach; the located direction goes to on_detect."""
+    detector = MultiSirenDetector(directions, method=method)
+    p = pyaudio.PyAudio()
+    stream = p.open(format=pyaudio.paInt16, channels=detector.channels, rate=RATE,
+                    input=True, input_device_index=device, frames_per_buffer=detector.hop)
+    last_trigger = 0
 
-            # simple modulation check: std dev above threshold + strong band
-            mod_ok = (np.std(modulation_history) > 0.02)
-            strong_band = ratio > 0.35
+    print(f"[siren] {detector.channels}-channel mic listener started ({method}).")
+    try:
+        while True:
+            data = stream.read(detector.hop, exception_on_overflow=False)
+            if not detector.feed(data):
+                continue
 
             now = time.time()
-            if mod_ok and strong_band and (now - last_trigger) > cooldown:
+            if (now - last_trigger) > cooldown:
                 last_trigger = now
-                # choose a direction (in real-world, map cam/sensor → approach road)
-                direction = random.choice(['North', 'East', 'South', 'West'])
-                on_detect(direction)
-            time.sleep(0.01)
+                SIREN_DETECTIONS.labels("mic").inc()
+                on_detect(detector.direction)
     except Exception as e:
         print("[siren] Mic loop error:", e)
     finally:
@@ -112,16 +375,35 @@ def _random_fallback_loop(on_detect, cooldown):
             if random.random() < 0.25:
                 last = now
                 direction = random.choice(['North', 'East', 'South', 'West'])
+                SIREN_DETECTIONS.labels("fallback").inc()
                 on_detect(direction)
         time.sleep(1)
 
 
-def start_siren_listener(on_detect, cooldown=15):
+@lru_cache(maxsize=1)
+def mic_available():
+    """True when PyAudio (and NumPy) import; probed once, on first call."""
+    try:
+        importlib.import_module("pyaudio")
+        importlib.import_module("numpy")
+        return True
+    except Exception:
+        return False
+
+
+def start_siren_listener(on_detect, cooldown=15, directions=None, method="energy", device=None):
     """
     Starts a background thread that calls on_detect(direction) when siren detected.
+    With `directions` (one mic channel per approach, in channel order) the
+    direction is localized from the channels instead of picked at random.
     Returns immediately.
     """
-    target = _mic_loop if HAVE_MIC else _random_fallback_loop
-    t = threading.Thread(target=target, args=(on_detect, cooldown), daemon=True)
+    if not mic_available():
+        target, args = _random_fallback_loop, (on_detect, cooldown)
+    elif directions:
+        target, args = _multi_mic_loop, (on_detect, cooldown, list(directions), method, device)
+    else:
+        target, args = _mic_loop, (on_detect, cooldown)
+    t = threading.Thread(target=target, args=args, daemon=True)
     t.start()
     return t
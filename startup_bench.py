@@ -0,0 +1,196 @@
+"""
+Startup benchmark: how long a restart takes before the server answers.
+
+For each run a fresh interpreter is started and timed:
+
+- import : `import app` alone, plus which heavy modules the import pulled
+  in and the slowest direct imports (python -X importtime);
+- ready  : from process start until GET /get_status answers 200, either
+  the standalone dev server or the production stack (serve.py: authority +
+  gunicorn workers);
+- capture: with --capture, the first /save_image afterwards, end to end
+  (shows whether OpenCV / Pillow were already warmed up in the background).
+
+Usage:
+    python startup_bench.py                           # 5 runs, standalone
+    python startup_bench.py --mode serve --workers 2 --runs 3 --capture
+    python startup_bench.py --target-ms 1500 --json   # exit 1 if ready p50 misses it
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from load_bench import make_png
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY = ("cv2", "numpy", "PIL.Image", "pyaudio")
+_ENV = dict(os.environ, SMARTTRAFFIC_ROLE="standalone")
+
+_IMPORT_PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import app
+print(json.dumps({"import_ms": 1000 * (time.perf_counter() - t),
+                  "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY,)
+
+_STANDALONE = """
+import app
+app.start_background_services()
+app.app.run(host="127.0.0.1", port=%d, debug=False, use_reloader=False, threaded=True)
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import():
+    out = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], cwd=BASE_DIR, env=_ENV,
+                         capture_output=True, text=True, timeout=120)
+    if out.returncode != 0:
+        raise SystemExit(f"import app failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(top):
+    """[(module, cumulative_ms)] of the slowest direct imports of app.py."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=BASE_DIR,
+                         env=_ENV, capture_output=True, text=True, timeout=120)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header
+        # nesting is shown as 2 spaces per level: " app", "   flask", ...
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 1:
+            rows.append((name.strip(), int(cumulative) / 1000.0))
+    return sorted(rows, key=lambda r: -r[1])[:top]
+
+
+def _get(url, timeout=1.0, body=None):
+    data = None if body is None else json.dumps(body).encode()
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.status, resp.read()
+
+
+def start_server(mode, port, workers):
+    if mode == "standalone":
+        cmd = [sys.executable, "-c", _STANDALONE % port]
+        env = _ENV
+    else:
+        cmd = [sys.executable, os.path.join(BASE_DIR, "serve.py"), "--workers", str(workers),
+               "--bind", f"127.0.0.1:{port}",
+               "--ipc", os.path.join(BASE_DIR, f"bench_{port}.sock")]
+        env = dict(os.environ, SMARTTRAFFIC_SNAPSHOT=f"smarttraffic_bench_{port}")
+    return subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+
+
+def stop_server(proc):
+    proc.send_signal(signal.SIGINT)  # serve.py stops its authority and workers on Ctrl-C
+    try:
+        proc.wait(15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def measure_ready(mode, workers, timeout, capture):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    proc = start_server(mode, port, workers)
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise SystemExit(f"server exited with code {proc.returncode} before answering")
+            if time.perf_counter() - start > timeout:
+                raise SystemExit(f"no /get_status answer within {timeout}s")
+            try:
+                if _get(base + "/get_status", timeout=0.5)[0] == 200:
+                    break
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.01)
+        result = {"ready_ms": 1000 * (time.perf_counter() - start)}
+        if capture:
+            t = time.perf_counter()
+            status, body = _get(base + "/save_image", timeout=60, body={"image": make_png()})
+            if status == 202:
+                url = base + json.loads(body)["result_url"] + "?wait=10"
+                while json.loads(_get(url, timeout=30)[1]).get("status") in ("queued", "running"):
+                    pass
+            result["capture_ms"] = 1000 * (time.perf_counter() - t)
+        return result
+    finally:
+        stop_server(proc)
+
+
+def summarize(samples):
+    return {"p50": round(statistics.median(samples), 1), "min": round(min(samples), 1),
+            "max": round(max(samples), 1)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="startup benchmark")
+    ap.add_argument('--mode', choices=("standalone", "serve"), default="standalone")
+    ap.add_argument('--workers', type=int, default=2, help="HTTP workers in --mode serve")
+    ap.add_argument('--runs', type=int, default=5)
+    ap.add_argument('--capture', action='store_true', help="also time the first /save_image")
+    ap.add_argument('--top', type=int, default=8, help="slowest imports to list")
+    ap.add_argument('--timeout', type=float, default=60.0)
+    ap.add_argument('--target-ms', type=float, default=None, help="fail if ready p50 exceeds it")
+    ap.add_argument('--json', action='store_true')
+    args = ap.parse_args(argv)
+
+    runs = [measure_import() for _ in range(args.runs)]
+    imports = {"import_ms": summarize([r["import_ms"] for r in runs]),
+               "heavy_loaded": runs[-1]["heavy"],
+               "slowest": [{"module": m, "ms": round(ms, 1)} for m, ms in slowest_imports(args.top)]}
+
+    ready = [measure_ready(args.mode, args.workers, args.timeout, args.capture)
+             for _ in range(args.runs)]
+    result = {"mode": args.mode, "runs": args.runs, "import": imports,
+              "ready_ms": summarize([r["ready_ms"] for r in ready])}
+    if args.capture:
+        result["first_capture_ms"] = summarize([r["capture_ms"] for r in ready])
+
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"import app: p50 {imports['import_ms']['p50']} ms, "
+              f"heavy modules loaded: {', '.join(imports['heavy_loaded']) or 'none'}")
+        for row in imports["slowest"]:
+            print(f"    {row['module']:<28}{row['ms']:>10} ms")
+        cols = ("p50", "min", "max")
+        print(f"{'':<22}" + "".join(f"{c:>10}" for c in cols))
+        print(f"{'ready (/get_status)':<22}" + "".join(f"{result['ready_ms'][c]:>10}" for c in cols))
+        if args.capture:
+            print(f"{'first /save_image':<22}"
+                  + "".join(f"{result['first_capture_ms'][c]:>10}" for c in cols))
+
+    if args.target_ms is not None and result["ready_ms"]["p50"] > args.target_ms:
+        print(f"ready p50 {result['ready_ms']['p50']} ms exceeds target {args.target_ms} ms",
+              file=sys.stderr)
+        sys.exit(1)
+    return result
+
+
+if __name__ == '__main__':
+    main()
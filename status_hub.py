@@ -0,0 +1,105 @@
+"""
+Fan-out hub for live controller status.
+
+The controller loop publishes every tick; the hub diffs it against the last
+published status and hands only the changed keys to each subscriber
+(e.g. one /status/stream SSE connection per dashboard tab).
+
+Each subscriber owns a small bounded queue. A slow client never blocks the
+publisher: when its queue is full the backlog is thrown away and replaced by
+one full snapshot, so the client resyncs instead of replaying stale deltas.
+
+Usage:
+    from status_hub import StatusHub
+    hub = StatusHub()
+    hub.publish(controller.get_status())      # controller thread
+    sub = hub.subscribe()                     # request thread
+    event, payload = sub.get(timeout=15)      # ('snapshot'|'delta', dict)
+"""
+
+import queue
+import threading
+
+_MISSING = object()
+
+
+class Subscription:
+    """One consumer of the hub. Items are (event, payload) tuples."""
+
+    def __init__(self, maxsize):
+        self._q = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def get(self, timeout=None):
+        """Next (event, payload) or None if nothing arrived within timeout."""
+        try:
+            return self._q.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _offer(self, item, snapshot):
+        try:
+            self._q.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        # Consumer fell behind: drop its backlog and resync with a snapshot
+        while True:
+            try:
+                self._q.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                break
+        try:
+            self._q.put_nowait(("snapshot", snapshot))
+        except queue.Full:
+            self.dropped += 1
+
+
+class StatusHub:
+    def __init__(self, max_queue=32):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._last = {}
+
+    def publish(self, status):
+        """
+        Publish the latest full status. Returns the delta that was fanned out,
+        or None when nothing changed (no subscriber is touched in that case).
+        """
+        with self._lock:
+            delta = {k: v for k, v in status.items() if self._last.get(k, _MISSING) != v}
+            for k in self._last:
+                if k not in status:
+                    delta[k] = None
+            if not delta:
+                return None
+            self._last = dict(status)
+            snapshot = self._last
+            subscribers = list(self._subscribers)
+
+        item = ("delta", delta)
+        for sub in subscribers:
+            sub._offer(item, snapshot)
+        return delta
+
+    def subscribe(self):
+        """Register a new consumer; its first item is the current full snapshot."""
+        sub = Subscription(self.max_queue)
+        with self._lock:
+            sub._offer(("snapshot", self._last), self._last)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def snapshot(self):
+        with self._lock:
+            return self._last
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from adaptive_timing import (AdaptiveTiming, EwmaSmoother, proportional_splits,
+                             webster_splits)
+from conftest import FakeClock
+from traffic_controller import TrafficController
+
+
+def test_proportional_without_sensitivity_is_fixed():
+    greens = proportional_splits([10, 0, 3, 1], 15, 5, 45, 0.0)
+    assert greens.tolist() == [15, 15, 15, 15]
+
+
+def test_proportional_shares_total_green():
+    greens = proportional_splits([3, 1, 0, 0], 20, 0, 100, 1.0)
+    assert greens.tolist() == pytest.approx([60, 20, 0, 0])
+    assert greens.sum() == pytest.approx(4 * 20)
+
+
+def test_proportional_clamps_and_masks():
+    greens = proportional_splits([[100, 0, 0, 0]], 15, 5, 45, 1.0,
+                                 valid=[[True, True, True, False]])
+    assert greens.tolist() == [[45, 5, 5, 0]]
+
+
+def test_proportional_without_demand_splits_equally():
+    greens = proportional_splits([0, 0, 0], 15, 5, 45, 1.0)
+    assert greens.tolist() == pytest.approx([15, 15, 15])
+
+
+def test_webster_cycle_and_split():
+    flows = np.array([360.0, 180.0, 360.0, 180.0])   # y = 0.2, 0.1, 0.2, 0.1
+    greens = webster_splits(flows, 1, 200, lost_time=3, saturation=1800, max_cycle=200)
+    cycle = (1.5 * 12 + 5) / (1 - 0.6)
+    assert greens.sum() == pytest.approx(cycle - 12)
+    assert greens[0] == pytest.approx(2 * greens[1])
+
+
+def test_webster_caps_the_cycle():
+    greens = webster_splits([1700, 1700], 5, 200, lost_time=3, max_cycle=60)
+    assert greens.sum() == pytest.approx(60 - 6)
+
+
+def test_webster_batches_junctions():
+    flows = np.array([[360, 180, 360, 180], [0, 0, 0, 0]], dtype=float)
+    greens = webster_splits(flows, 5, 45, valid=[[1, 1, 1, 1], [1, 1, 0, 0]])
+    assert greens.shape == (2, 4)
+    assert greens[1].tolist()[2:] == [0, 0]
+    assert greens[1, 0] == greens[1, 1]
+
+
+def test_ewma_smoothing():
+    s = EwmaSmoother(0.5)
+    assert s.update([10.0]).tolist() == [10.0]
+    assert s.update([0.0]).tolist() == [5.0]
+    assert s.update([0.0]).tolist() == [2.5]
+
+
+def test_adaptive_greens_drive_the_controller():
+    clock = FakeClock()
+    adaptive = AdaptiveTiming({"smoothing": 1.0, "densitySensitivity": 1.0})
+    adaptive.update({"north": 1, "east": 3, "south": 0, "west": 0})
+    ctl = TrafficController(clock=clock)
+    ctl.green_provider = adaptive.green_for
+    ctl.driven = True
+    ctl.tick(clock.now)                      # first green: the fixed green_time
+    assert ctl.phase_deadline == 15
+
+    clock.now = 15 + 3                       # yellow over: east turns green
+    ctl.tick(clock.now)
+    assert ctl.active_direction() == "east"
+    assert ctl.phase_deadline - clock.now == pytest.approx(adaptive.green_for("east"))
+    assert adaptive.green_for("east") == pytest.approx(45)   # clamped to maxGreen
+
+    adaptive.update({"north": 1, "east": 1, "south": 1, "west": 1})
+    clock.now = ctl.phase_deadline + 3       # south green with the new split
+    ctl.tick(clock.now)
+    assert ctl.active_direction() == "south"
+    assert ctl.phase_deadline - clock.now == pytest.approx(15)
+
+
+def test_set_directions_restarts_smoothing():
+    adaptive = AdaptiveTiming({"smoothing": 0.5})
+    adaptive.update({"north": 10})
+    adaptive.set_directions(["ns", "ew"])
+    assert adaptive.greens == [15.0, 15.0]
+    assert adaptive.smoother.value is None
+    assert adaptive.green_for("unknown") == 15.0
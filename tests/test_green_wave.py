@@ -0,0 +1,80 @@
+import random
+
+import numpy as np
+import pytest
+
+from green_wave import Corridor, optimize
+
+DIRECTIONS = ["north", "east", "south", "west"]
+
+
+def common_band(starts, lengths, cycle):
+    """Longest [x, x + b] inside every circular window [start, start + length]."""
+    best = 0.0
+    for x in np.mod(starts, cycle):
+        rel = np.mod(x - starts, cycle)
+        if np.all(rel <= lengths + 1e-9):
+            best = max(best, float(np.min(lengths - rel)))
+    return best
+
+
+def realized(corridor, wave):
+    """(outbound, inbound) bands the returned offsets actually give."""
+    out_s, out_g, in_s, in_g = [], [], [], []
+    for i, iid in enumerate(corridor.ids):
+        plan, t = wave.plans[iid], wave.travel_times[i]
+        o = corridor.junctions[i]["directions"].index(corridor.outbound)
+        k = corridor.junctions[i]["directions"].index(corridor.inbound)
+        out_s.append(plan.offset - t)
+        out_g.append(plan.greens[o])
+        in_s.append(plan.offset + plan.starts[k] + t)
+        in_g.append(plan.greens[k])
+    return (common_band(np.array(out_s), np.array(out_g), wave.cycle),
+            common_band(np.array(in_s), np.array(in_g), wave.cycle))
+
+
+def random_corridor(seed):
+    rng = random.Random(seed)
+    n = rng.randint(2, 5)
+    junctions = [{"id": f"J{i}", "directions": DIRECTIONS,
+                  "greens": [rng.uniform(10, 40) for _ in DIRECTIONS], "yellow": 3}
+                 for i in range(n)]
+    return Corridor(junctions, [rng.uniform(100, 800) for _ in range(n - 1)])
+
+
+def assert_realized(corridor, wave):
+    band_out, band_in = realized(corridor, wave)
+    assert band_out == pytest.approx(wave.band_out, abs=1e-6)
+    assert band_in >= wave.band_in - 1e-6
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_offsets_realize_reported_bands(seed):
+    corridor = random_corridor(seed)
+    assert_realized(corridor, optimize(corridor))
+
+
+def test_reference_junction_does_not_wrap():
+    # 120 s cycle, 10.5 s link: the case where the outbound windows used to
+    # miss each other entirely while a 9 s band was reported
+    junctions = [{"id": "A", "directions": DIRECTIONS, "greens": [30, 25, 30, 25], "yellow": 3},
+                 {"id": "B", "directions": DIRECTIONS, "greens": [20, 35, 20, 33], "yellow": 3}]
+    corridor = Corridor(junctions, [10.5 * 50 / 3.6], cycle_range=(120, 120))
+    wave = optimize(corridor)
+    assert wave.cycle == 120.0
+    assert list(wave.travel_times) == pytest.approx([0.0, 10.5])
+    assert_realized(corridor, wave)
+
+
+def test_two_way_band_found_when_feasible():
+    junctions = [{"id": f"J{i}", "directions": DIRECTIONS, "greens": [25, 25, 25, 25], "yellow": 3}
+                 for i in range(2)]
+    wave = optimize(Corridor(junctions, [300]))
+    assert wave.band_out > 0 and wave.band_in > 0
+    assert_realized(Corridor(junctions, [300]), wave)
+
+
+def test_no_feasible_cycle_raises():
+    junctions = [{"id": "A", "directions": DIRECTIONS, "greens": [10, 10, 10, 10], "yellow": 3}]
+    with pytest.raises(ValueError):
+        optimize(Corridor(junctions, [], cycle_range=(20, 20), min_green=5.0))
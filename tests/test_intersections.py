@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from adaptive_timing import AdaptiveTiming
+from conftest import FakeClock
+from green_wave import CoordinationPlan
+from intersections import MAX_DIRS, IntersectionRegistry
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def registry(clock):
+    reg = IntersectionRegistry(capacity=2, clock=clock)
+    reg.add("A", directions=["north", "south"], green_time=10, yellow_time=2)
+    reg.add("B", directions=["north", "east", "south"], greens=[5, 8, 12], yellow_time=3)
+    return reg
+
+
+def test_junctions_tick_on_their_own_plans(registry, clock):
+    assert registry.next_deadline() == 5
+    clock.now = 5
+    assert registry.auto_cycle() == [("yellow", 0.0)]
+    assert registry.status(1)["phase"] == "yellow"
+    assert registry.status(0)["phase"] == "green"
+    clock.now = 8
+    registry.auto_cycle()
+    assert registry.status(1)["east"] == "green"
+    assert registry.countdowns().tolist() == [2, 8]
+
+
+def test_late_wakeup_chains_from_deadlines(registry, clock):
+    clock.now = 30
+    registry.auto_cycle()
+    # A: green 0-10, yellow -12, south 12-22, yellow -24, north 24-34
+    assert registry.status(0)["north"] == "green"
+    assert registry.deadline[0] == 34
+    # B: 0-5, -8, east 8-16, -19, south 19-31
+    assert registry.status(1)["south"] == "green"
+    assert registry.deadline[1] == 31
+
+
+def test_growing_keeps_existing_rows(registry, clock):
+    registry.add("C", green_time=20)
+    assert registry.capacity >= 3
+    assert registry.green[1, :3].tolist() == [5, 8, 12]
+    assert registry.spec(2) == {"directions": ["north", "east", "south", "west"],
+                                "greens": [20.0] * 4, "yellow": 3.0}
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"greens": [10, 10]},
+    {"green_time": 0},
+    {"greens": [10, 0.5, 10, 10]},
+    {"yellow_time": 0},
+    {"directions": []},
+    {"directions": ["d%d" % k for k in range(MAX_DIRS + 1)]},
+])
+def test_rejected_add_leaves_no_trace(registry, kwargs):
+    with pytest.raises(ValueError):
+        registry.add("C", **kwargs)
+    assert len(registry) == 2
+    assert registry.ids == ["A", "B"]
+    assert "C" not in registry
+    assert len(registry.directions) == 2
+
+
+def test_duplicate_id_rejected(registry):
+    with pytest.raises(ValueError):
+        registry.add("A")
+
+
+def test_set_timer_rejects_short_times(registry):
+    for bad in (0, -5, 0.5):
+        with pytest.raises(ValueError):
+            registry.handle("A").set_timer(bad)
+    assert registry.green[0, :2].tolist() == [10, 10]
+
+
+def test_set_timer_restarts_the_phase(registry, clock):
+    clock.now = 4
+    registry.handle("A").set_timer(7)
+    assert registry.deadline[0] == 11
+    assert registry.green[0, :2].tolist() == [7, 7]
+
+
+def test_manual_mode_freezes_countdown(registry, clock):
+    clock.now = 3
+    registry.set_mode(0, "manual")
+    clock.now = 100
+    registry.auto_cycle()
+    assert registry.status(0)["countdown"] == 7
+    registry.set_mode(0, "auto")
+    assert registry.deadline[0] == 107
+
+
+def test_emergency_then_back_to_the_ring(registry, clock):
+    clock.now = 2
+    registry.handle("A").set_emergency("south")
+    status = registry.status(0)
+    assert status["emergency"] and status["south"] == "green" and status["north"] == "red"
+    clock.now = 12
+    assert ("emergency_end", 0.0) in registry.auto_cycle()
+    assert registry.status(0)["emergency"] is False
+    with pytest.raises(ValueError):
+        registry.handle("A").set_emergency("west")
+
+
+def test_adapt_skips_coordinated_and_new_rows(registry, clock):
+    plan = CoordinationPlan(60, 0.0, [25.0, 25.0], 5.0, min_green=5.0)
+    registry.set_coordination(0, plan)
+    timing = AdaptiveTiming({"smoothing": 1.0, "densitySensitivity": 1.0})
+    density = np.zeros((2, MAX_DIRS))
+    density[1, :3] = [1, 0, 3]
+    registry.add("C", green_time=20)
+    greens = registry.adapt(timing, density)
+    assert greens.shape == (2, MAX_DIRS)
+    assert registry.green[0, :2].tolist() == [25, 25]         # coordinated
+    assert registry.green[1, :3].tolist() == pytest.approx(greens[1, :3])
+    assert registry.green[2, :4].tolist() == [20, 20, 20, 20]  # added after the sample
@@ -0,0 +1,98 @@
+import pytest
+
+from conftest import FakeClock
+from phase_plan import ALL_RED, GREEN, YELLOW, compile_plan, ring_plan
+from traffic_controller import TrafficController
+
+PLAN = {
+    "signals": {"north": "vehicle", "south": "vehicle", "ns_left": "left",
+                "east": "vehicle", "west": "vehicle", "ped_ns": "ped"},
+    "approaches": {"north": ["north", "ns_left"], "south": ["south"],
+                   "east": ["east"], "west": ["west"]},
+    "phases": [
+        {"name": "ns_left", "green": ["ns_left", "north"], "green_time": 6, "direction": "north"},
+        {"name": "ns", "green": ["north", "south", "ped_ns"], "green_time": 20, "all_red": 2},
+        {"name": "ew", "green": ["east", "west"], "green_time": 25, "yellow": 4},
+    ],
+}
+
+
+def test_ring_plan_alternates_green_and_yellow():
+    plan = compile_plan(ring_plan(["north", "east"]))
+    assert [s.kind for s in plan.steps] == [GREEN, YELLOW, GREEN, YELLOW]
+    assert plan.directions == ["north", "east"]
+    assert [s.next for s in plan.steps] == [1, 2, 3, 0]
+    # only the signals that change are in each step's diff
+    assert plan.steps[1].changes == (("north", "yellow"),)
+    assert dict(plan.steps[2].changes) == {"north": "red", "east": "green"}
+
+
+def test_overlaps_hold_and_all_red_is_a_step():
+    plan = compile_plan(PLAN)
+    kinds = [(s.kind, plan.phases[s.phase].name) for s in plan.steps]
+    assert kinds == [(GREEN, "ns_left"), (YELLOW, "ns_left"), (GREEN, "ns"), (YELLOW, "ns"),
+                     (ALL_RED, "ns"), (GREEN, "ew"), (YELLOW, "ew")]
+    # north stays green from ns_left into ns; only the arrow clears
+    assert plan.steps[1].view["north"] == "green"
+    assert plan.steps[1].view["ns_left"] == "yellow_arrow"
+    assert plan.steps[3].view["ped_ns"] == "flashing_dont_walk"
+    assert set(plan.steps[4].view.values()) == {"red", "dont_walk"}
+
+
+def test_preempt_view_combines_approaches():
+    plan = compile_plan(PLAN)
+    view = plan.preempt_view(["north", "south"])
+    assert view["north"] == "green" and view["ns_left"] == "green_arrow"
+    assert view["south"] == "green" and view["east"] == "red"
+    assert plan.preempt_view(["south", "north"]) is view
+
+
+@pytest.mark.parametrize("phase", [
+    {"name": "x", "green": ["north"], "green_time": 0},
+    {"name": "x", "green": ["north"], "green_time": -3},
+    {"name": "x", "green": ["north"], "yellow": 0},
+    {"name": "x", "green": ["north"], "all_red": -1},
+    {"name": "x", "green": []},
+    {"name": "x", "green": ["nope"]},
+])
+def test_bad_phases_rejected(phase):
+    with pytest.raises(ValueError):
+        compile_plan({"signals": {"north": "vehicle"}, "phases": [phase]})
+
+
+def test_bad_plans_rejected():
+    with pytest.raises(ValueError):
+        compile_plan({"signals": {"north": "tram"}, "phases": [{"name": "n", "green": ["north"]}]})
+    with pytest.raises(ValueError):
+        compile_plan({"signals": {"north": "vehicle"}, "phases": []})
+    with pytest.raises(ValueError):
+        compile_plan({"signals": {"north": "vehicle"}, "approaches": {"north": ["x"]},
+                      "phases": [{"name": "n", "green": ["north"]}]})
+
+
+def test_controller_follows_the_compiled_intervals():
+    clock = FakeClock()
+    ctl = TrafficController(clock=clock, plan=PLAN)
+    ctl.driven = True
+    ctl.tick(0.0)
+    ctl.set_plan(PLAN)                    # restart from the first phase at t=0
+    ctl.tick(0.0)
+    expected = [(GREEN, 6), (YELLOW, 3), (GREEN, 20), (YELLOW, 3), (ALL_RED, 2),
+                (GREEN, 25), (YELLOW, 4), (GREEN, 6)]
+    seen = []
+    for _ in expected:
+        seen.append((ctl.phase, ctl.phase_deadline - clock.now))
+        clock.now = ctl.phase_deadline
+        ctl.tick(clock.now)
+    assert seen == expected
+
+
+def test_catch_up_is_bounded():
+    clock = FakeClock()
+    ctl = TrafficController(clock=clock, plan=PLAN)
+    ctl.driven = True
+    ctl.tick(0.0)
+    clock.now = 1e6
+    transitions = ctl.tick(clock.now)
+    assert len(transitions) <= 2 * len(ctl.plan.steps)
+    assert ctl.phase_deadline > clock.now
@@ -0,0 +1,121 @@
+import pytest
+
+from conftest import FakeClock
+from preemption import PreemptionManager
+from traffic_controller import TrafficController
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def ctl(clock):
+    ctl = TrafficController(clock=clock)
+    ctl.driven = True                      # commands wait for tick(), like the scheduler
+    ctl.tick(0.0)
+    return ctl
+
+
+def manager(ctl, clock, **kwargs):
+    kwargs.setdefault("window", 2.0)
+    kwargs.setdefault("cooldown", 15.0)
+    kwargs.setdefault("hold", 10.0)
+    return PreemptionManager(ctl, clock=clock, **kwargs)
+
+
+def run(ctl, mgr, clock, until, dt=0.5):
+    """Tick controller and manager together; returns [(time, directions granted)]."""
+    grants = []
+    while clock.now < until:
+        clock.advance(dt)
+        ctl.tick(clock.now)
+        granted = mgr.step(clock.now)
+        if granted:
+            ctl.tick(clock.now)
+            grants.append((clock.now, set(granted)))
+    return grants
+
+
+def test_compatible_requests_in_one_window_are_granted_together(ctl, clock):
+    mgr = manager(ctl, clock)
+    assert mgr.submit("north") == "batched"
+    clock.now = 1.0
+    assert mgr.submit("south", source="camera") == "batched"
+    assert run(ctl, mgr, clock, 3.0) == [(2.0, {"north", "south"})]
+    assert set(ctl.snapshot.emergency_directions) == {"north", "south"}
+
+
+def test_conflicting_request_waits_for_the_next_grant(ctl, clock):
+    mgr = manager(ctl, clock)
+    mgr.submit("north", source="camera")
+    mgr.submit("east")
+    grants = run(ctl, mgr, clock, 20.0)
+    # camera (0.9) beats siren (0.7); east follows when north's hold ends
+    assert grants == [(2.0, {"north"}), (12.0, {"east"})]
+
+
+def test_repeat_hits_merge_and_served_direction_is_suppressed(ctl, clock):
+    mgr = manager(ctl, clock)
+    mgr.submit("west")
+    assert mgr.submit("west") == "merged"
+    assert mgr.stats()["batch"][0]["confidence"] == pytest.approx(0.91)
+    run(ctl, mgr, clock, 3.0)
+    assert mgr.submit("west") == "suppressed"          # being served
+    run(ctl, mgr, clock, 20.0)                          # ended at 12
+    assert mgr.submit("west", now=20.0) == "suppressed"  # within cooldown
+    assert mgr.submit("west", now=27.5) == "batched"
+
+
+def test_unserved_requests_expire(ctl, clock):
+    mgr = manager(ctl, clock, max_wait=5.0)
+    mgr.submit("north")
+    mgr.submit("east")
+    run(ctl, mgr, clock, 13.0)
+    assert mgr.counts["expired"] == 1
+    assert mgr.stats()["queue"] == []
+
+
+def test_late_compatible_request_joins(ctl, clock):
+    mgr = manager(ctl, clock)
+    mgr.submit("north")
+    run(ctl, mgr, clock, 3.0)
+    clock.now = 4.0
+    mgr.submit("south")
+    grants = run(ctl, mgr, clock, 7.0)
+    assert grants == [(6.0, {"north", "south"})]
+    assert mgr.counts["joined"] == 1
+    # the join restarted the hold: the preemption now ends at 16, not 12
+    assert ctl.snapshot.deadline == 16.0
+
+
+def test_join_after_grant_timeout_is_not_ended_early(ctl, clock):
+    mgr = manager(ctl, clock, hold=30.0, grant_timeout=5.0)
+    mgr.submit("north")
+    run(ctl, mgr, clock, 3.0)                   # granted at 2, seen
+    clock.now = 10.0
+    mgr.submit("south")
+    assert mgr.step(12.0) == ("north", "south")  # joined 10 s after the grant
+    # the controller has not applied the join yet; that is not an ended preemption
+    assert mgr.step(13.0) == ()
+    assert set(mgr.stats()["active"]) == {"north", "south"}
+    ctl.tick(13.5)
+    mgr.step(13.5)
+    assert set(mgr.stats()["active"]) == {"north", "south"}
+
+
+def test_grant_that_never_shows_up_times_out(ctl, clock):
+    mgr = manager(ctl, clock, grant_timeout=5.0)
+    mgr.submit("north")
+    assert mgr.step(2.0) == ("north",)
+    ctl._commands.clear()                      # the command got lost
+    assert mgr.step(6.0) == ()
+    assert mgr.stats()["active"] == ["north"]
+    mgr.step(7.5)
+    assert mgr.stats()["active"] == []
+
+
+def test_unknown_direction_rejected(ctl, clock):
+    with pytest.raises(ValueError):
+        manager(ctl, clock).submit("up")
@@ -0,0 +1,77 @@
+import json
+import threading
+
+import pytest
+
+from settings_store import SettingsStore, check_rules
+
+HOUR = 3600.0  # debounce long enough that only flush() writes
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "settings.json")
+
+
+def test_rules_accept_and_reject():
+    check_rules({"minGreen": 5, "maxGreen": 5})
+    with pytest.raises(ValueError, match="minGreen"):
+        check_rules({"minGreen": 50, "maxGreen": 45})
+
+
+def test_breaking_update_changes_nothing(path):
+    store = SettingsStore(path, debounce=HOUR, max_delay=HOUR)
+    calls = []
+    store.on_change(("minGreen", "maxGreen"), calls.append)
+    with pytest.raises(ValueError):
+        store.update(minGreen=50)
+    with pytest.raises(ValueError):
+        store.update(minGreen=10, maxGreen=8)
+    assert (store["minGreen"], store["maxGreen"]) == (5, 45)
+    assert calls == [] and store.updates == 0
+
+
+def test_pair_moved_together(path):
+    store = SettingsStore(path, debounce=HOUR, max_delay=HOUR)
+    assert store.update(minGreen=60, maxGreen=90) == {"minGreen": 60, "maxGreen": 90}
+    store.update(maxGreen=60)
+    assert (store["minGreen"], store["maxGreen"]) == (60, 60)
+
+
+def test_broken_pair_on_disk_falls_back_to_defaults(path):
+    with open(path, "w") as f:
+        json.dump({"minGreen": 50, "maxGreen": 20, "green": 22, "yellowTime": 4}, f)
+    store = SettingsStore(path)
+    assert (store["minGreen"], store["maxGreen"]) == (5, 45)
+    assert store["green"] == 22 and store["yellow"] == 4
+
+
+def test_flush_writes_current_values(path):
+    store = SettingsStore(path, debounce=HOUR, max_delay=HOUR)
+    store.update(green=30)
+    store.update(green=31)
+    store.flush()
+    store.flush()                                  # nothing pending: no second write
+    assert json.load(open(path))["green"] == 31
+    assert store.writes == 1
+
+
+def test_older_snapshot_never_overwrites_a_newer_one(path):
+    store = SettingsStore(path, debounce=HOUR, max_delay=HOUR)
+    store.update(green=30)
+    store.flush()
+    store._write({"green": 1}, 0)                  # a writer that fell behind
+    assert json.load(open(path))["green"] == 30
+
+
+def test_hooks_see_updates_in_order(path):
+    store = SettingsStore(path, debounce=HOUR, max_delay=HOUR)
+    seen = []
+    store.on_change(("green",), lambda changed: seen.append(changed["green"]))
+    threads = [threading.Thread(target=store.update, kwargs={"green": g})
+               for g in range(2, 40)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert seen[-1] == store["green"]
@@ -1,76 +1,388 @@
+import math
+import threading
+import time
+from collections import deque, namedtuple
+
+from phase_plan import GREEN, compile_plan, ring_plan
+
+
+class ControllerSnapshot(namedtuple("ControllerSnapshot", [
+        "version", "state", "mode", "phase", "index", "deadline", "remaining",
+        "emergency", "emergency_direction", "emergency_directions"])):
+    """
+    Immutable view of the controller at one instant. `deadline` is the
+    monotonic end of the running phase (None while paused, `remaining` then
+    holds the frozen countdown), so the countdown stays live without the
+    ticker republishing every second.
+    """
+    __slots__ = ()
+
+    def countdown(self, now):
+        if self.deadline is None:
+            return self.remaining
+        return max(0, math.ceil(self.deadline - now - 1e-9))
+
+
 class TrafficController:
-    def __init__(self):
-        self.directions = ["north", "east", "south", "west"]
-        self.index = 0
-        self.state = {d: "red" for d in self.directions}
+    """
+    Signal controller running a compiled phase plan on monotonic deadlines.
+
+    Instead of decrementing a counter once per wake-up, each phase stores the
+    monotonic time it ends at. `countdown` is derived from that deadline, so
+    it stays accurate however late the caller wakes up, and a scheduler can
+    sleep straight until `next_deadline()`.
+
+    Threading: one ticker thread (the scheduler calling `tick`) owns the
+    mutable state. Other threads never touch it -- `set_mode`, `set_timer`
+    and `set_emergency` only queue a command and wake the ticker, which
+    applies it. After every step the ticker swaps in a new immutable
+    `snapshot`; `get_status` reads it without taking a lock, so readers
+    always see one consistent instant. Without a running ticker, commands are
+    applied immediately under a lock instead.
+
+    The ring comes from a phase_plan.CompiledPlan (default: the four
+    approaches one after another). A transition steps to the table's next
+    entry and applies only that step's precomputed signal changes; a new
+    snapshot (sharing the step's read-only view) is made only when something
+    changed, so idle ticks allocate nothing and cost does not grow with the
+    number of phases or signals.
+    """
+
+    def __init__(self, clock=time.monotonic, plan=None):
+        self.clock = clock
+        self.plan = compile_plan(plan or ring_plan(["north", "east", "south", "west"]))
+        self.directions = list(self.plan.approaches)
+        self.step = self.plan.green_step[0]  # position in plan.steps
+        self.index = 0                       # phase of the plan
+        self.state = dict(self.plan.off)     # signal -> colour, updated by diffs
+        self._view = self.plan.off           # read-only view matching `state`
 
         # Timer config
         self.green_time = 15
         self.yellow_time = 3
-        self.countdown = self.green_time
-        self.phase = "green"  # green → yellow
+        self.phase = GREEN  # green → yellow (→ all_red)
+
+        # Deadline of the running phase (or emergency). None = not started yet
+        # or paused; `_remaining` then holds the seconds left when resumed.
+        self.phase_deadline = None
+        self._remaining = self.green_time
+
+        # Optional callable(direction) -> seconds (or None) used each time an
+        # approach turns green, e.g. density-adaptive timing
+        self.green_provider = None
+
+        # Optional green_wave.CoordinationPlan; when set it decides every green
+        # (taking precedence over green_provider) so the junction stays in the
+        # corridor's wave and falls back into it after a preemption
+        self.coordination = None
 
         self.mode = "auto"
-        self.emergency_direction = None
+        self.emergency_direction = None   # first (or only) preempting approach
+        self.emergency_directions = ()    # every approach held green by the preemption
         self.emergency_active = False
 
-    def auto_cycle(self):
+        # Callables invoked after an external change (mode, timer, emergency)
+        self._change_listeners = []
+
+        # Commands from other threads, applied by the ticker (deque ops are atomic)
+        self._commands = deque()
+        self._apply_lock = threading.Lock()
+        self.driven = False  # True while a scheduler thread is ticking us
+        self.snapshot = None
+        self._status = None  # (snapshot, countdown, status dict) of the last get_status
+        self._dirty = True
+        self._publish()
+
+    # -------------------- time keeping --------------------
+    @property
+    def countdown(self):
+        if self.phase_deadline is None:
+            return self._remaining
+        return max(0, math.ceil(self.phase_deadline - self.clock() - 1e-9))
+
+    def next_deadline(self):
+        """Monotonic time of the next transition, or None when paused."""
+        if self.mode == "manual":
+            return None
+        return self.phase_deadline
+
+    def _start(self, seconds, now):
+        self.phase_deadline = now + seconds
+        self._dirty = True
+
+    def _green_for(self, index, start):
+        if self.coordination is not None:
+            return self.coordination.green_for(index, start)
+        if self.green_provider is not None:
+            try:
+                secs = self.green_provider(self.plan.phases[index].direction)
+                if secs is not None:
+                    return secs
+            except Exception as e:
+                print("[controller] green provider error:", e)
+        return self.green_time
+
+    def active_direction(self):
+        """Approach being served: the preempting one, else the running phase's."""
         if self.emergency_active:
-            self.handle_emergency()
-            return
+            return self.emergency_direction
+        return self.plan.phases[self.index].direction
+
+    # -------------------- signals --------------------
+    def _show(self, view, changes=None):
+        """Switch the signals to `view`, writing only `changes` (computed if not given)."""
+        state = self.state
+        if changes is None:
+            changes = [(s, c) for s, c in view.items() if state.get(s) != c]
+        for s, c in changes:
+            state[s] = c
+        self._view = view
+        self._dirty = True
 
-        self.countdown -= 1
+    def _enter(self, k, start):
+        """Make step k of the plan current from `start`."""
+        step = self.plan.steps[k]
+        self.step = k
+        self.phase = step.kind
+        self.index = step.phase
+        if step.duration is not None:
+            secs = step.duration
+        elif step.kind == GREEN:
+            secs = self._green_for(step.phase, start)
+        else:
+            secs = self.yellow_time
+        self.phase_deadline = start + secs
+        # coming from the table predecessor: only its precomputed diff changes
+        prev = self.plan.steps[step.prev].view
+        self._show(step.view, step.changes if self._view is prev else None)
 
-        if self.phase == "green" and self.countdown <= 0:
-            self.phase = "yellow"
-            self.countdown = self.yellow_time
+    # -------------------- ticking --------------------
+    def tick(self, now=None):
+        """
+        Ticker entry point: apply queued commands, run the cycle for the
+        current mode and publish a fresh snapshot. Returns the transitions.
+        """
+        now = self.clock() if now is None else now
+        with self._apply_lock:
+            self._apply_commands(now)
+            transitions = []
+            if self.mode == "auto":
+                transitions = self.auto_cycle(now)
+            elif self.mode == "emergency":
+                transitions = self.handle_emergency(now)
+            self._publish()
+        return transitions
 
-        elif self.phase == "yellow" and self.countdown <= 0:
-            self.phase = "green"
-            self.index = (self.index + 1) % 4
-            self.countdown = self.green_time
+    def auto_cycle(self, now=None):
+        """
+        Apply every transition that is due at `now`. Returns a list of
+        (event, lateness_seconds) for the transitions taken.
+        """
+        now = self.clock() if now is None else now
+        if self.emergency_active:
+            return self.handle_emergency(now)
 
-        self._set_all_red()
-        if self.phase in ["green", "yellow"]:
-            self.state[self.directions[self.index]] = self.phase
+        transitions = []
+        if self.phase_deadline is None:
+            self._start(self._remaining, now)
 
-    def set_emergency(self, direction):
-        """Activate emergency mode for given direction"""
-        self.emergency_direction = direction
-        self.emergency_active = True
-        self.countdown = self.green_time  # reset timer for emergency
-
-    def handle_emergency(self):
-        self._set_all_red()
-        if self.emergency_direction:
-            self.state[self.emergency_direction] = "green"
-        self.countdown -= 1
-        if self.countdown <= 0:
+        # Chain from the scheduled deadline (not from `now`) so late wake-ups
+        # never stretch the cycle.
+        steps = self.plan.steps
+        budget = 2 * len(steps)
+        while self.phase_deadline <= now:
+            due = self.phase_deadline
+            if not budget:
+                # more than two rings behind (a long stall, or zero-length
+                # greens from the provider): restart the current step now
+                # instead of replaying the backlog under the apply lock
+                print(f"[controller] {now - due:.1f}s behind, resyncing the ring")
+                self._enter(self.step, now)
+                break
+            budget -= 1
+            self._enter(steps[self.step].next, due)
+            transitions.append((self.phase, now - due))
+
+        view = steps[self.step].view
+        if self._view is not view:  # first run, or back from a preemption / manual
+            self._show(view)
+        return transitions
+
+    def handle_emergency(self, now=None):
+        now = self.clock() if now is None else now
+        view = self.plan.preempt_view(self.emergency_directions)
+        if self._view is not view:
+            self._show(view)
+        if self.phase_deadline is None:
+            self._start(self._remaining, now)
+        if self.phase_deadline <= now:
+            lateness = now - self.phase_deadline
             self.emergency_active = False
             self.emergency_direction = None
-            self.phase = "green"
-            self.countdown = self.green_time
+            self.emergency_directions = ()
+            self._enter(self.plan.green_step[self.index], now)
+            return [("emergency_end", lateness)]
+        return []
+
+    # -------------------- snapshots --------------------
+    def _publish(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        snap = self.snapshot
+        version = 0 if snap is None else snap.version + 1
+        self.snapshot = ControllerSnapshot(  # atomic reference swap
+            version, self._view, self.mode, self.phase, self.index, self.phase_deadline,
+            self._remaining, self.emergency_active, self.emergency_direction,
+            self.emergency_directions)
 
     def get_status(self):
-        return {
-            **self.state,
-            "mode": self.mode,
-            "countdown": self.countdown,
-            "phase": self.phase,
-            "emergency": self.emergency_active,
-            "emergency_direction": self.emergency_direction
+        """Status dict, rebuilt only when the snapshot or the countdown changed (read-only)."""
+        snap = self.snapshot
+        countdown = snap.countdown(self.clock())
+        cached = self._status
+        if cached is not None and cached[0] is snap and cached[1] == countdown:
+            return cached[2]
+        status = {
+            **snap.state,
+            "mode": snap.mode,
+            "countdown": countdown,
+            "phase": snap.phase,
+            "emergency": snap.emergency,
+            "emergency_direction": snap.emergency_direction,
+            "emergency_directions": list(snap.emergency_directions)
         }
+        self._status = (snap, countdown, status)
+        return status
+
+    # -------------------- commands (any thread) --------------------
+    def set_emergency(self, direction, duration=None):
+        """
+        Activate emergency mode for a direction, or a list of compatible
+        directions held green together, for `duration` seconds (default: the
+        green time). Raises ValueError here, in the caller's thread, for an
+        unknown direction.
+        """
+        self._submit("set_emergency", self._emergency_directions(direction, self.plan), duration)
 
     def set_mode(self, mode):
-        self.mode = mode
+        self._submit("set_mode", mode)
 
     def set_timer(self, time_val):
+        self._submit("set_timer", time_val)
+
+    def set_yellow(self, time_val):
+        self._submit("set_yellow", time_val)
+
+    def set_coordination(self, plan):
+        """Follow a green_wave.CoordinationPlan (None = run uncoordinated)."""
+        self._submit("set_coordination", plan)
+
+    def set_plan(self, plan):
+        """Run a phase plan (dict or phase_plan.CompiledPlan) from its first phase."""
+        self._submit("set_plan", compile_plan(plan))
+
+    def _submit(self, name, *args):
+        self._commands.append((name, args))
+        if not self.driven:
+            with self._apply_lock:
+                self._apply_commands(self.clock())
+                self._publish()
+        self._notify()
+
+    def _apply_commands(self, now):
+        while True:
+            try:
+                name, args = self._commands.popleft()
+            except IndexError:
+                return
+            self._dirty = True
+            try:
+                getattr(self, "_cmd_" + name)(now, *args)
+            except Exception as e:
+                print(f"[controller] {name} error:", e)
+
+    @staticmethod
+    def _emergency_directions(direction, plan):
+        directions = (direction,) if isinstance(direction, str) else tuple(direction)
+        directions = tuple(d.lower() for d in directions)
+        if not directions:
+            raise ValueError("no direction given")
+        for d in directions:
+            if d not in plan.preempt:
+                raise ValueError(f"unknown direction {d!r}")
+        return directions
+
+    def _cmd_set_emergency(self, now, directions, duration=None):
+        # checked again: a set_plan queued in between may have removed an approach
+        directions = self._emergency_directions(directions, self.plan)
+        self.emergency_direction = directions[0]
+        self.emergency_directions = directions
+        self.emergency_active = True
+        # reset timer for emergency
+        self._start(self.green_time if duration is None else duration, now)
+        self._show(self.plan.preempt_view(directions))
+
+    def _cmd_set_mode(self, now, mode):
+        if mode == self.mode:
+            return
+        if mode == "manual":
+            # freeze the countdown where it is
+            if self.phase_deadline is not None:
+                self._remaining = max(0, math.ceil(self.phase_deadline - now - 1e-9))
+            self.phase_deadline = None
+        self.mode = mode
+
+    def _cmd_set_timer(self, now, time_val):
         self.green_time = time_val
-        self.countdown = self.green_time
+        self._remaining = self.green_time
+        self.phase_deadline = None if self.mode == "manual" else now + self.green_time
+
+    def _cmd_set_yellow(self, now, time_val):
+        # the running yellow (if any) keeps its deadline; the next one uses the new time
+        self.yellow_time = time_val
+
+    def _cmd_set_coordination(self, now, plan):
+        # the running phase keeps its deadline; the next green starts the resync
+        if plan is not None and len(plan.greens) != len(self.plan.phases):
+            raise ValueError(f"coordination has {len(plan.greens)} greens, "
+                             f"plan has {len(self.plan.phases)} phases")
+        self.coordination = plan
+        if plan is not None:
+            self.yellow_time = plan.yellow
+
+    def _cmd_set_plan(self, now, plan):
+        self.plan = plan
+        self.directions = list(plan.approaches)
+        self.state = dict(plan.off)
+        self._view = plan.off
+        if self.coordination is not None and len(self.coordination.greens) != len(plan.phases):
+            print("[controller] coordination dropped: new plan has a different phase count")
+            self.coordination = None
+        self.step, self.index, self.phase = plan.green_step[0], 0, GREEN
+        if self.emergency_active and all(d in plan.preempt for d in self.emergency_directions):
+            # keep preempting; the plan starts from its first phase afterwards
+            self._show(plan.preempt_view(self.emergency_directions))
+            return
+        self.emergency_active = False
+        self.emergency_direction = None
+        self.emergency_directions = ()
+        if self.mode == "manual":
+            self._remaining = self.green_time
+            self._show(plan.steps[self.step].view)
+        else:
+            self._enter(self.step, now)
+
+    # -------------------- change listeners --------------------
+    def add_change_listener(self, fn):
+        self._change_listeners.append(fn)
 
-    def _set_all_red(self):
-        for d in self.directions:
-            self.state[d] = "red"
+    def _notify(self):
+        for fn in self._change_listeners:
+            try:
+                fn()
+            except Exception as e:
+                print("[controller] listener error:", e)
 
 
 controller = TrafficController()
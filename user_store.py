@@ -0,0 +1,150 @@
+"""
+Credential store for the login route.
+
+users.json ({"username": "password-or-hash"}) is parsed once and re-read
+only when its mtime changes. Passwords are kept as salted PBKDF2-SHA256
+hashes:
+
+    pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+
+Plaintext entries are still accepted (hashed in memory on load); run
+`python user_store.py hash users.json` once to rewrite the file hashed.
+
+Hash work runs on a small bounded pool, so a login burst queues there
+instead of tying up every request thread. Successful verifications are
+remembered in an LRU keyed by a keyed HMAC of (user, password) -- a repeat
+login costs one HMAC instead of a full PBKDF2 run. The cache is process
+memory only and is cleared whenever the file changes.
+
+Usage:
+    from user_store import UserStore
+    users = UserStore('users.json')
+    users.verify('admin', 'secret')     # True / False (raises FileNotFoundError)
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = 200_000
+
+
+def hash_password(password, iterations=ITERATIONS, salt=None):
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def check_password(password, encoded):
+    try:
+        algorithm, iterations, salt, digest = encoded.split("$")
+    except ValueError:
+        return False
+    if algorithm != ALGORITHM:
+        return False
+    candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(candidate.hex(), digest)
+
+
+def is_hashed(value):
+    return isinstance(value, str) and value.startswith(ALGORITHM + "$")
+
+
+class UserStore:
+    def __init__(self, path, iterations=ITERATIONS, workers=2, cache_size=1024):
+        """
+        iterations : PBKDF2 cost for hashes made in memory (plaintext entries)
+        workers    : threads allowed to run hash verification concurrently
+        cache_size : successful (user, password) verifications remembered
+        """
+        self.path = path
+        self.iterations = iterations
+        self.cache_size = cache_size
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="login-hash")
+        self._lock = threading.Lock()
+        self._users = {}
+        self._mtime = None
+        self._cache = OrderedDict()
+        self._key = secrets.token_bytes(32)
+
+        self.reloads = 0
+        self.cache_hits = 0
+        self.verifications = 0
+
+    # -------------------- loading --------------------
+    def _current(self):
+        """User table, reloaded if the file changed (raises FileNotFoundError)."""
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return self._users
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path, 'r') as f:
+                    raw = json.load(f)
+                self._users = {name: value if is_hashed(value)
+                               else hash_password(str(value), self.iterations)
+                               for name, value in raw.items()}
+                self._cache.clear()
+                self._mtime = mtime
+                self.reloads += 1
+            return self._users
+
+    # -------------------- verification --------------------
+    def _cache_key(self, username, password):
+        return hmac.new(self._key, f"{username}\0{password}".encode(), hashlib.sha256).digest()
+
+    def verify(self, username, password, timeout=10):
+        """True when the credentials match; False otherwise."""
+        if not username or not password:
+            return False
+        users = self._current()
+        encoded = users.get(username)
+        if encoded is None:
+            return False
+
+        key = self._cache_key(username, password)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return True
+
+        self.verifications += 1
+        ok = self._pool.submit(check_password, password, encoded).result(timeout)
+        if ok:
+            with self._lock:
+                if self._users is users:  # file not reloaded meanwhile
+                    self._cache[key] = True
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        return ok
+
+    def stats(self):
+        return {"users": len(self._users), "reloads": self.reloads,
+                "verifications": self.verifications, "cache_hits": self.cache_hits}
+
+
+def hash_file(path, iterations=ITERATIONS):
+    """Rewrite a users file with every plaintext password hashed (atomic)."""
+    with open(path, 'r') as f:
+        users = json.load(f)
+    users = {name: value if is_hashed(value) else hash_password(str(value), iterations)
+             for name, value in users.items()}
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(users, f, indent=2)
+    os.replace(tmp, path)
+    return len(users)
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 3 or sys.argv[1] != "hash":
+        sys.exit("usage: python user_store.py hash <users.json>")
+    print(f"hashed {hash_file(sys.argv[2])} user(s)")